@@ -0,0 +1,167 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+from .derivatives import derivative_paths
+from .utils.streaming import StoredFile
+from .utils.paths import blob_relpath, blob_tmp_dir, ensure_dir, path_for_url, public_url_for, static_root
+
+# 會引用 blob 的表
+REF_TABLES = (models.FabricImage, models.FabricWork, models.ProductImage)
+
+
+def _ref_count_expr(url_col):
+    return sum(
+        (
+            select(func.count()).where(m.url == url_col).scalar_subquery()
+            for m in REF_TABLES
+        ),
+        literal(0),
+    )
+
+
+def _touch(db: Session, shas: List[str], now: datetime) -> Dict[str, str]:
+    """把已存在的 blob 標記為最近使用，回傳 {sha256: url}（只含實際更新到的列）。
+
+    先 UPDATE 再決定沿用與否：GC 的 DELETE 以 last_seen_at 判斷，
+    更新過的列不會在同一時間被回收，不會出現查到了卻已被刪掉的情況。
+    """
+    return dict(db.execute(
+        update(models.Blob)
+        .where(models.Blob.sha256.in_(shas))
+        .values(last_seen_at=now)
+        .returning(models.Blob.sha256, models.Blob.url),
+        execution_options={"synchronize_session": False},
+    ).all())
+
+
+def commit_file(db: Session, tmp_path: str, sha256: str, size: int, ext: str) -> str:
+    """把已寫好的暫存檔放進內容定址目錄並登記 blob，回傳公開 URL。
+
+    同內容已存在時直接丟棄暫存檔、沿用既有 URL（副檔名以第一次上傳為準）。
+    """
+    now = datetime.utcnow()
+    url = _touch(db, [sha256], now).get(sha256)
+    if url is not None:
+        db.commit()
+        os.remove(tmp_path)
+        return url
+    rel = blob_relpath(sha256, ext)
+    ensure_dir(os.path.dirname(rel))
+    path = os.path.join(static_root(), rel)
+    os.replace(tmp_path, path)
+    db.add(models.Blob(sha256=sha256, url=public_url_for(path), size=size, last_seen_at=now))
+    try:
+        db.commit()
+    except IntegrityError:
+        # 另一個 request 同時上傳了同一份內容：沿用對方的列
+        db.rollback()
+        url = _touch(db, [sha256], now)[sha256]
+        db.commit()
+        if url != public_url_for(path):
+            os.remove(path)
+        return url
+    return public_url_for(path)
+
+
+def commit_many(db: Session, files: List[Tuple[StoredFile, str]]) -> List[str]:
+    """批次版 commit_file：已存在的 sha 一次標記並查出，新內容搬進內容定址目錄後
+    以單一 INSERT 登記；回傳與 files 同順序的 URL。由呼叫端 commit。
+    """
+    shas = sorted({f.sha256 for f, _ in files})
+    now = datetime.utcnow()
+    known: Dict[str, str] = {}
+    for start in range(0, len(shas), 500):
+        known.update(_touch(db, shas[start:start + 500], now))
+    new: Dict[str, dict] = {}
+    urls = []
+    for stored, ext in files:
+        if stored.sha256 in known:
+            os.remove(stored.path)
+            urls.append(known[stored.sha256])
+            continue
+        rel = blob_relpath(stored.sha256, ext)
+        ensure_dir(os.path.dirname(rel))
+        path = os.path.join(static_root(), rel)
+        os.replace(stored.path, path)
+        url = known[stored.sha256] = public_url_for(path)
+        new[stored.sha256] = dict(sha256=stored.sha256, url=url, size=stored.size, last_seen_at=now)
+        urls.append(url)
+    if new:
+        # 與同時進行的上傳撞到同一份內容時，沿用對方的列
+        db.execute(insert(models.Blob).prefix_with("OR IGNORE", dialect="sqlite"), list(new.values()))
+    return urls
+
+
+def refresh_refs(db: Session, urls: Iterable[str]) -> None:
+    """重算指定 url 的 ref_count（單一 UPDATE）；非 blob 的 url 不受影響。
+
+    在呼叫端的交易內執行，由呼叫端 commit。
+    """
+    urls = [u for u in set(urls or []) if u]
+    if not urls:
+        return
+    db.flush()
+    db.execute(
+        update(models.Blob)
+        .where(models.Blob.url.in_(urls))
+        .values(ref_count=_ref_count_expr(models.Blob.url)),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def refresh_all_refs(db: Session) -> None:
+    db.execute(
+        update(models.Blob).values(ref_count=_ref_count_expr(models.Blob.url)),
+        execution_options={"synchronize_session": False},
+    )
+    db.commit()
+
+
+def collect_garbage(db: Session, grace_seconds: int = 24 * 3600, dry_run: bool = False) -> dict:
+    """回收沒有任何圖片列引用、且超過 grace 期間未被上傳過的 blob。"""
+    refresh_all_refs(db)
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    cond = (
+        (models.Blob.last_seen_at < cutoff)
+        & (_ref_count_expr(models.Blob.url) == 0)
+    )
+    if dry_run:
+        victims = db.execute(select(models.Blob.url, models.Blob.size).where(cond)).all()
+    else:
+        # 刪除時再算一次引用數，避免和同時進行的連結操作競爭
+        victims = db.execute(
+            delete(models.Blob).where(cond).returning(models.Blob.url, models.Blob.size)
+        ).all()
+        db.commit()
+        for url, _ in victims:
+            path = path_for_url(url)
+            # 原檔、縮圖與 static_files --precompress 產生的 .br/.gz
+            for p in [path] + derivative_paths(path) + [path + ".br", path + ".gz"]:
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+
+    # 中斷的上傳留下的暫存檔
+    tmp_removed = 0
+    tmp_dir = blob_tmp_dir()
+    tmp_cutoff = time.time() - grace_seconds
+    for name in os.listdir(tmp_dir):
+        p = os.path.join(tmp_dir, name)
+        if os.path.getmtime(p) < tmp_cutoff:
+            tmp_removed += 1
+            if not dry_run:
+                os.remove(p)
+    return {
+        "deleted": len(victims),
+        "freed_bytes": sum(size or 0 for _, size in victims),
+        "tmp_removed": tmp_removed,
+        "dry_run": dry_run,
+    }
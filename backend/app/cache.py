@@ -0,0 +1,23 @@
+from . import invalidation
+from .database import settings
+from .utils.cache import ResponseCache
+
+# 公開目錄（/api/public/*）的回應快取；寫入路徑以 invalidation.publish 帶上下列 tag，
+# 命中時不查資料庫（見 utils/cache.CachedResponseMiddleware）
+public_cache = ResponseCache(settings.PUBLIC_CACHE_MAX_BYTES, settings.PUBLIC_CACHE_MAX_AGE_S)
+PUBLIC_PREFIX = "/api/public/"
+
+FABRICS = "fabrics"
+CATEGORIES = "categories"
+
+
+def category_tag(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+@invalidation.subscribe
+def _drop_public(change: invalidation.Change) -> None:
+    if invalidation.ALL in change.tags:
+        public_cache.clear()
+    elif change.tags:
+        public_cache.invalidate(*change.tags)
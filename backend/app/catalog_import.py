@@ -0,0 +1,301 @@
+"""布料／商品的批次匯入（manifest＋照片）。
+
+manifest 為 CSV 或 JSONL，每列一筆 FabricCreate / ProductCreate 欄位，另加：
+    images   照片檔名清單（CSV 以 | 分隔；JSONL 為陣列）
+    works    （僅布料）作品照檔名清單
+檔名對應到照片目錄或 zip 內的檔案（zip 內可含子目錄，只比對檔名也可）；
+以 /static/ 開頭的值視為既有 URL 直接沿用。
+
+流程：驗證所有列 → 以 thread pool 併發複製照片進內容定址 blob 區（一次登記）→
+每 CHUNK 列一個交易，以 executemany 的 insert() 寫入主表、圖片表與全文索引。
+單列錯誤（欄位、找不到照片、分類不存在）記在報告裡並略過該列，其餘照常匯入。
+
+用法（於 backend/ 下）：
+    python -m app.catalog_import fabrics manifest.csv --photos photos.zip
+    python -m app.catalog_import products manifest.jsonl --photos ./photos/
+"""
+import argparse
+import csv
+import json
+import os
+import uuid
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from . import invalidation, models, schemas, search
+from .blobstore import commit_many, refresh_refs
+from .cache import FABRICS
+from .database import settings
+from .utils.paths import blob_tmp_dir, path_for_url
+from .utils.streaming import StoredFile, copy_to_disk
+
+CHUNK = 1000
+PHOTO_WORKERS = 8
+MAX_REPORTED_ERRORS = 100
+
+KINDS = {
+    "fabrics": (models.Fabric, schemas.FabricCreate, {"images": models.FabricImage, "works": models.FabricWork}, "fabric_id"),
+    "products": (models.Product, schemas.ProductCreate, {"images": models.ProductImage}, "product_id"),
+}
+
+
+@dataclass
+class ImportReport:
+    created: int = 0
+    ids: List[int] = field(default_factory=list)
+    photos: int = 0
+    errors: List[dict] = field(default_factory=list)
+    error_count: int = 0
+
+    def error(self, row: int, msg) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "error": msg})
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.error_count == 0,
+            "created": self.created,
+            "ids": self.ids,
+            "photos": self.photos,
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+            "error_count": self.error_count,
+        }
+
+
+# ---- manifest ----
+def _split(v) -> List[str]:
+    if v is None:
+        return []
+    if isinstance(v, list):
+        return [str(x).strip() for x in v if str(x).strip()]
+    return [x.strip() for x in str(v).split("|") if x.strip()]
+
+
+def read_manifest(text: Iterable[str], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """逐列產生 (列號, 資料, 錯誤)；列號從 1 起算（CSV 不含表頭）。"""
+    if fmt == "csv":
+        for n, row in enumerate(csv.DictReader(text), start=1):
+            yield n, {k: v for k, v in row.items() if k and v not in (None, "")}, None
+        return
+    for n, line in enumerate(text, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield n, json.loads(line), None
+        except ValueError as e:
+            yield n, None, f"invalid JSON: {e}"
+
+
+def guess_format(filename: str) -> str:
+    return "csv" if (filename or "").lower().endswith(".csv") else "jsonl"
+
+
+# ---- photos ----
+class PhotoSource:
+    """照片目錄或 zip；以相對路徑或檔名查找。"""
+
+    def __init__(self, path: Optional[str] = None, fileobj=None):
+        self.zip = None
+        self.root = None
+        self.names: Dict[str, str] = {}
+        if fileobj is not None or (path and zipfile.is_zipfile(path)):
+            self.zip = zipfile.ZipFile(fileobj or path)
+            entries = [i.filename for i in self.zip.infolist() if not i.is_dir()]
+        elif path:
+            self.root = os.path.realpath(path)
+            entries = [
+                os.path.relpath(os.path.join(d, f), self.root).replace(os.sep, "/")
+                for d, _, files in os.walk(self.root)
+                for f in files
+            ]
+        else:
+            entries = []
+        for e in entries:
+            self.names.setdefault(os.path.basename(e), e)
+            self.names[e] = e
+
+    def find(self, name: str) -> Optional[str]:
+        return self.names.get(name.replace("\\", "/").lstrip("/"))
+
+    def open(self, entry: str):
+        if self.zip is not None:
+            return self.zip.open(entry)
+        return open(os.path.join(self.root, entry), "rb")
+
+    def close(self) -> None:
+        if self.zip is not None:
+            self.zip.close()
+
+
+def _copy_photo(src: PhotoSource, entry: str, tmp_dir: str) -> StoredFile:
+    tmp = os.path.join(tmp_dir, f"{os.getpid()}_{uuid.uuid4().hex}.part")
+    with src.open(entry) as f:
+        return copy_to_disk(f, tmp, settings.UPLOAD_MAX_FILE_BYTES)
+
+
+def store_photos(db: Session, src: PhotoSource, entries: List[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """併發複製照片並登記 blob；回傳 ({entry: url}, {entry: 錯誤})。"""
+    tmp_dir = blob_tmp_dir()
+    stored: Dict[str, StoredFile] = {}
+    failed: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=PHOTO_WORKERS) as pool:
+        futures = {e: pool.submit(_copy_photo, src, e, tmp_dir) for e in entries}
+        for e, fut in futures.items():
+            try:
+                stored[e] = fut.result()
+            except Exception as ex:
+                failed[e] = f"photo {e}: {ex}"
+    if not stored:
+        return {}, failed
+    keys = list(stored)
+    exts = [os.path.splitext(k)[1].lower() or ".jpg" for k in keys]
+    urls = commit_many(db, [(stored[k], ext) for k, ext in zip(keys, exts)])
+    db.commit()
+    return dict(zip(keys, urls)), failed
+
+
+# ---- import ----
+def run_import(db: Session, kind: str, rows: Iterable, photos: Optional[PhotoSource]) -> Tuple[ImportReport, List[str]]:
+    """匯入並回傳 (報告, 新照片的檔案路徑)；縮圖由呼叫端產生。"""
+    model, schema, image_tables, fk = KINDS[kind]
+    report = ImportReport()
+
+    # 1. 驗證欄位並收集照片參照
+    pending: List[Tuple[int, dict, Dict[str, List[str]]]] = []
+    for n, raw, err in rows:
+        if err or not isinstance(raw, dict):
+            report.error(n, err or "row must be an object")
+            continue
+        galleries = {g: _split(raw.pop(g, None)) for g in image_tables}
+        try:
+            data = schema.model_validate(raw).model_dump()
+        except ValidationError as e:
+            report.error(n, e.errors(include_url=False))
+            continue
+        pending.append((n, data, galleries))
+
+    if kind == "products":
+        cat_ids = sorted({d["category_id"] for _, d, _ in pending})
+        found = set()
+        for start in range(0, len(cat_ids), 500):
+            found.update(db.scalars(
+                select(models.Category.id).where(models.Category.id.in_(cat_ids[start:start + 500]))
+            ))
+        kept = []
+        for n, d, g in pending:
+            if d["category_id"] in found:
+                kept.append((n, d, g))
+            else:
+                report.error(n, f"category_id not found: {d['category_id']}")
+        pending = kept
+
+    # 2. 照片：找出對應檔案、併發複製並登記
+    entry_of: Dict[str, Optional[str]] = {}
+    for _, _, galleries in pending:
+        for names in galleries.values():
+            for name in names:
+                if not name.startswith("/static/") and name not in entry_of:
+                    entry_of[name] = photos.find(name) if photos else None
+    entries = sorted({e for e in entry_of.values() if e})
+    url_of, failed = store_photos(db, photos, entries) if entries else ({}, {})
+    report.photos = len(url_of)
+
+    resolved = []
+    for n, d, galleries in pending:
+        urls: Dict[str, List[str]] = {}
+        problems = []
+        for g, names in galleries.items():
+            urls[g] = []
+            for name in names:
+                if name.startswith("/static/"):
+                    urls[g].append(name)
+                elif entry_of.get(name) is None:
+                    problems.append(f"photo not found: {name}")
+                elif entry_of[name] in failed:
+                    problems.append(failed[entry_of[name]])
+                else:
+                    urls[g].append(url_of[entry_of[name]])
+            urls[g] = list(dict.fromkeys(urls[g]))
+        if problems:
+            report.error(n, "; ".join(problems))
+        else:
+            resolved.append((n, d, urls))
+
+    # 3. 分批寫入；每批一個交易，失敗只影響該批
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    stmt = insert(model).returning(model.id, sort_by_parameter_order=not sqlite)
+    for start in range(0, len(resolved), CHUNK):
+        chunk = resolved[start:start + CHUNK]
+        try:
+            ids = db.scalars(stmt, [d for _, d, _ in chunk]).all()
+            if sqlite:
+                ids = sorted(ids)  # 同一個多列 INSERT 的 rowid 依 VALUES 順序遞增
+            all_urls = []
+            for g, table in image_tables.items():
+                gallery = [
+                    {fk: i, "url": u, "position": pos}
+                    for i, (_, _, urls) in zip(ids, chunk)
+                    for pos, u in enumerate(urls[g])
+                ]
+                if gallery:
+                    db.execute(insert(table), gallery)
+                all_urls += [r["url"] for r in gallery]
+            indexed = [{**d, "id": i} for i, (_, d, _) in zip(ids, chunk)]
+            if kind == "fabrics":
+                search.index_fabric_rows(db, indexed)
+            else:
+                search.index_product_rows(db, indexed)
+            refresh_refs(db, all_urls)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for n, _, _ in chunk:
+                report.error(n, f"insert failed: {e}")
+            continue
+        report.created += len(ids)
+        report.ids.extend(ids)
+
+    return report, [path_for_url(url_of[e]) for e in entries if e in url_of]
+
+
+def main(argv=None):
+    from . import derivatives
+    from .database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Bulk import fabrics or products")
+    parser.add_argument("kind", choices=sorted(KINDS))
+    parser.add_argument("manifest")
+    parser.add_argument("--photos", help="photo directory or zip")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    args = parser.parse_args(argv)
+
+    init_db()
+    photos = PhotoSource(args.photos) if args.photos else None
+    db = SessionLocal()
+    try:
+        with open(args.manifest, encoding="utf-8-sig", newline="") as f:
+            rows = read_manifest(f, args.format or guess_format(args.manifest))
+            report, new_photos = run_import(db, args.kind, rows, photos)
+    finally:
+        db.close()
+        if photos:
+            photos.close()
+    derivatives.render_many(new_photos)
+    if report.created:
+        # 通知執行中的 worker 清掉 public 快取
+        invalidation.publish(args.kind, (), "import", (FABRICS,) if args.kind == "fabrics" else (invalidation.ALL,))
+    print(json.dumps({k: v for k, v in report.as_dict().items() if k != "ids"}, ensure_ascii=False, indent=2))
+    if report.error_count:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,233 @@
-from sqlalchemy import create_engine
+from fastapi import Depends
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 from pydantic_settings import BaseSettings, SettingsConfigDict
+import functools
+import inspect
 import os
 
 
 class Settings(BaseSettings):
+    """全部設定（環境變數或 .env）；整個 app 只有這一份。"""
+    SECRET_KEY: str = "dev"
     DATABASE_URL: str = "sqlite:///./app.db"
-    # 忽略 .env 中多餘的鍵（如 SECRET_KEY、CORS_ALLOW_ORIGINS），避免 ValidationError
+    CORS_ALLOW_ORIGINS: str = "http://127.0.0.1:5173,http://localhost:5173"
+    # 啟動時（lifespan）套用遷移；0 = 由部署流程先跑 python -m app.migrations upgrade
+    AUTO_MIGRATE: bool = True
+    # router 於啟動後在背景載入，第一個打到尚未載入前綴的請求會等它載入
+    LAZY_ROUTERS: bool = True
+    PUBLIC_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # 快取命中不查資料庫；沒有經過 invalidation 的異動（直接改資料庫）最多這麼久後可見
+    PUBLIC_CACHE_MAX_AGE_S: float = 60
+    # 跨 worker 的快取失效通道（見 app/invalidation.py）："sqlite" 或 "local"（單一行程）
+    INVALIDATION_BUS: str = "sqlite"
+    # 空字串 = 資料庫旁的 <db>.events
+    INVALIDATION_BUS_PATH: str = ""
+    INVALIDATION_POLL_MS: int = 250
+    INVALIDATION_RETAIN_S: int = 300
+    UPLOAD_MAX_FILE_BYTES: int = 25 * 1024 * 1024
+    UPLOAD_MAX_REQUEST_BYTES: int = 200 * 1024 * 1024
+    THUMBNAIL_WORKERS: int = 2
+    # SQLite 連線設定："tuned"（WAL＋pragmas）或 "default"（SQLite 預設值）
+    SQLITE_PROFILE: str = "tuned"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_BYTES: int = 256 * 1024 * 1024
+    SQLITE_CACHE_KB: int = 64 * 1024
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 30
+    # public 路由改用唯讀連線（獨立的連線池，PRAGMA query_only）
+    PUBLIC_READ_ONLY: bool = False
+    # 路由改用 AsyncEngine/AsyncSession（需 aiosqlite 或 asyncpg）
+    ASYNC_DB: bool = False
+    # /api/metrics 與每個請求的延遲／SQL 統計
+    METRICS_ENABLED: bool = True
+    # 大型列表直接由欄位 tuple 組成 JSON（見 app/fastjson.py）；0 = ORM＋Pydantic
+    FAST_JSON: bool = True
+    # 開發用：記錄每個請求的 SQL、偵測 N+1、EXPLAIN 慢查詢（見 app/profiler.py）
+    SQL_PROFILE: bool = False
+    SQL_PROFILE_SLOW_MS: float = 50
+    SQL_PROFILE_N_PLUS_ONE: int = 5
+    SQL_PROFILE_KEEP: int = 200
+    # 忽略 .env 中多餘的鍵，避免 ValidationError
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
 
 settings = Settings()
 
-connect_args = (
-    {"check_same_thread": False} if settings.DATABASE_URL.startswith("sqlite") else {}
-)
-engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, future=True)
+
+def sqlite_pragmas(profile: str, read_only: bool = False) -> list:
+    if profile == "default":
+        pragmas = []
+    elif profile == "tuned":
+        pragmas = [
+            # WAL：讀不擋寫、寫不擋讀；NORMAL 在 WAL 下只在 checkpoint 時 fsync
+            "journal_mode = WAL",
+            "synchronous = NORMAL",
+            f"busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+            f"mmap_size = {settings.SQLITE_MMAP_BYTES}",
+            f"cache_size = -{settings.SQLITE_CACHE_KB}",
+            "temp_store = MEMORY",
+        ]
+    else:
+        raise ValueError(f"unknown SQLITE_PROFILE: {profile}")
+    if read_only:
+        pragmas.append("query_only = ON")
+    return pragmas
+
+
+def async_url(url: str) -> str:
+    """sqlite:///x.db → sqlite+aiosqlite:///x.db、postgresql://… → postgresql+asyncpg://…"""
+    scheme, rest = url.split("://", 1)
+    if "+" in scheme:
+        return url
+    driver = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}.get(scheme)
+    if driver is None:
+        raise ValueError(f"no async driver for {scheme}")
+    return f"{scheme}+{driver}://{rest}"
+
+
+def make_engine(url: str, profile: str = None, read_only: bool = False, use_async: bool = False):
+    """依設定建立 Engine（use_async 時為 AsyncEngine，pragma 同樣套用在每條連線）。"""
+    pool = dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+    if use_async:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        create, url = create_async_engine, async_url(url)
+    else:
+        create = create_engine
+    if not url.startswith("sqlite"):
+        return create(url, pool_pre_ping=True, future=True, **pool)
+    pragmas = sqlite_pragmas(profile or settings.SQLITE_PROFILE, read_only)
+    kwargs = pool if ":memory:" not in url and pragmas else {}
+    if kwargs and use_async:
+        # aiosqlite 預設為 NullPool（每個請求重新連線並重跑 pragma）
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        kwargs = dict(kwargs, poolclass=AsyncAdaptedQueuePool)
+    eng = create(url, connect_args={"check_same_thread": False}, future=True, **kwargs)
+
+    @event.listens_for(eng.sync_engine if use_async else eng, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            for p in pragmas:
+                cur.execute(f"PRAGMA {p}")
+        finally:
+            cur.close()
+
+    return eng
+
+
+engine = make_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 
+if settings.PUBLIC_READ_ONLY:
+    read_engine = make_engine(settings.DATABASE_URL, read_only=True)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine, future=True)
+else:
+    read_engine, ReadSessionLocal = engine, SessionLocal
+
+# ASYNC_DB：路由改為 async def，在事件迴圈上以 AsyncSession 執行，不佔 threadpool
+if settings.ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = make_engine(settings.DATABASE_URL, use_async=True)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=True)
+    if settings.PUBLIC_READ_ONLY:
+        async_read_engine = make_engine(settings.DATABASE_URL, read_only=True, use_async=True)
+        AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False)
+    else:
+        async_read_engine, AsyncReadSessionLocal = async_engine, AsyncSessionLocal
+else:
+    async_engine = async_read_engine = AsyncSessionLocal = AsyncReadSessionLocal = None
+
+
+# ---- request-scoped sessions ----
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+_ASYNC_DEPS = {get_db: get_async_db, get_read_db: get_async_read_db}
+
+
+def session_route(fn):
+    """讓以同步 Session 撰寫的路由在 ASYNC_DB 時改以 AsyncSession 執行。
+
+    fn 須有 db: Session = Depends(get_db | get_read_db) 參數；ASYNC_DB 時回傳
+    async 版本：相依改為對應的 AsyncSession，函式本體以 run_sync 在同一個
+    greenlet 內執行（SQL I/O 經由非同步驅動等待，不阻塞事件迴圈）。
+    """
+    if not settings.ASYNC_DB:
+        return fn
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    sig = inspect.signature(fn)
+    dep = sig.parameters["db"].default
+    params = [
+        p.replace(default=Depends(_ASYNC_DEPS[dep.dependency]), annotation=AsyncSession)
+        if p.name == "db" else p
+        for p in sig.parameters.values()
+    ]
+
+    @functools.wraps(fn)
+    async def endpoint(*args, db, **kwargs):
+        return await db.run_sync(lambda s: fn(*args, db=s, **kwargs))
+
+    endpoint.__signature__ = sig.replace(parameters=params)
+    return endpoint
+
 
 class Base(DeclarativeBase):
     pass
 
 
-def init_db():
-    from . import models  # noqa
+def init_db(make_backup: bool = True, log=None) -> None:
+    """套用遷移並補齊 table_versions；多個 worker 同時啟動時以檔案鎖序列化。
+
+    已是最新版時只做兩個唯讀查詢、不取鎖，所以其餘 worker 幾乎不花時間。
+    """
+    from . import migrations, versions
+    from .utils.filelock import file_lock
+
+    def up_to_date() -> bool:
+        if migrations.pending(engine):
+            return False
+        with engine.connect() as conn:
+            return not versions.missing_rows(conn)
 
-    Base.metadata.create_all(bind=engine)
+    if up_to_date():
+        return
+    with file_lock(migrations.lock_path(engine)):
+        # 等鎖期間可能已由其他 worker 完成
+        if up_to_date():
+            return
+        migrations.upgrade(engine, make_backup=make_backup, log=log)
+        with engine.begin() as conn:
+            versions.ensure_rows(conn)
@@ -0,0 +1,169 @@
+"""上傳圖片的縮圖（多尺寸 WebP/JPEG），在 ProcessPoolExecutor 上產生。
+
+衍生檔與原檔放在同一個內容定址目錄：<sha256>_w<寬>.<webp|jpg>，
+已存在就略過，所以同一份內容只會算一次。回應裡只列出磁碟上確實存在的
+衍生檔；縮圖失敗或還沒產生時 variants 為空，前端改用原圖。
+
+補產生既有圖片的縮圖（於 backend/ 下）：
+    python -m app.derivatives
+"""
+import asyncio
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+from .database import settings
+from .utils.paths import path_for_url
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (160, 480, 1200)
+FORMATS = (("webp", "WEBP"), ("jpg", "JPEG"))
+SOURCE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# 只有內容定址的 blob 才有衍生檔
+_BLOB_URL = re.compile(r"^(/static/uploads/blobs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64})(\.[a-z0-9]+)$")
+
+try:
+    import PIL  # noqa: F401
+
+    ENABLED = True
+except ImportError:  # Pillow 為選用相依；沒有就不產生縮圖
+    ENABLED = False
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+# 衍生檔已全部產生的 url → variants；內容定址的檔案不會再變，確認過就不必再 stat
+_complete: Dict[str, List[dict]] = {}
+_COMPLETE_MAX = 100_000
+
+
+def _derivative_name(base: str, width: int, ext: str) -> str:
+    return f"{base}_w{width}.{ext}"
+
+
+def variants_for_url(url: str) -> List[dict]:
+    if not ENABLED:
+        return []
+    hit = _complete.get(url)
+    if hit is not None:
+        return hit
+    m = _BLOB_URL.match(url or "")
+    if not m or m.group(2) not in SOURCE_EXTS:
+        return []
+    base = path_for_url(m.group(1))
+    out = [
+        {"width": w, "format": ext, "url": _derivative_name(m.group(1), w, ext)}
+        for w in WIDTHS
+        for ext, _ in FORMATS
+        if os.path.exists(_derivative_name(base, w, ext))
+    ]
+    if len(out) == len(WIDTHS) * len(FORMATS):
+        if len(_complete) >= _COMPLETE_MAX:
+            _complete.clear()
+        _complete[url] = out
+    return out
+
+
+def derivative_paths(src_path: str) -> List[str]:
+    base, ext = os.path.splitext(src_path)
+    if ext not in SOURCE_EXTS:
+        return []
+    return [_derivative_name(base, w, e) for w in WIDTHS for e, _ in FORMATS]
+
+
+def render(src_path: str) -> int:
+    """在子行程內執行：產生缺少的衍生檔，回傳新產生的數量。"""
+    from PIL import Image, ImageOps
+
+    base, ext = os.path.splitext(src_path)
+    if ext not in SOURCE_EXTS:
+        return 0
+    todo = [
+        (w, e, fmt)
+        for w in WIDTHS
+        for e, fmt in FORMATS
+        if not os.path.exists(_derivative_name(base, w, e))
+    ]
+    if not todo:
+        return 0
+    made = 0
+    with Image.open(src_path) as im:
+        im = ImageOps.exif_transpose(im)
+        for w in sorted({w for w, _, _ in todo}, reverse=True):
+            resized = im.copy()
+            resized.thumbnail((w, w * 10), Image.LANCZOS)  # 依寬度縮放，不放大
+            for tw, e, fmt in todo:
+                if tw != w:
+                    continue
+                out = _derivative_name(base, w, e)
+                tmp = f"{out}.{os.getpid()}.part"
+                img = resized.convert("RGB") if fmt == "JPEG" else resized
+                img.save(tmp, fmt, quality=82, **({"progressive": True} if fmt == "JPEG" else {}))
+                os.replace(tmp, out)
+                made += 1
+    return made
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS)
+    return _pool
+
+
+async def generate(paths: List[str]) -> None:
+    """併發地把多張圖送進行程池；失敗只記錄，不影響上傳結果。"""
+    if not ENABLED or not paths:
+        return
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    results = await asyncio.gather(
+        *(loop.run_in_executor(pool, render, p) for p in paths), return_exceptions=True
+    )
+    for p, r in zip(paths, results):
+        if isinstance(r, BaseException):
+            logger.warning("thumbnail generation failed for %s: %s", p, r)
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def main():
+    from .database import SessionLocal, init_db
+    from . import models
+
+    init_db()
+    db = SessionLocal()
+    try:
+        paths = [path_for_url(u) for (u,) in db.query(models.Blob.url).all()]
+    finally:
+        db.close()
+    made = render_many(paths)
+    print(f"{made} derivatives written for {len(paths)} blobs")
+
+
+def render_many(paths: List[str]) -> int:
+    """離線批次（CLI）用：以獨立的行程池產生縮圖，回傳新產生的數量。"""
+    if not ENABLED or not paths:
+        return 0
+    with ProcessPoolExecutor(max_workers=settings.THUMBNAIL_WORKERS) as pool:
+        return sum(pool.map(_safe_render, paths, chunksize=8))
+
+
+def _safe_render(path: str) -> int:
+    try:
+        return render(path)
+    except Exception as e:  # 損壞或不支援的圖檔
+        logger.warning("thumbnail generation failed for %s: %s", path, e)
+        return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""訂單與型錄的串流匯出（NDJSON / CSV）。
+
+列表 API 會先把整個結果建成 list 再回應；匯出改用 StreamingResponse，
+以 keyset 分頁分批從資料庫讀取，每批的關聯由 selectinload 一次載入，
+送出後即 expunge，記憶體用量與總筆數無關。
+
+FastAPI 在開始串流前就會關閉 Depends 建立的 session，
+所以產生器自己開關 SessionLocal。
+"""
+import csv
+import io
+from datetime import datetime
+from typing import Callable, Iterator, List
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session
+
+from . import models
+from .database import SessionLocal
+
+EXPORT_BATCH = 500
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+FABRIC_COLUMNS = [
+    "id", "name", "origin", "price", "size", "description",
+    "on_clearance", "clearance_price", "created_at", "images", "works",
+]
+PRODUCT_COLUMNS = [
+    "id", "name", "category_id", "price", "promo_price", "size",
+    "description", "created_at", "images",
+]
+# 與 POST /api/orders/bulk/upload 的 CSV 欄位相容（order_ref 即訂單 id）
+ORDER_COLUMNS = [
+    "order_ref", "customer_name", "description", "order_status", "payment_status",
+    "created_at", "item_id", "product_id", "fabric_id", "state",
+    "original_price", "adjustment", "final_price", "item_description",
+]
+
+
+def _urls(images) -> str:
+    return " ".join(i.url for i in images)
+
+
+def fabric_rows(f: models.Fabric) -> List[list]:
+    return [[
+        f.id, f.name, f.origin, f.price, f.size, f.description,
+        int(bool(f.on_clearance)), f.clearance_price, f.created_at.isoformat(),
+        _urls(f.images), _urls(f.works),
+    ]]
+
+
+def product_rows(p: models.Product) -> List[list]:
+    return [[
+        p.id, p.name, p.category_id, p.price, p.promo_price, p.size,
+        p.description, p.created_at.isoformat(), _urls(p.images),
+    ]]
+
+
+def order_rows(o: models.Order) -> List[list]:
+    head = [
+        o.id, o.customer_name, o.description, o.order_status, o.payment_status,
+        o.created_at.isoformat(),
+    ]
+    if not o.items:
+        return [head + [""] * 8]
+    return [
+        head + [
+            it.id, it.product_id, it.fabric_id or "", it.state,
+            it.original_price, it.adjustment, it.final_price, it.description,
+        ]
+        for it in o.items
+    ]
+
+
+def _batches(build: Callable[[Session], Query], sort_col, id_col) -> Iterator[list]:
+    """以 (sort_col, id) keyset 分頁讀取 id，每批再以 IN 載入實體（含 selectinload 關聯）。
+
+    每一頁 id 都先完整讀完才送出載入實體的查詢，同一個連線上不會留著
+    讀到一半的 cursor（yield_per 串流 id 時 selectinload 的子查詢會和它共用連線）。
+    """
+    db = SessionLocal()
+    try:
+        after = None
+        while True:
+            keys = build(db).order_by(None).with_entities(sort_col, id_col)
+            if after is not None:
+                keys = keys.filter(tuple_(sort_col, id_col) > after)
+            page = keys.order_by(sort_col, id_col).limit(EXPORT_BATCH).all()
+            if not page:
+                return
+            ids = [row[1] for row in page]
+            yield build(db).filter(id_col.in_(ids)).order_by(sort_col, id_col).all()
+            db.expunge_all()
+            if len(page) < EXPORT_BATCH:
+                return
+            after = tuple(page[-1])
+    finally:
+        db.close()
+
+
+def _ndjson(batches: Iterator[list], schema) -> Iterator[bytes]:
+    for part in batches:
+        yield b"".join(schema.model_validate(o).model_dump_json().encode() + b"\n" for o in part)
+
+
+def _csv(batches: Iterator[list], columns: List[str], to_rows) -> Iterator[bytes]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(columns)
+    # 加 BOM 讓 Excel 以 UTF-8 開啟中文
+    yield "﻿".encode() + buf.getvalue().encode()
+    for part in batches:
+        buf.seek(0)
+        buf.truncate()
+        for o in part:
+            w.writerows(to_rows(o))
+        yield buf.getvalue().encode()
+
+
+def export_response(
+    name: str,
+    fmt: str,
+    build: Callable[[Session], Query],
+    sort_col,
+    id_col,
+    schema: type[BaseModel],
+    columns: List[str],
+    to_rows: Callable[[object], List[list]],
+) -> StreamingResponse:
+    batches = _batches(build, sort_col, id_col)
+    body = _csv(batches, columns, to_rows) if fmt == "csv" else _ndjson(batches, schema)
+    filename = f"{name}-{datetime.utcnow():%Y%m%d}.{fmt}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,143 @@
+"""大型列表的快速序列化：直接由欄位 tuple 組出回應，不建 ORM 物件、不經 Pydantic。
+
+輸出與 FabricOut / ProductOut / OrderOut 的 JSON 逐位元組相同（欄位順序、
+float、datetime 格式、圖片 variants）；schemas 增減欄位時這裡要一起改。
+以 orjson 編碼；沒有安裝 orjson 時退回標準庫 json（輸出相同，只是較慢）。
+FAST_JSON=0 可改回 ORM＋Pydantic 的路徑。
+"""
+import json
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Sequence
+
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+from .derivatives import variants_for_url
+
+try:
+    import orjson
+except ImportError:  # orjson 為選用相依
+    orjson = None
+
+IN_CHUNK = 900
+
+FABRIC_COLUMNS = (
+    models.Fabric.id, models.Fabric.name, models.Fabric.origin, models.Fabric.price,
+    models.Fabric.size, models.Fabric.description, models.Fabric.on_clearance,
+    models.Fabric.clearance_price, models.Fabric.created_at, models.Fabric.effective_price,
+)
+PRODUCT_COLUMNS = (
+    models.Product.id, models.Product.name, models.Product.category_id, models.Product.price,
+    models.Product.size, models.Product.description, models.Product.promo_price,
+    models.Product.created_at, models.Product.effective_price,
+)
+ORDER_COLUMNS = (
+    models.Order.id, models.Order.customer_name, models.Order.description,
+    models.Order.order_status, models.Order.payment_status, models.Order.created_at,
+    models.Order.total, models.Order.item_count,
+)
+
+
+def _default(v):
+    if isinstance(v, date):
+        return v.isoformat()
+    raise TypeError(f"{type(v).__name__} is not JSON serializable")
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=_default).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def respond(data, response: Response = None) -> FastJSONResponse:
+    """回傳 data；並帶上路由注入的 Response 已設定的標頭（ETag、X-Next-Cursor 等）。"""
+    out = FastJSONResponse(data)
+    if response is not None:
+        out.raw_headers.extend(response.raw_headers)
+    return out
+
+
+# ---- row builders ----
+def _by_parent(db: Session, columns, fk, ids: Sequence[int], order) -> Dict[int, list]:
+    out: Dict[int, list] = defaultdict(list)
+    for start in range(0, len(ids), IN_CHUNK):
+        chunk = ids[start:start + IN_CHUNK]
+        for row in db.execute(select(fk, *columns).where(fk.in_(chunk)).order_by(*order)):
+            out[row[0]].append(row)
+    return out
+
+
+def _images(db: Session, model, fk, ids: Sequence[int]) -> Dict[int, List[dict]]:
+    rows = _by_parent(db, (model.id, model.url), fk, ids, (fk, model.position, model.id))
+    return {
+        parent: [{"id": r.id, "url": r.url, "variants": variants_for_url(r.url)} for r in group]
+        for parent, group in rows.items()
+    }
+
+
+def fabric_rows(db: Session, rows) -> List[dict]:
+    ids = [r.id for r in rows]
+    images = _images(db, models.FabricImage, models.FabricImage.fabric_id, ids)
+    works = _images(db, models.FabricWork, models.FabricWork.fabric_id, ids)
+    return [
+        {
+            "name": r.name, "origin": r.origin, "price": float(r.price), "size": r.size,
+            "description": r.description, "on_clearance": bool(r.on_clearance),
+            "clearance_price": float(r.clearance_price),
+            "id": r.id, "created_at": r.created_at, "effective_price": float(r.effective_price),
+            "images": images.get(r.id, []), "works": works.get(r.id, []),
+        }
+        for r in rows
+    ]
+
+
+def product_rows(db: Session, rows) -> List[dict]:
+    images = _images(db, models.ProductImage, models.ProductImage.product_id, [r.id for r in rows])
+    return [
+        {
+            "name": r.name, "category_id": r.category_id, "price": float(r.price), "size": r.size,
+            "description": r.description, "promo_price": float(r.promo_price),
+            "id": r.id, "created_at": r.created_at, "effective_price": float(r.effective_price),
+            "images": images.get(r.id, []),
+        }
+        for r in rows
+    ]
+
+
+def order_rows(db: Session, rows) -> List[dict]:
+    Item = models.OrderItem
+    items = _by_parent(
+        db,
+        (
+            Item.product_id, Item.fabric_id, Item.state, Item.adjustment, Item.description,
+            Item.id, Item.original_price, Item.final_price,
+        ),
+        Item.order_id, [r.id for r in rows], (Item.order_id, Item.id),
+    )
+    return [
+        {
+            "id": r.id, "customer_name": r.customer_name, "description": r.description,
+            "order_status": r.order_status, "payment_status": r.payment_status,
+            "created_at": r.created_at, "total": float(r.total), "item_count": r.item_count,
+            "items": [
+                {
+                    "product_id": i.product_id, "fabric_id": i.fabric_id, "state": i.state,
+                    "adjustment": float(i.adjustment), "description": i.description, "id": i.id,
+                    "original_price": float(i.original_price), "final_price": float(i.final_price),
+                }
+                for i in items.get(r.id, [])
+            ],
+        }
+        for r in rows
+    ]
@@ -0,0 +1,78 @@
+"""有序圖庫（FabricImage / FabricWork / ProductImage）的差異同步。
+
+以 position 排序；同步時只刪除不再需要的列、只新增缺少的 url、只更新
+順序有變的 position，既有列的 id 不變。在呼叫端的交易內執行，由呼叫端
+refresh_refs 與 commit。
+"""
+from dataclasses import dataclass, field
+from typing import Iterable, List
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+
+@dataclass
+class GalleryDiff:
+    inserted: int = 0
+    deleted: int = 0
+    moved: int = 0
+    # ref_count 可能改變的 url（新增或移除者）
+    touched: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.deleted or self.moved)
+
+
+def current_urls(db: Session, model, fk: str, parent_id: int) -> List[str]:
+    col = getattr(model, fk)
+    return list(db.scalars(
+        select(model.url).where(col == parent_id).order_by(model.position, model.id)
+    ))
+
+
+def sync(db: Session, model, fk: str, parent_id: int, urls: Iterable[str]) -> GalleryDiff:
+    """讓 parent 的圖庫等於 urls（去重、保留順序）。"""
+    col = getattr(model, fk)
+    rows = db.execute(
+        select(model.id, model.url, model.position)
+        .where(col == parent_id)
+        .order_by(model.position, model.id)
+    ).all()
+    want = list(dict.fromkeys(u for u in urls if u))
+    wanted = set(want)
+
+    keep, drop = {}, []
+    for r in rows:
+        if r.url in wanted and r.url not in keep:
+            keep[r.url] = r
+        else:
+            drop.append(r)
+    moves = [
+        {"id": keep[u].id, "position": i}
+        for i, u in enumerate(want)
+        if u in keep and keep[u].position != i
+    ]
+    adds = [
+        {fk: parent_id, "url": u, "position": i}
+        for i, u in enumerate(want)
+        if u not in keep
+    ]
+
+    if drop:
+        db.execute(delete(model).where(model.id.in_([r.id for r in drop])))
+    if moves:
+        db.execute(update(model), moves)
+    if adds:
+        db.execute(insert(model), adds)
+    return GalleryDiff(
+        inserted=len(adds),
+        deleted=len(drop),
+        moved=len(moves),
+        touched=[r.url for r in drop] + [a["url"] for a in adds],
+    )
+
+
+def append(db: Session, model, fk: str, parent_id: int, urls: Iterable[str]) -> GalleryDiff:
+    """把尚未存在的 url 依序接在最後（冪等）。"""
+    return sync(db, model, fk, parent_id, current_urls(db, model, fk, parent_id) + list(urls or []))
@@ -0,0 +1,29 @@
+"""回收未被任何圖片列引用的上傳檔。
+
+用法（於 backend/ 下）：
+    python -m app.gc [--dry-run] [--grace-hours 24]
+"""
+import argparse
+import json
+
+from .database import SessionLocal, init_db
+from .blobstore import collect_garbage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Garbage-collect unreferenced upload blobs")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--grace-hours", type=float, default=24.0)
+    args = parser.parse_args(argv)
+
+    init_db()
+    db = SessionLocal()
+    try:
+        report = collect_garbage(db, int(args.grace_hours * 3600), args.dry_run)
+    finally:
+        db.close()
+    print(json.dumps(report))
+
+
+if __name__ == "__main__":
+    main()
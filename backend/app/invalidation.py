@@ -0,0 +1,217 @@
+"""跨 worker 的快取失效通道。
+
+寫入路徑在 commit 之後以 publish("fabrics", 42, "update", tags) 送出實體層級
+的異動事件：同一行程內的訂閱者（例如 public 快取）立即收到；其他 worker 的
+背景執行緒每 INVALIDATION_POLL_MS 輪詢一次通道，所以各行程的記憶體快取最多
+落後這麼久，不必整個清空，其餘 entry 照常命中。
+
+- "sqlite"（預設）：事件寫進資料庫旁的獨立 SQLite 檔（<db>.events，WAL），
+  同一台機器上的 worker 共用，不需外部服務，也不佔主資料庫的寫入鎖。
+  超過 INVALIDATION_RETAIN_S 的事件由輪詢端清掉；落後到事件已被清掉的
+  worker 收到一個 ALL 事件，整個清空。
+- "local"：只在行程內分派，適用單一 worker 與 CLI。
+多台主機時另寫一個 Bus（例如 Redis pub/sub）加進 BACKENDS 即可。
+
+public 快取命中時不查資料庫，靠這裡的事件清掉舊 entry；沒有經過 publish 的
+異動（直接改資料庫）由 PUBLIC_CACHE_MAX_AGE_S 限制最多多久後可見。
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from .database import settings
+
+logger = logging.getLogger(__name__)
+
+# tag：清空整個快取
+ALL = "*"
+
+
+class Change(NamedTuple):
+    entity: str  # 資源名稱，同 versions.RESOURCES
+    ids: Tuple[int, ...]
+    action: str  # "create" / "update" / "delete" / "import"
+    tags: Tuple[str, ...]  # 受影響的快取 tag
+
+
+Handler = Callable[[Change], None]
+_handlers: List[Handler] = []
+
+
+def subscribe(handler: Handler) -> Handler:
+    """註冊訂閱者；可當 decorator 用。本行程與其他 worker 的事件都會送到。"""
+    _handlers.append(handler)
+    return handler
+
+
+def _deliver(change: Change) -> None:
+    for handler in list(_handlers):
+        try:
+            handler(change)
+        except Exception:
+            logger.exception("invalidation handler failed for %r", change)
+
+
+class Bus:
+    def send(self, change: Change) -> None:
+        raise NotImplementedError
+
+    def start(self, deliver: Handler) -> None:
+        """開始接收其他行程的事件。"""
+
+    def stop(self) -> None:
+        pass
+
+
+class LocalBus(Bus):
+    def send(self, change: Change) -> None:
+        pass
+
+
+class SqliteBus(Bus):
+    def __init__(self, path: str, poll_s: float, retain_s: float):
+        self.path = path
+        self.poll_s = poll_s
+        self.retain_s = retain_s
+        # 每個行程（與每次 fork）各自的來源 id，用來略過自己送出的事件
+        self.origin = uuid.uuid4().hex
+        self.last_id = 0
+        self._local = threading.local()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, "
+                "created REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_events_created ON events (created)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def send(self, change: Change) -> None:
+        self._conn().execute(
+            "INSERT INTO events (origin, created, payload) VALUES (?, ?, ?)",
+            (self.origin, time.time(), json.dumps(change)),
+        )
+
+    def poll(self) -> List[Change]:
+        """回傳上次之後其他行程送出的事件；中間有事件已被清掉時回傳單一 ALL 事件。"""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            rows = conn.execute(
+                "SELECT id, origin, payload FROM events WHERE id > ? ORDER BY id", (self.last_id,)
+            ).fetchall()
+            seq = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+        finally:
+            conn.execute("COMMIT")
+        last = seq[0] if seq else 0
+        if last <= self.last_id:
+            return []
+        lost = not rows or rows[0][0] != self.last_id + 1
+        self.last_id = last
+        if lost:
+            return [Change(ALL, (), "reset", (ALL,))]
+        return [
+            Change(entity, tuple(ids), action, tuple(tags))
+            for _, origin, payload in rows
+            if origin != self.origin
+            for entity, ids, action, tags in [json.loads(payload)]
+        ]
+
+    def prune(self) -> None:
+        self._conn().execute("DELETE FROM events WHERE created < ?", (time.time() - self.retain_s,))
+
+    def start(self, deliver: Handler) -> None:
+        if self._thread is not None:
+            return
+        self.origin = uuid.uuid4().hex
+        seq = self._conn().execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+        # 啟動時快取是空的，之前的事件不用補
+        self.last_id = seq[0] if seq else 0
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, args=(deliver,), name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def _run(self, deliver: Handler) -> None:
+        next_prune = 0.0
+        while not self._stopping.wait(self.poll_s):
+            try:
+                for change in self.poll():
+                    deliver(change)
+                if time.monotonic() >= next_prune:
+                    self.prune()
+                    next_prune = time.monotonic() + max(self.retain_s / 10, 1)
+            except sqlite3.Error:
+                # 下一輪從同一個 last_id 重試，不會漏事件
+                logger.warning("invalidation bus poll failed", exc_info=True)
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=5)
+        self._thread = None
+
+
+def _sqlite_bus() -> SqliteBus:
+    path = settings.INVALIDATION_BUS_PATH
+    if not path:
+        from .database import engine
+        from .migrations import sidecar_path
+
+        path = sidecar_path(engine, ".events")
+    return SqliteBus(path, settings.INVALIDATION_POLL_MS / 1000, settings.INVALIDATION_RETAIN_S)
+
+
+BACKENDS: Dict[str, Callable[[], Bus]] = {
+    "local": LocalBus,
+    "sqlite": _sqlite_bus,
+}
+
+_bus: Optional[Bus] = None
+_bus_lock = threading.Lock()
+
+
+def bus() -> Bus:
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                factory = BACKENDS.get(settings.INVALIDATION_BUS)
+                if factory is None:
+                    raise ValueError(f"unknown INVALIDATION_BUS: {settings.INVALIDATION_BUS}")
+                _bus = factory()
+    return _bus
+
+
+def publish(entity: str, ids: Union[int, Iterable[int]], action: str, tags: Iterable[str] = ()) -> None:
+    """在 commit 之後呼叫：先通知本行程的訂閱者，再送給其他 worker。"""
+    change = Change(entity, (ids,) if isinstance(ids, int) else tuple(ids), action, tuple(tags))
+    _deliver(change)
+    try:
+        bus().send(change)
+    except Exception:
+        # 資料已經 commit，不能讓請求失敗；其他 worker 仍靠版本化的 key 避開舊資料
+        logger.warning("could not publish %r", change, exc_info=True)
+
+
+def start() -> None:
+    bus().start(_deliver)
+
+
+def stop() -> None:
+    if _bus is not None:
+        _bus.stop()
@@ -1,56 +1,195 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from pydantic_settings import BaseSettings
-from typing import List
+"""FastAPI 應用程式。
+
+啟動方式（於 backend/ 下）：
+    uvicorn app.main:app
+    uvicorn --factory app.main:create_app --workers 4
+    gunicorn -k uvicorn.workers.UvicornWorker --preload -w 4 app.main:app
+
+模組層級的 app 在第一次取用時才建立，所以 --factory 只會建一個 app。
+
+import 時不碰資料庫；遷移在 lifespan 啟動時執行（init_db 以檔案鎖序列化，
+只有第一個 worker 真的跑，其餘看到已是最新版就直接略過），或設
+AUTO_MIGRATE=0 改由部署流程先跑 python -m app.migrations upgrade。
+LAZY_ROUTERS=1 時各 router 在開始服務後才於背景 import，worker 能更早接受
+連線；--preload 則在 fork 前先 import 完，各 worker 共用記憶體頁面。
+冷啟動時間：python -m benchmarks.cold_start
+"""
+import asyncio
+import importlib
 import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Tuple
+
+import anyio
+from fastapi import FastAPI, Response
+from fastapi.middleware.cors import CORSMiddleware
+
+from . import derivatives, invalidation, metrics
+from .cache import PUBLIC_PREFIX, public_cache
+from .database import init_db, settings
+from .static_files import UploadFiles
+from .utils.cache import CachedResponseMiddleware
+from .utils.pagination import NEXT_CURSOR_HEADER
+
+VERSION = "0.1.0"
+PROFILE_HEADER = "X-SQL-Profile"
+
+# (模組, 前綴, tag)
+ROUTERS: List[Tuple[str, str, str]] = [
+    ("fabrics", "/api/fabrics", "fabrics"),
+    ("categories", "/api/categories", "categories"),
+    ("products", "/api/products", "products"),
+    ("orders", "/api/orders", "orders"),
+    ("public", "/api/public", "public"),
+    ("uploads", "/api/upload", "uploads"),
+    ("reports", "/api/reports", "reports"),
+    ("imports", "/api/import", "import"),
+]
+
+
+def _import_router(module: str):
+    return importlib.import_module(f".routers.{module}", __package__).router
+
+
+class LazyRouters:
+    """依前綴延後 import router；同一個 router 只會加入一次。
+
+    app.router.routes 只在開始服務前或事件迴圈上修改：路由比對也在事件迴圈上
+    進行，所以其他請求走訪 routes 時不會被改動。
+    """
+
+    def __init__(self, app: FastAPI, specs: List[Tuple[str, str, str]]):
+        self.app = app
+        self.pending: Dict[str, Tuple[str, str]] = {prefix: (module, tag) for module, prefix, tag in specs}
+        self._lock = asyncio.Lock()
+
+    def prefix_for(self, path: str):
+        for prefix in self.pending:
+            if path == prefix or path.startswith(prefix + "/"):
+                return prefix
+        return None
+
+    def _include(self, prefix: str, router) -> None:
+        spec = self.pending.pop(prefix, None)
+        if spec is not None:
+            self.app.include_router(router, prefix=prefix, tags=[spec[1]])
+
+    def load_all_now(self) -> None:
+        """開始服務前，或已在事件迴圈上（產生 openapi 文件）時同步載入全部。"""
+        for prefix, (module, _) in list(self.pending.items()):
+            self._include(prefix, _import_router(module))
+
+    async def load(self, prefix: str) -> None:
+        # import 在 threadpool 進行，不卡住其他請求；include_router 回到事件迴圈上執行
+        async with self._lock:
+            spec = self.pending.get(prefix)
+            if spec is None:
+                return
+            router = await anyio.to_thread.run_sync(_import_router, spec[0])
+            self._include(prefix, router)
+
+    async def load_all(self) -> None:
+        for prefix in list(self.pending):
+            await self.load(prefix)
+
+
+class _LoadRouterMiddleware:
+    def __init__(self, app, routers: LazyRouters):
+        self.app = app
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if self.routers.pending and scope["type"] in ("http", "websocket"):
+            prefix = self.routers.prefix_for(scope["path"])
+            if prefix is not None:
+                await self.routers.load(prefix)
+        await self.app(scope, receive, send)
+
+
+def create_app() -> FastAPI:
+    routers_ref: List[LazyRouters] = []
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if settings.AUTO_MIGRATE:
+            await anyio.to_thread.run_sync(init_db)
+        # 接收其他 worker 的快取失效事件
+        invalidation.start()
+        warm = None
+        if routers_ref[0].pending:
+            warm = asyncio.ensure_future(routers_ref[0].load_all())
+        yield
+        if warm is not None and not warm.done():
+            warm.cancel()
+        invalidation.stop()
+        derivatives.shutdown()
+
+    app = FastAPI(title="Wanshop API", version=VERSION, lifespan=lifespan)
+
+    specs = list(ROUTERS)
+    if settings.SQL_PROFILE:
+        specs.append(("debug", "/api/debug", "debug"))
+    routers = LazyRouters(app, specs)
+    routers_ref.append(routers)
+    if not settings.LAZY_ROUTERS:
+        routers.load_all_now()
+
+    # 最內層：確保路由在比對前已載入
+    app.add_middleware(_LoadRouterMiddleware, routers=routers)
+    # public 快取命中時直接回應，不載入路由、不碰資料庫
+    app.add_middleware(CachedResponseMiddleware, cache=public_cache, prefix=PUBLIC_PREFIX)
+    # CORS
+    allow_origins = [o.strip() for o in settings.CORS_ALLOW_ORIGINS.split(",") if o.strip()]
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=allow_origins or ["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER, PROFILE_HEADER],
+    )
+    if settings.SQL_PROFILE:
+        from . import profiler
+
+        profiler.install()
+        app.add_middleware(profiler.SqlProfilerMiddleware)
+    # 最外層：量到的延遲包含 CORS 與錯誤處理
+    if settings.METRICS_ENABLED:
+        metrics.install()
+        app.add_middleware(metrics.MetricsMiddleware)
+
+        @app.get("/api/metrics", include_in_schema=False)
+        def prometheus_metrics():
+            return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+    # Static files (uploads)
+    static_dir = os.path.join(os.path.dirname(__file__), "static")
+    # ensure the directory exists to avoid RuntimeError on mount
+    os.makedirs(os.path.join(static_dir, "uploads"), exist_ok=True)
+    # blob URL 帶內容指紋：immutable 長效快取；另支援 Range、預壓縮檔與 sendfile
+    app.mount("/static", UploadFiles(directory=static_dir), name="static")
+
+    @app.get("/api/health")
+    def health():
+        return {"status": "ok"}
+
+    @app.get("/__version")
+    def version():
+        return {"version": VERSION}
+
+    def openapi():
+        # 文件要列出全部路由
+        routers.load_all_now()
+        return FastAPI.openapi(app)
+
+    app.openapi = openapi
+    return app
+
 
-from .database import init_db, Base, engine
-from .routers import fabrics, products, categories, orders, public, uploads
-
-class Settings(BaseSettings):
-    SECRET_KEY: str = "dev"
-    DATABASE_URL: str = "sqlite:///./app.db"
-    CORS_ALLOW_ORIGINS: str = "http://127.0.0.1:5173,http://localhost:5173"
-
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
-
-app = FastAPI(title="Wanshop API", version="0.1.0")
-
-# CORS
-allow_origins: List[str] = [o.strip() for o in settings.CORS_ALLOW_ORIGINS.split(",") if o.strip()]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=allow_origins or ["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Static files (uploads)
-static_dir = os.path.join(os.path.dirname(__file__), "static")
-# ensure the directory exists to avoid RuntimeError on mount
-os.makedirs(os.path.join(static_dir, "uploads"), exist_ok=True)
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
-
-# DB init
-init_db()
-
-# Routers
-app.include_router(fabrics.router, prefix="/api/fabrics", tags=["fabrics"])
-app.include_router(categories.router, prefix="/api/categories", tags=["categories"])
-app.include_router(products.router, prefix="/api/products", tags=["products"])
-app.include_router(orders.router, prefix="/api/orders", tags=["orders"])
-app.include_router(public.router, prefix="/api/public", tags=["public"])
-app.include_router(uploads.router, prefix="/api/upload", tags=["uploads"])
-
-@app.get("/api/health")
-def health():
-    return {"status": "ok"}
-
-@app.get("/__version")
-def version():
-    return {"version": "0.1.0"}
+def __getattr__(name: str):
+    # uvicorn app.main:app／from app.main import app 第一次取用時才建立
+    if name == "app":
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
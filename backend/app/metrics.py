@@ -0,0 +1,188 @@
+"""每個路由的延遲、回應大小與 SQL 次數／時間，以 Prometheus 文字格式輸出。
+
+MetricsMiddleware 為純 ASGI middleware（不包 BaseHTTPMiddleware，串流回應
+照常逐塊送出）；路由以樣板（/api/fabrics/{fabric_id}）為標籤，避免基數爆炸。
+SQL 以 Engine 類別層級的 cursor 事件計數，透過 contextvar 記到目前請求上
+（threadpool 與 run_sync 都會帶著 context），請求結束時併入路由統計。
+事件與 /api/metrics 都只在 METRICS_ENABLED 時由 create_app 掛上（install()）。
+
+統計只在事件迴圈執行緒上更新，不需要鎖；多個 worker 行程時各自計數，
+由 Prometheus 分別抓取後加總。
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+UNMATCHED = "<unmatched>"
+
+# 目前請求的 [SQL 次數, SQL 秒數]；請求外（背景工作、CLI）為 None
+_request_sql: ContextVar[Optional[list]] = ContextVar("request_sql", default=None)
+
+
+class _RouteStats:
+    __slots__ = ("latency", "latency_sum", "count", "bytes_sum", "sql", "sql_sum", "sql_seconds", "status")
+
+    def __init__(self):
+        self.latency = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.bytes_sum = 0
+        self.sql = [0] * (len(SQL_COUNT_BUCKETS) + 1)
+        self.sql_sum = 0
+        self.sql_seconds = 0.0
+        self.status: Dict[int, int] = {}
+
+
+class Registry:
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], _RouteStats] = {}
+        self.in_flight = 0
+        # 請求以外的 SQL（啟動時的 migration、背景工作）
+        self.other_sql = 0
+        self.other_sql_seconds = 0.0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int, sql: list) -> None:
+        stats = self.routes.get((method, route))
+        if stats is None:
+            stats = self.routes[(method, route)] = _RouteStats()
+        stats.count += 1
+        stats.latency[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stats.latency_sum += seconds
+        stats.bytes_sum += size
+        stats.sql[bisect_left(SQL_COUNT_BUCKETS, sql[0])] += 1
+        stats.sql_sum += sql[0]
+        stats.sql_seconds += sql[1]
+        stats.status[status] = stats.status.get(status, 0) + 1
+
+    def render(self) -> str:
+        out: List[str] = []
+
+        def header(name, kind, text):
+            out.append(f"# HELP {name} {text}")
+            out.append(f"# TYPE {name} {kind}")
+
+        def histogram(name, bounds, attr, sum_attr):
+            for (method, route), s in sorted(self.routes.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                cumulative = 0
+                for bound, n in zip(bounds, getattr(s, attr)):
+                    cumulative += n
+                    out.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                out.append(f'{name}_bucket{{{labels},le="+Inf"}} {s.count}')
+                out.append(f"{name}_sum{{{labels}}} {getattr(s, sum_attr)}")
+                out.append(f"{name}_count{{{labels}}} {s.count}")
+
+        header("http_requests_in_flight", "gauge", "Requests currently being served.")
+        out.append(f"http_requests_in_flight {self.in_flight}")
+
+        header("http_requests_total", "counter", "Requests by route and status code.")
+        for (method, route), s in sorted(self.routes.items()):
+            for status, n in sorted(s.status.items()):
+                out.append(f'http_requests_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {n}')
+
+        header("http_request_duration_seconds", "histogram", "Request latency until the last body chunk is sent.")
+        histogram("http_request_duration_seconds", LATENCY_BUCKETS, "latency", "latency_sum")
+
+        header("http_response_size_bytes", "summary", "Response body bytes.")
+        for (method, route), s in sorted(self.routes.items()):
+            labels = f'method="{method}",route="{_escape(route)}"'
+            out.append(f"http_response_size_bytes_sum{{{labels}}} {s.bytes_sum}")
+            out.append(f"http_response_size_bytes_count{{{labels}}} {s.count}")
+
+        header("db_statements_per_request", "histogram", "SQL statements executed per request.")
+        histogram("db_statements_per_request", SQL_COUNT_BUCKETS, "sql", "sql_sum")
+
+        header("db_statement_seconds_total", "counter", "Time spent executing SQL statements.")
+        for (method, route), s in sorted(self.routes.items()):
+            out.append(f'db_statement_seconds_total{{method="{method}",route="{_escape(route)}"}} {s.sql_seconds}')
+
+        header("db_statements_outside_requests_total", "counter", "SQL statements executed outside any request.")
+        out.append(f"db_statements_outside_requests_total {self.other_sql}")
+        header("db_statement_seconds_outside_requests_total", "counter", "SQL time outside any request.")
+        out.append(f"db_statement_seconds_outside_requests_total {self.other_sql_seconds}")
+        return "\n".join(out) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+# ---- SQL ----
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["metrics_t0"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop("metrics_t0", time.perf_counter())
+    sql = _request_sql.get()
+    if sql is not None:
+        sql[0] += 1
+        sql[1] += elapsed
+    else:
+        registry.other_sql += 1
+        registry.other_sql_seconds += elapsed
+
+
+def install() -> None:
+    """掛上 SQL 計數的 cursor 事件；重複呼叫（多次 create_app）不會重複計數。"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---- HTTP ----
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        root_path = scope.get("root_path", "")
+        status = 500
+        size = 0
+        sql = [0, 0.0]
+        token = _request_sql.set(sql)
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.in_flight -= 1
+            _request_sql.reset(token)
+            registry.observe(scope["method"], _route_label(scope, root_path), status, elapsed, size, sql)
+
+
+def _route_label(scope, root_path: str) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Mount（/static）不會設定 route，但會把前綴併入 root_path
+    mounted = scope.get("root_path", "")
+    if mounted != root_path:
+        return mounted[len(root_path):] + "/*"
+    return UNMATCHED
@@ -0,0 +1,335 @@
+"""版本化的資料庫遷移。
+
+create_all 只會建立不存在的表，無法替既有的 SQLite 檔補欄位或索引；
+這裡的每個遷移只執行一次（記錄於 schema_migrations），且都寫成可重複執行
+（IF NOT EXISTS／先檢查欄位），所以新建的資料庫也能安全地跑過一遍。
+
+用法（於 backend/ 下）：
+    python -m app.migrations status
+    python -m app.migrations upgrade [--check-plans] [--no-backup]   # 部署前的 pre-start 步驟
+    python -m app.migrations plans
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from .database import Base
+
+
+def _add_updated_at(conn: Connection) -> None:
+    for table in ("fabrics", "categories", "products", "orders"):
+        cols = {c["name"] for c in inspect(conn).get_columns(table)}
+        if "updated_at" not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN updated_at DATETIME")
+            conn.exec_driver_sql(f"UPDATE {table} SET updated_at = created_at")
+
+
+def _create_indexes(conn: Connection, *names: str) -> None:
+    """依名稱建立模型上宣告的索引。
+
+    每個遷移只列出當時欄位已存在的索引；之後新增的欄位與索引由加欄位的那個
+    遷移建立，否則舊資料庫升級時會在這裡遇到還不存在的欄位。
+    """
+    indexes = {index.name: index for table in Base.metadata.tables.values() for index in table.indexes}
+    for name in names:
+        indexes[name].create(conn, checkfirst=True)
+
+
+def _hot_path_indexes(conn: Connection) -> None:
+    # 被部分索引取代的舊複合索引
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_fabrics_on_clearance_created_at_id")
+    # 外鍵、created_at 複合索引、出清部分索引、價格、url
+    _create_indexes(
+        conn,
+        "ix_fabrics_id",
+        "ix_fabrics_created_at_id",
+        "ix_fabrics_clearance_created_at_id",
+        "ix_fabrics_price_id",
+        "ix_fabric_images_fabric_id",
+        "ix_fabric_images_url",
+        "ix_fabric_works_fabric_id",
+        "ix_fabric_works_url",
+        "ix_categories_created_at_id",
+        "ix_products_created_at_id",
+        "ix_products_category_id_created_at_id",
+        "ix_products_price_id",
+        "ix_product_images_product_id",
+        "ix_product_images_url",
+        "ix_orders_created_at_id",
+        "ix_orders_order_status_created_at_id",
+        "ix_orders_payment_status_created_at_id",
+        "ix_order_items_order_id",
+        "ix_order_items_product_id",
+        "ix_order_items_fabric_id",
+        "ix_blobs_ref_count",
+    )
+
+
+def _backfill_rollups(conn: Connection) -> None:
+    from . import models, rollups
+
+    has_rollups = conn.execute(select(models.SalesRollup.day).limit(1)).first()
+    has_items = conn.execute(select(models.OrderItem.id).limit(1)).first()
+    if has_rollups is None and has_items is not None:
+        with Session(conn) as s:
+            rollups.rebuild(s)
+
+
+def _search_index(conn: Connection) -> None:
+    from . import search
+
+    if conn.dialect.name == "sqlite":
+        search.create_tables(conn)
+        search.rebuild(conn)
+
+
+def _gallery_positions(conn: Connection) -> None:
+    from . import models
+
+    for model, fk, index in (
+        (models.FabricImage, "fabric_id", "ix_fabric_images_fabric_id_position"),
+        (models.FabricWork, "fabric_id", "ix_fabric_works_fabric_id_position"),
+        (models.ProductImage, "product_id", "ix_product_images_product_id_position"),
+    ):
+        table = model.__tablename__
+        cols = {c["name"] for c in inspect(conn).get_columns(table)}
+        if "position" not in cols:
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN position INTEGER NOT NULL DEFAULT 0")
+            # 既有順序即 id 順序
+            conn.exec_driver_sql(
+                f"UPDATE {table} SET position = (SELECT COUNT(*) FROM {table} AS o "
+                f"WHERE o.{fk} = {table}.{fk} AND o.id < {table}.id)"
+            )
+        _create_indexes(conn, index)
+
+
+def _effective_price(conn: Connection) -> None:
+    from . import models
+
+    # SQLite 的 ALTER TABLE 只能加 VIRTUAL 產生欄位（值存在索引裡，排序與區間查詢照樣走索引）
+    kind = "VIRTUAL" if conn.dialect.name == "sqlite" else "STORED"
+    for model, expr, indexes in (
+        (models.Fabric, models.FABRIC_EFFECTIVE_PRICE, ("ix_fabrics_effective_price_id",)),
+        (models.Product, models.PRODUCT_EFFECTIVE_PRICE, (
+            "ix_products_effective_price_id", "ix_products_category_id_effective_price_id",
+        )),
+    ):
+        table = model.__tablename__
+        cols = {c["name"] for c in inspect(conn).get_columns(table)}
+        if "effective_price" not in cols:
+            conn.exec_driver_sql(
+                f"ALTER TABLE {table} ADD COLUMN effective_price FLOAT GENERATED ALWAYS AS ({expr}) {kind}"
+            )
+        _create_indexes(conn, *indexes)
+
+
+def _order_totals(conn: Connection) -> None:
+    from . import rollups
+
+    cols = {c["name"] for c in inspect(conn).get_columns("orders")}
+    if "total" not in cols:
+        conn.exec_driver_sql("ALTER TABLE orders ADD COLUMN total FLOAT NOT NULL DEFAULT 0")
+    if "item_count" not in cols:
+        conn.exec_driver_sql("ALTER TABLE orders ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0")
+    with Session(conn) as s:
+        rollups.rebuild_totals(s)
+        s.commit()
+    _create_indexes(conn, "ix_orders_total_id")
+
+
+# (版本, 名稱, 函式)；只能往後加，不可改動已發布的項目
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "updated_at columns", _add_updated_at),
+    (2, "hot-path indexes", _hot_path_indexes),
+    (3, "sales rollup backfill", _backfill_rollups),
+    (4, "full-text search index", _search_index),
+    (5, "gallery positions", _gallery_positions),
+    (6, "effective price columns", _effective_price),
+    (7, "order totals", _order_totals),
+]
+
+_BOOKKEEPING = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at DATETIME NOT NULL
+)
+"""
+
+
+def current_version(conn: Connection) -> int:
+    conn.exec_driver_sql(_BOOKKEEPING)
+    return conn.exec_driver_sql("SELECT COALESCE(MAX(version), 0) FROM schema_migrations").scalar()
+
+
+def pending(engine: Engine) -> List[Tuple[int, str, Callable]]:
+    with engine.begin() as conn:
+        done = current_version(conn)
+    return [m for m in MIGRATIONS if m[0] > done]
+
+
+def _sqlite_path(engine: Engine):
+    if engine.dialect.name != "sqlite":
+        return None
+    db = engine.url.database
+    if not db or db == ":memory:" or db.startswith("file:"):
+        return None
+    return db
+
+
+def backup(engine: Engine) -> str:
+    """以 SQLite online backup API 複製一份（不需停機）。"""
+    src_path = _sqlite_path(engine)
+    dest = f"{src_path}.bak-{datetime.utcnow():%Y%m%d%H%M%S}"
+    src = sqlite3.connect(src_path)
+    dst = sqlite3.connect(dest)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return dest
+
+
+def sidecar_path(engine: Engine, suffix: str) -> str:
+    """資料庫專屬的附屬檔：SQLite 放在資料庫旁邊，其他資料庫放在暫存目錄。"""
+    path = _sqlite_path(engine)
+    if path is not None:
+        return f"{os.path.abspath(path)}{suffix}"
+    import tempfile
+
+    return os.path.join(tempfile.gettempdir(), f"wanshop-{engine.url.database or 'db'}{suffix}")
+
+
+def lock_path(engine: Engine) -> str:
+    """遷移用的鎖檔。"""
+    return sidecar_path(engine, ".migrate.lock")
+
+
+def upgrade(engine: Engine, make_backup: bool = True, log=None) -> List[int]:
+    """建立缺少的表後依序套用未執行的遷移；每個遷移一個交易。"""
+    from . import models  # noqa: F401  註冊所有 table
+
+    path = _sqlite_path(engine)
+    existing = path is not None and os.path.exists(path) and os.path.getsize(path) > 0
+    todo = pending(engine) if existing else []
+    if todo and make_backup:
+        dest = backup(engine)
+        if log:
+            log(f"backup written to {dest}")
+
+    Base.metadata.create_all(bind=engine)
+    applied = []
+    for version, name, fn in pending(engine):
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+        applied.append(version)
+        if log:
+            log(f"applied {version:04d} {name} in {time.perf_counter() - started:.2f}s")
+    return applied
+
+
+# ---- query-plan checks ----
+# 熱路徑查詢；參數只用來讓 planner 產生計畫，不需要對應到真實資料
+HOT_QUERIES: List[Tuple[str, str, Dict]] = [
+    ("fabric gallery", "SELECT id, url FROM fabric_images WHERE fabric_id = :a ORDER BY position, id", {"a": 1}),
+    ("fabric images by fabric", "SELECT id, url FROM fabric_images WHERE fabric_id IN (:a, :b)", {"a": 1, "b": 2}),
+    ("fabric works by fabric", "SELECT id, url FROM fabric_works WHERE fabric_id IN (:a, :b)", {"a": 1, "b": 2}),
+    ("product images by product", "SELECT id, url FROM product_images WHERE product_id IN (:a, :b)", {"a": 1, "b": 2}),
+    ("order items by order", "SELECT * FROM order_items WHERE order_id IN (:a, :b)", {"a": 1, "b": 2}),
+    ("order items by product", "SELECT id FROM order_items WHERE product_id = :a", {"a": 1}),
+    ("order items by fabric", "SELECT id FROM order_items WHERE fabric_id = :a", {"a": 1}),
+    ("fabrics page", "SELECT id FROM fabrics ORDER BY created_at, id LIMIT 50", {}),
+    ("clearance fabrics page", "SELECT id FROM fabrics WHERE on_clearance = 1 ORDER BY created_at, id LIMIT 50", {}),
+    ("products by category page", "SELECT id FROM products WHERE category_id = :a ORDER BY created_at, id LIMIT 50", {"a": 1}),
+    ("orders page", "SELECT id FROM orders ORDER BY created_at, id LIMIT 50", {}),
+    ("orders by total", "SELECT id FROM orders WHERE total >= :t ORDER BY total DESC, id DESC LIMIT 50", {"t": 1000}),
+    ("fabrics by effective price", "SELECT id FROM fabrics WHERE effective_price <= :p ORDER BY effective_price, id LIMIT 50", {"p": 500}),
+    ("products by effective price", "SELECT id FROM products WHERE category_id = :a AND effective_price <= :p ORDER BY effective_price, id LIMIT 50", {"a": 1, "p": 500}),
+    ("fabric search", "SELECT rowid FROM fabrics_fts WHERE fabrics_fts MATCH :q LIMIT 20", {"q": "cotton"}),
+]
+
+
+def query_plans(engine: Engine) -> Dict[str, List[str]]:
+    if engine.dialect.name != "sqlite":
+        return {}
+    out = {}
+    with engine.connect() as conn:
+        for name, sql, params in HOT_QUERIES:
+            try:
+                rows = conn.execute(text("EXPLAIN QUERY PLAN " + sql), params).all()
+            except OperationalError as e:
+                # 升級前的舊 schema 可能還沒有這個欄位或表
+                out[name] = [f"n/a: {e.orig}"]
+                continue
+            out[name] = [r[-1] for r in rows]
+    return out
+
+
+def plan_problems(plan: List[str]) -> List[str]:
+    """全表掃描或額外排序即視為問題。"""
+    bad = []
+    for step in plan:
+        if step.startswith("SCAN") and "INDEX" not in step:
+            bad.append(step)
+        elif "TEMP B-TREE" in step:
+            bad.append(step)
+    return bad
+
+
+def print_plans(plans: Dict[str, List[str]], title: str) -> int:
+    print(f"== {title}")
+    problems = 0
+    for name, steps in plans.items():
+        bad = plan_problems(steps)
+        problems += bool(bad)
+        print(f"  [{'FAIL' if bad else ' ok '}] {name}: {' | '.join(steps)}")
+    return problems
+
+
+def main(argv=None):
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Database migrations")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status")
+    up = sub.add_parser("upgrade")
+    up.add_argument("--check-plans", action="store_true")
+    up.add_argument("--no-backup", action="store_true")
+    sub.add_parser("plans")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "status":
+        todo = pending(engine)
+        print(f"pending: {[f'{v:04d} {n}' for v, n, _ in todo] or 'none'}")
+    elif args.cmd == "upgrade":
+        from .database import init_db
+
+        before = query_plans(engine) if args.check_plans and inspect(engine).has_table("fabrics") else {}
+        # 與 app 啟動時的 init_db 相同（同一把檔案鎖），可作為部署前的 pre-start 步驟
+        init_db(make_backup=not args.no_backup, log=print)
+        if args.check_plans:
+            if before:
+                print_plans(before, "before")
+            if print_plans(query_plans(engine), "after"):
+                raise SystemExit(1)
+    elif args.cmd == "plans":
+        if print_plans(query_plans(engine), "current"):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,25 @@
-from sqlalchemy import String, Integer, Float, Boolean, ForeignKey, DateTime, Text
+from sqlalchemy import String, Integer, Float, Boolean, ForeignKey, Date, DateTime, Text, Index, Computed, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from .database import Base
-from datetime import datetime
+from datetime import date, datetime
+
+# 顧客實際支付的單價（與前台顯示一致）；以產生欄位存放，寫入路徑不必維護，
+# 可直接建索引做價格排序與區間查詢
+FABRIC_EFFECTIVE_PRICE = "CASE WHEN on_clearance THEN clearance_price ELSE price END"
+PRODUCT_EFFECTIVE_PRICE = "CASE WHEN promo_price > 0 THEN promo_price ELSE price END"
 
 class Fabric(Base):
     __tablename__ = "fabrics"
+    __table_args__ = (
+        Index("ix_fabrics_created_at_id", "created_at", "id"),
+        # 部分索引：只收出清布料；查詢須以常值 on_clearance = 1 過濾才會用到
+        Index(
+            "ix_fabrics_clearance_created_at_id", "created_at", "id",
+            sqlite_where=text("on_clearance = 1"), postgresql_where=text("on_clearance"),
+        ),
+        Index("ix_fabrics_price_id", "price", "id"),
+        Index("ix_fabrics_effective_price_id", "effective_price", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     name: Mapped[str] = mapped_column(String(200))
     origin: Mapped[str] = mapped_column(String(50), default="台灣")
@@ -13,71 +28,109 @@ class Fabric(Base):
     description: Mapped[str] = mapped_column(Text, default="")
     on_clearance: Mapped[bool] = mapped_column(Boolean, default=False)
     clearance_price: Mapped[float] = mapped_column(Float, default=0)
+    effective_price: Mapped[float] = mapped_column(Float, Computed(FABRIC_EFFECTIVE_PRICE))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    images: Mapped[list["FabricImage"]] = relationship(back_populates="fabric", cascade="all, delete-orphan")
-    works: Mapped[list["FabricWork"]] = relationship(back_populates="fabric", cascade="all, delete-orphan")
+    images: Mapped[list["FabricImage"]] = relationship(
+        back_populates="fabric", cascade="all, delete-orphan",
+        order_by="[FabricImage.position, FabricImage.id]",
+    )
+    works: Mapped[list["FabricWork"]] = relationship(
+        back_populates="fabric", cascade="all, delete-orphan",
+        order_by="[FabricWork.position, FabricWork.id]",
+    )
 
 class FabricImage(Base):
     __tablename__ = "fabric_images"
+    __table_args__ = (Index("ix_fabric_images_fabric_id_position", "fabric_id", "position"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    fabric_id: Mapped[int] = mapped_column(ForeignKey("fabrics.id", ondelete="CASCADE"))
-    url: Mapped[str] = mapped_column(String(500))
+    fabric_id: Mapped[int] = mapped_column(ForeignKey("fabrics.id", ondelete="CASCADE"), index=True)
+    url: Mapped[str] = mapped_column(String(500), index=True)
+    position: Mapped[int] = mapped_column(Integer, default=0)
     fabric: Mapped["Fabric"] = relationship(back_populates="images")
 
 class FabricWork(Base):
     __tablename__ = "fabric_works"
+    __table_args__ = (Index("ix_fabric_works_fabric_id_position", "fabric_id", "position"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    fabric_id: Mapped[int] = mapped_column(ForeignKey("fabrics.id", ondelete="CASCADE"))
-    url: Mapped[str] = mapped_column(String(500))
+    fabric_id: Mapped[int] = mapped_column(ForeignKey("fabrics.id", ondelete="CASCADE"), index=True)
+    url: Mapped[str] = mapped_column(String(500), index=True)
+    position: Mapped[int] = mapped_column(Integer, default=0)
     fabric: Mapped["Fabric"] = relationship(back_populates="works")
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (Index("ix_categories_created_at_id", "created_at", "id"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(200), unique=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     products: Mapped[list["Product"]] = relationship(back_populates="category", cascade="all, delete-orphan")
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_category_id_created_at_id", "category_id", "created_at", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_effective_price_id", "effective_price", "id"),
+        Index("ix_products_category_id_effective_price_id", "category_id", "effective_price", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String(200))
     price: Mapped[float] = mapped_column(Float, default=0)
     size: Mapped[str] = mapped_column(String(100), default="")
     description: Mapped[str] = mapped_column(Text, default="")
     promo_price: Mapped[float] = mapped_column(Float, default=0)
+    effective_price: Mapped[float] = mapped_column(Float, Computed(PRODUCT_EFFECTIVE_PRICE))
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"))
     category: Mapped["Category"] = relationship(back_populates="products")
 
-    images: Mapped[list["ProductImage"]] = relationship(back_populates="product", cascade="all, delete-orphan")
+    images: Mapped[list["ProductImage"]] = relationship(
+        back_populates="product", cascade="all, delete-orphan",
+        order_by="[ProductImage.position, ProductImage.id]",
+    )
 
 class ProductImage(Base):
     __tablename__ = "product_images"
+    __table_args__ = (Index("ix_product_images_product_id_position", "product_id", "position"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"))
-    url: Mapped[str] = mapped_column(String(500))
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), index=True)
+    url: Mapped[str] = mapped_column(String(500), index=True)
+    position: Mapped[int] = mapped_column(Integer, default=0)
     product: Mapped["Product"] = relationship(back_populates="images")
 
 class Order(Base):
     __tablename__ = "orders"
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_order_status_created_at_id", "order_status", "created_at", "id"),
+        Index("ix_orders_payment_status_created_at_id", "payment_status", "created_at", "id"),
+        Index("ix_orders_total_id", "total", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     customer_name: Mapped[str] = mapped_column(String(200))
     description: Mapped[str] = mapped_column(Text, default="")
     order_status: Mapped[str] = mapped_column(String(50), default="尚未處理")
     payment_status: Mapped[str] = mapped_column(String(50), default="貨到付款")
+    # 明細的 final_price 合計與筆數；由訂單寫入路徑增量維護（見 rollups.apply_totals）
+    total: Mapped[float] = mapped_column(Float, default=0)
+    item_count: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     items: Mapped[list["OrderItem"]] = relationship(back_populates="order", cascade="all, delete-orphan")
 
 class OrderItem(Base):
     __tablename__ = "order_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"))
-    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"))
-    fabric_id: Mapped[int | None] = mapped_column(ForeignKey("fabrics.id"), nullable=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), index=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), index=True)
+    fabric_id: Mapped[int | None] = mapped_column(ForeignKey("fabrics.id"), nullable=True, index=True)
 
     state: Mapped[str] = mapped_column(String(50), default="空白")
     original_price: Mapped[float] = mapped_column(Float, default=0)
@@ -86,3 +139,30 @@ class OrderItem(Base):
     description: Mapped[str] = mapped_column(Text, default="")
 
     order: Mapped["Order"] = relationship(back_populates="items")
+
+class SalesRollup(Base):
+    """依 (日, 商品, 布料, 訂單狀態, 付款狀態) 彙總的營收；由訂單寫入路徑增量維護。"""
+    __tablename__ = "sales_rollups"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    fabric_id: Mapped[int] = mapped_column(Integer, primary_key=True, default=0)  # 0 = 未指定布料
+    order_status: Mapped[str] = mapped_column(String(50), primary_key=True)
+    payment_status: Mapped[str] = mapped_column(String(50), primary_key=True)
+    revenue: Mapped[float] = mapped_column(Float, default=0)
+    item_count: Mapped[int] = mapped_column(Integer, default=0)
+
+class Blob(Base):
+    """上傳檔的內容定址儲存；ref_count 為 fabric_images/fabric_works/product_images 引用此 url 的列數。"""
+    __tablename__ = "blobs"
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    url: Mapped[str] = mapped_column(String(500), unique=True)
+    size: Mapped[int] = mapped_column(Integer, default=0)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, index=True)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+class TableVersion(Base):
+    """每個資源（fabrics/categories/products/orders）一列的版本計數，供 ETag 使用。"""
+    __tablename__ = "table_versions"
+    name: Mapped[str] = mapped_column(String(50), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,208 @@
+"""開發用 SQL profiler 與 N+1 偵測（SQL_PROFILE=1 才啟用）。
+
+每個請求記下所有 SQL：依「形狀」（IN 清單、多列 VALUES 摺疊後的 SQL）分組，
+同一形狀在一個請求內出現 SQL_PROFILE_N_PLUS_ONE 次以上即標為 N+1，並附上
+觸發的 relationship（由 do_orm_execute 的 lazy load 得知）與 app 內的呼叫位置。
+超過 SQL_PROFILE_SLOW_MS 的 SELECT 會在同一條連線上跑 EXPLAIN QUERY PLAN。
+
+回應加上 X-SQL-Profile 摘要標頭；完整報告保留最近 SQL_PROFILE_KEEP 筆，
+可由 GET /api/debug/sql-profiles 查看。會逐句取呼叫堆疊，勿在正式環境開啟。
+"""
+import itertools
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import RelationshipProperty, Session
+
+from .database import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "X-SQL-Profile"
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {os.path.join(_APP_DIR, f) for f in ("profiler.py", "metrics.py", "database.py")}
+
+_current: ContextVar[Optional["RequestProfile"]] = ContextVar("sql_profile", default=None)
+# 目前正在 lazy/selectin 載入的 relationship，例如 "Fabric.images"
+_loading: ContextVar[Optional[str]] = ContextVar("sql_profile_loading", default=None)
+
+_ids = itertools.count(1)
+reports: "deque[dict]" = deque(maxlen=settings.SQL_PROFILE_KEEP)
+
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_ROWS = re.compile(r"(\(\s*\?[^()]*\))(?:\s*,\s*\(\s*\?[^()]*\))+")
+_SPACE = re.compile(r"\s+")
+
+
+def shape(statement: str) -> str:
+    s = _SPACE.sub(" ", statement).strip()
+    s = _ROWS.sub(r"\1, …", s)
+    return _IN_LIST.sub("(?, …)", s)
+
+
+def _caller() -> str:
+    """最內層、位於 app/ 內（profiler 本身除外）的呼叫位置。"""
+    f = sys._getframe(2)
+    while f is not None:
+        path = f.f_code.co_filename
+        if path.startswith(_APP_DIR) and path not in _SKIP_FILES:
+            return f"{os.path.relpath(path, os.path.dirname(_APP_DIR))}:{f.f_lineno} in {f.f_code.co_name}"
+        f = f.f_back
+    return "?"
+
+
+class RequestProfile:
+    __slots__ = ("statements",)
+
+    def __init__(self):
+        # (形狀, 毫秒, relationship, 呼叫位置, EXPLAIN 結果)
+        self.statements: List[tuple] = []
+
+    def report(self, rid: int, method: str, path: str, route: str) -> dict:
+        groups: Dict[str, dict] = {}
+        for sql, ms, rel, caller, _ in self.statements:
+            g = groups.get(sql)
+            if g is None:
+                g = groups[sql] = {"sql": sql, "count": 0, "ms": 0.0, "relationships": set(), "callers": set()}
+            g["count"] += 1
+            g["ms"] += ms
+            if rel:
+                g["relationships"].add(rel)
+            g["callers"].add(caller)
+        shapes = sorted(groups.values(), key=lambda g: (-g["count"], -g["ms"]))
+        for g in shapes:
+            g["ms"] = round(g["ms"], 2)
+            g["relationships"] = sorted(g["relationships"])
+            g["callers"] = sorted(g["callers"])
+        return {
+            "id": rid,
+            "method": method,
+            "path": path,
+            "route": route,
+            "statements": len(self.statements),
+            "sql_ms": round(sum(s[1] for s in self.statements), 2),
+            "n_plus_one": [g for g in shapes if g["count"] >= settings.SQL_PROFILE_N_PLUS_ONE],
+            "slow": [
+                {"sql": sql, "ms": round(ms, 2), "caller": caller, "plan": plan}
+                for sql, ms, _, caller, plan in self.statements
+                if plan is not None
+            ],
+            "shapes": shapes,
+        }
+
+
+def _explain(conn, cursor, statement: str, parameters) -> List[str]:
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cur = cursor.connection.cursor()
+    try:
+        cur.execute(prefix + statement, parameters)
+        return [" ".join(str(c) for c in row) for row in cur.fetchall()]
+    except Exception as e:
+        return [f"EXPLAIN failed: {e}"]
+    finally:
+        cur.close()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["profile_t0"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    prof = _current.get()
+    if prof is None:
+        return
+    ms = (time.perf_counter() - conn.info.pop("profile_t0", time.perf_counter())) * 1000
+    plan = None
+    if (
+        ms >= settings.SQL_PROFILE_SLOW_MS
+        and not executemany
+        and statement.lstrip()[:6].upper().startswith(("SELECT", "WITH"))
+    ):
+        plan = _explain(conn, cursor, statement, parameters)
+    prof.statements.append((shape(statement), ms, _loading.get(), _caller(), plan))
+
+
+def _relationship_of(state) -> Optional[str]:
+    path = state.loader_strategy_path
+    if path is None:
+        return None
+    for prop in reversed(path.path):
+        if isinstance(prop, RelationshipProperty):
+            return f"{prop.parent.class_.__name__}.{prop.key}"
+    return None
+
+
+def _orm_execute(state):
+    if _current.get() is None or not state.is_relationship_load:
+        return None
+    token = _loading.set(_relationship_of(state))
+    try:
+        return state.invoke_statement()
+    finally:
+        _loading.reset(token)
+
+
+def install() -> None:
+    """掛上事件；重複呼叫（多次 create_app）不會重複記錄。"""
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Session, "do_orm_execute", _orm_execute)
+
+
+def _summary(report: dict) -> str:
+    parts = [f"id={report['id']}", f"statements={report['statements']}", f"sql_ms={report['sql_ms']}"]
+    for g in report["n_plus_one"]:
+        where = ",".join(g["relationships"]) or g["callers"][0]
+        parts.append(f"n+1={where}*{g['count']}")
+    if report["slow"]:
+        parts.append(f"slow={len(report['slow'])}")
+    return "; ".join(parts)
+
+
+class SqlProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/api/debug/"):
+            await self.app(scope, receive, send)
+            return
+
+        rid = next(_ids)
+        prof = RequestProfile()
+        token = _current.set(prof)
+
+        async def send_wrapper(message):
+            # 串流回應在標頭送出後才跑完查詢，摘要只涵蓋到第一塊為止；完整報告見 debug 端點
+            if message["type"] == "http.response.start":
+                report = prof.report(rid, scope["method"], scope["path"], _route(scope))
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_HEADER.lower().encode(), _summary(report).encode("latin-1", "replace"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            report = prof.report(rid, scope["method"], scope["path"], _route(scope))
+            reports.append(report)
+            if report["n_plus_one"]:
+                logger.warning("possible N+1 on %s %s: %s", scope["method"], report["route"], _summary(report))
+
+
+def _route(scope) -> str:
+    route = scope.get("route")
+    return route.path if route is not None else scope["path"]
@@ -0,0 +1,112 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import false, true
+from sqlalchemy.orm import Session, Query, selectinload
+from . import models
+
+# ---- loader strategies ----
+# 回傳 FabricOut/ProductOut/OrderOut 時會序列化關聯；一律以 selectinload 批次載入，
+# 讓列表固定為 1 + 關聯數 個 SELECT，而不是每列各自 lazy load（N+1）。
+# 寫入後的回傳值也以同樣的 options 重新讀取：ASYNC_DB 模式下序列化時不能 lazy load。
+FABRIC_LOAD = (selectinload(models.Fabric.images), selectinload(models.Fabric.works))
+PRODUCT_LOAD = (selectinload(models.Product.images),)
+ORDER_LOAD = (selectinload(models.Order.items),)
+
+# ---- sortable columns（keyset 分頁的排序鍵，皆搭配 id 作為 tie-breaker）----
+# price 為定價；effective_price 為實際售價（出清價／促銷價），min_price/max_price 以它過濾
+FABRIC_SORTS = {
+    "created_at": models.Fabric.created_at,
+    "price": models.Fabric.price,
+    "effective_price": models.Fabric.effective_price,
+    "name": models.Fabric.name,
+}
+CATEGORY_SORTS = {
+    "created_at": models.Category.created_at,
+    "name": models.Category.name,
+}
+PRODUCT_SORTS = {
+    "created_at": models.Product.created_at,
+    "price": models.Product.price,
+    "effective_price": models.Product.effective_price,
+    "name": models.Product.name,
+}
+ORDER_SORTS = {
+    "created_at": models.Order.created_at,
+    "total": models.Order.total,
+}
+
+
+def _created_range(q: Query, col, created_from: Optional[datetime], created_to: Optional[datetime]) -> Query:
+    if created_from is not None:
+        q = q.filter(col >= created_from)
+    if created_to is not None:
+        q = q.filter(col < created_to)
+    return q
+
+
+def fabrics_query(
+    db: Session,
+    on_clearance: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    # 傳入 columns（如 fastjson.FABRIC_COLUMNS）時只查欄位 tuple，不建 ORM 物件
+    columns: Optional[tuple] = None,
+) -> Query:
+    q = db.query(*columns) if columns else db.query(models.Fabric).options(*FABRIC_LOAD)
+    if on_clearance is not None:
+        # 以常值比較（而非綁定參數），SQLite 才能選用出清的部分索引
+        q = q.filter(models.Fabric.on_clearance == (true() if on_clearance else false()))
+    if min_price is not None:
+        q = q.filter(models.Fabric.effective_price >= min_price)
+    if max_price is not None:
+        q = q.filter(models.Fabric.effective_price <= max_price)
+    return _created_range(q, models.Fabric.created_at, created_from, created_to)
+
+
+def categories_query(db: Session) -> Query:
+    return db.query(models.Category)
+
+
+def products_query(
+    db: Session,
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    # 傳入 columns（如 fastjson.PRODUCT_COLUMNS）時只查欄位 tuple，不建 ORM 物件
+    columns: Optional[tuple] = None,
+) -> Query:
+    q = db.query(*columns) if columns else db.query(models.Product).options(*PRODUCT_LOAD)
+    if category_id is not None:
+        q = q.filter(models.Product.category_id == category_id)
+    if min_price is not None:
+        q = q.filter(models.Product.effective_price >= min_price)
+    if max_price is not None:
+        q = q.filter(models.Product.effective_price <= max_price)
+    return _created_range(q, models.Product.created_at, created_from, created_to)
+
+
+def orders_query(
+    db: Session,
+    order_status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+    # 傳入 columns（如 fastjson.ORDER_COLUMNS）時只查欄位 tuple，不建 ORM 物件
+    columns: Optional[tuple] = None,
+) -> Query:
+    q = db.query(*columns) if columns else db.query(models.Order).options(*ORDER_LOAD)
+    if order_status is not None:
+        q = q.filter(models.Order.order_status == order_status)
+    if payment_status is not None:
+        q = q.filter(models.Order.payment_status == payment_status)
+    if min_total is not None:
+        q = q.filter(models.Order.total >= min_total)
+    if max_total is not None:
+        q = q.filter(models.Order.total <= max_total)
+    return _created_range(q, models.Order.created_at, created_from, created_to)
@@ -0,0 +1,153 @@
+"""sales_rollups 與訂單合計（orders.total / item_count）的增量維護。
+
+訂單的新增/修改/刪除在同一個交易內呼叫 apply_orders(db, ids, ±1)：
+先以 SQL 把這些訂單的明細依彙總鍵 GROUP BY，再 upsert 加減到 rollup。
+明細異動時以 apply_totals 把差額加到訂單上，不重新加總整張訂單。
+
+從頭重建（於 backend/ 下）：
+    python -m app.rollups
+"""
+from datetime import date
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+_KEYS = ("day", "product_id", "fabric_id", "order_status", "payment_status")
+_CHUNK = 500
+
+
+def _grouped(order_ids=None):
+    o, i = models.Order, models.OrderItem
+    q = (
+        select(
+            func.date(o.created_at).label("day"),
+            i.product_id,
+            func.coalesce(i.fabric_id, 0).label("fabric_id"),
+            o.order_status,
+            o.payment_status,
+            func.sum(i.final_price).label("revenue"),
+            func.count().label("item_count"),
+        )
+        .join(o, o.id == i.order_id)
+        .group_by(
+            func.date(o.created_at), i.product_id, func.coalesce(i.fabric_id, 0),
+            o.order_status, o.payment_status,
+        )
+    )
+    if order_ids is not None:
+        q = q.where(i.order_id.in_(order_ids))
+    return q
+
+
+def _as_date(v) -> date:
+    return v if isinstance(v, date) else date.fromisoformat(v)
+
+
+def _upsert(db: Session, rows: list):
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        raise RuntimeError(f"rollup upsert not supported on {dialect}")
+    t = models.SalesRollup.__table__
+    stmt = dialect_insert(t)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_KEYS),
+        set_={
+            "revenue": t.c.revenue + stmt.excluded.revenue,
+            "item_count": t.c.item_count + stmt.excluded.item_count,
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def apply_orders(db: Session, order_ids: Iterable[int], sign: int) -> None:
+    """把指定訂單目前的明細以 sign（+1/-1）計入 rollup；由呼叫端 commit。"""
+    ids = sorted(set(order_ids))
+    if not ids:
+        return
+    db.flush()
+    rows = []
+    for start in range(0, len(ids), _CHUNK):
+        for r in db.execute(_grouped(ids[start:start + _CHUNK])):
+            rows.append({
+                "day": _as_date(r.day),
+                "product_id": r.product_id,
+                "fabric_id": r.fabric_id,
+                "order_status": r.order_status,
+                "payment_status": r.payment_status,
+                "revenue": sign * (r.revenue or 0),
+                "item_count": sign * r.item_count,
+            })
+    if not rows:
+        return
+    _upsert(db, rows)
+    if sign < 0:
+        days = sorted({r["day"] for r in rows})
+        db.execute(
+            delete(models.SalesRollup).where(
+                models.SalesRollup.day.in_(days), models.SalesRollup.item_count <= 0
+            )
+        )
+
+
+def rebuild(db: Session) -> int:
+    """清空並以單一 INSERT ... SELECT 重建整張 rollup。"""
+    db.execute(delete(models.SalesRollup))
+    q = _grouped()
+    db.execute(
+        insert(models.SalesRollup).from_select(
+            [*_KEYS, "revenue", "item_count"], q
+        )
+    )
+    db.commit()
+    return db.scalar(select(func.count()).select_from(models.SalesRollup))
+
+
+def apply_totals(db: Session, deltas: Dict[int, Tuple[float, int]]) -> None:
+    """{訂單 id: (total 差額, item_count 差額)}；一個 executemany UPDATE，由呼叫端 commit。"""
+    rows = [{"b_id": oid, "b_total": dt, "b_count": dn} for oid, (dt, dn) in deltas.items() if dt or dn]
+    if not rows:
+        return
+    o = models.Order.__table__
+    db.execute(
+        update(o)
+        .where(o.c.id == bindparam("b_id"))
+        .values(total=o.c.total + bindparam("b_total"), item_count=o.c.item_count + bindparam("b_count")),
+        rows,
+    )
+
+
+def rebuild_totals(db: Session) -> None:
+    """以明細重算所有訂單的 total / item_count（遷移回填、資料修復用）；由呼叫端 commit。"""
+    o, i = models.Order, models.OrderItem
+    db.execute(
+        update(o.__table__).values(
+            total=select(func.coalesce(func.sum(i.final_price), 0)).where(i.order_id == o.id).scalar_subquery(),
+            item_count=select(func.count()).where(i.order_id == o.id).scalar_subquery(),
+            # 不算是訂單被修改
+            updated_at=o.updated_at,
+        )
+    )
+
+
+def main():
+    from .database import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        print(f"{rebuild(db)} rollup rows")
+        rebuild_totals(db)
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import SessionLocal
-from .. import models, schemas
+from typing import List, Optional
+from ..database import get_db, session_route
+from .. import models, schemas, queries, invalidation
+from ..cache import CATEGORIES
+from ..utils.pagination import LIMIT_DESCRIPTION, MAX_LIMIT, paginate, set_next_cursor
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/", response_model=List[schemas.CategoryOut])
-def list_categories(db: Session = Depends(get_db)):
-    return db.query(models.Category).all()
+@session_route
+def list_categories(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    db: Session = Depends(get_db),
+):
+    rows, next_cursor = paginate(
+        queries.categories_query(db), models.Category.id, sort,
+        queries.CATEGORY_SORTS, limit, cursor,
+    )
+    set_next_cursor(response, next_cursor)
+    return rows
 
 @router.post("/", response_model=schemas.CategoryOut)
+@session_route
 def create_category(data: schemas.CategoryCreate, db: Session = Depends(get_db)):
     exists = db.query(models.Category).filter(models.Category.name == data.name).first()
     if exists:
@@ -26,9 +34,11 @@ def create_category(data: schemas.CategoryCreate, db: Session = Depends(get_db))
     db.add(obj)
     db.commit()
     db.refresh(obj)
+    invalidation.publish("categories", obj.id, "create", (CATEGORIES,))
     return obj
 
 @router.put("/{category_id}", response_model=schemas.CategoryOut)
+@session_route
 def update_category(category_id: int, data: schemas.CategoryUpdate, db: Session = Depends(get_db)):
     obj = db.get(models.Category, category_id)
     if not obj:
@@ -36,15 +46,22 @@ def update_category(category_id: int, data: schemas.CategoryUpdate, db: Session
     obj.name = data.name
     db.commit()
     db.refresh(obj)
+    invalidation.publish("categories", category_id, "update", (CATEGORIES,))
     return obj
 
 @router.delete("/{category_id}")
+@session_route
 def delete_category(category_id: int, db: Session = Depends(get_db)):
     obj = db.get(models.Category, category_id)
     if not obj:
         raise HTTPException(404, "Category not found")
-    if obj.products:
+    # 只需確認是否存在，不必把整個分類的商品載入
+    has_products = db.query(
+        db.query(models.Product.id).filter(models.Product.category_id == category_id).exists()
+    ).scalar()
+    if has_products:
         raise HTTPException(400, "Category has products")
     db.delete(obj)
     db.commit()
+    invalidation.publish("categories", category_id, "delete", (CATEGORIES,))
     return {"ok": True}
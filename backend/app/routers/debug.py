@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+
+from .. import profiler
+
+router = APIRouter()
+
+@router.get("/sql-profiles")
+def list_profiles(n_plus_one: bool = False, limit: int = 50):
+    """最近的請求（新到舊）；n_plus_one=true 只列出有 N+1 的請求。"""
+    out = []
+    for r in reversed(profiler.reports):
+        if n_plus_one and not r["n_plus_one"]:
+            continue
+        out.append({k: r[k] for k in ("id", "method", "path", "route", "statements", "sql_ms")} | {
+            "n_plus_one": [{"sql": g["sql"], "count": g["count"], "relationships": g["relationships"]} for g in r["n_plus_one"]],
+            "slow": len(r["slow"]),
+        })
+        if len(out) >= limit:
+            break
+    return out
+
+@router.get("/sql-profiles/{profile_id}")
+def get_profile(profile_id: int):
+    for r in profiler.reports:
+        if r["id"] == profile_id:
+            return r
+    raise HTTPException(status_code=404, detail="Profile not found (only the most recent requests are kept)")
@@ -1,21 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from urllib.parse import urlparse
-from ..database import SessionLocal
-from .. import models, schemas
+from ..database import get_db, session_route, settings
+from .. import models, schemas, queries, search, versions, exports, gallery, fastjson, invalidation
+from ..blobstore import refresh_refs
+from ..cache import FABRICS
+from ..utils.conditional import not_modified
+from ..utils.pagination import LIMIT_DESCRIPTION, MAX_LIMIT, paginate, set_next_cursor
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # ---- helpers ----
 def _normalize_urls(urls: List[str]) -> List[str]:
     norm = []
@@ -36,28 +33,87 @@ def _normalize_urls(urls: List[str]) -> List[str]:
 
 # ---- CRUD ----
 @router.get("/", response_model=List[schemas.FabricOut])
-def list_fabrics(db: Session = Depends(get_db)):
-    return db.query(models.Fabric).all()
+@session_route
+def list_fabrics(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    on_clearance: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    headers = versions.list_validators(db, request, "fabrics")
+    hit = not_modified(request, headers)
+    if hit is not None:
+        return hit
+    q = queries.fabrics_query(
+        db, on_clearance, min_price, max_price, created_from, created_to,
+        columns=fastjson.FABRIC_COLUMNS if settings.FAST_JSON else None,
+    )
+    rows, next_cursor = paginate(
+        q, models.Fabric.id, sort, queries.FABRIC_SORTS, limit, cursor
+    )
+    response.headers.update(headers)
+    set_next_cursor(response, next_cursor)
+    if settings.FAST_JSON:
+        return fastjson.respond(fastjson.fabric_rows(db, rows), response)
+    return rows
+
+
+@router.get("/export")
+def export_fabrics(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    on_clearance: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    return exports.export_response(
+        "fabrics", format,
+        lambda db: queries.fabrics_query(db, on_clearance, min_price, max_price, created_from, created_to),
+        models.Fabric.created_at, models.Fabric.id,
+        schemas.FabricOut, exports.FABRIC_COLUMNS, exports.fabric_rows,
+    )
 
 
 @router.post("/", response_model=schemas.FabricOut)
+@session_route
 def create_fabric(data: schemas.FabricCreate, db: Session = Depends(get_db)):
     obj = models.Fabric(**data.model_dump())
     db.add(obj)
+    search.index_fabric(db, obj)
     db.commit()
-    db.refresh(obj)
+    obj = db.get(models.Fabric, obj.id, options=queries.FABRIC_LOAD, populate_existing=True)
+    invalidation.publish("fabrics", obj.id, "create", (FABRICS,))
     return obj
 
 
 @router.get("/{fabric_id}", response_model=schemas.FabricOut)
-def get_fabric(fabric_id: int, db: Session = Depends(get_db)):
-    obj = db.get(models.Fabric, fabric_id)
+@session_route
+def get_fabric(
+    fabric_id: int, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    headers = versions.row_validators(db, models.Fabric, fabric_id)
+    if headers is None:
+        raise HTTPException(404, "Fabric not found")
+    hit = not_modified(request, headers)
+    if hit is not None:
+        return hit
+    obj = db.get(models.Fabric, fabric_id, options=queries.FABRIC_LOAD)
     if not obj:
         raise HTTPException(404, "Fabric not found")
+    response.headers.update(headers)
     return obj
 
 
 @router.put("/{fabric_id}", response_model=schemas.FabricOut)
+@session_route
 def update_fabric(
     fabric_id: int, data: schemas.FabricUpdate, db: Session = Depends(get_db)
 ):
@@ -72,158 +128,120 @@ def update_fabric(
     # 更新基本欄位
     for k, v in payload.items():
         setattr(obj, k, v)
-    db.commit()
+    search.index_fabric(db, obj)
 
-    # 有帶清單才處理；沒帶就不動圖片
-    if images_urls is not None:
-        cur = [
-            r[0]
-            for r in db.query(models.FabricImage.url)
-            .filter(models.FabricImage.fabric_id == fabric_id)
-            .order_by(models.FabricImage.id.asc())
-            .all()
-        ]
-        if cur != images_urls:
-            db.query(models.FabricImage).filter(
-                models.FabricImage.fabric_id == fabric_id
-            ).delete(synchronize_session=False)
-            seen = set()
-            for u in images_urls or []:
-                if u in seen:
-                    continue
-                seen.add(u)
-                db.add(models.FabricImage(fabric_id=fabric_id, url=u))
-            db.commit()
-
-    if works_urls is not None:
-        cur = [
-            r[0]
-            for r in db.query(models.FabricWork.url)
-            .filter(models.FabricWork.fabric_id == fabric_id)
-            .order_by(models.FabricWork.id.asc())
-            .all()
-        ]
-        if cur != works_urls:
-            db.query(models.FabricWork).filter(
-                models.FabricWork.fabric_id == fabric_id
-            ).delete(synchronize_session=False)
-            seen = set()
-            for u in works_urls or []:
-                if u in seen:
-                    continue
-                seen.add(u)
-                db.add(models.FabricWork(fabric_id=fabric_id, url=u))
-            db.commit()
+    # 有帶清單才處理；沒帶就不動圖片。與基本欄位同一個交易
+    touched = []
+    for model, urls in ((models.FabricImage, images_urls), (models.FabricWork, works_urls)):
+        if urls is None:
+            continue
+        diff = gallery.sync(db, model, "fabric_id", fabric_id, urls)
+        touched += diff.touched
+        if diff.changed:
+            obj.updated_at = datetime.utcnow()
+    refresh_refs(db, touched)
+    db.commit()
 
-    db.refresh(obj)
+    obj = db.get(models.Fabric, obj.id, options=queries.FABRIC_LOAD, populate_existing=True)
+    invalidation.publish("fabrics", fabric_id, "update", (FABRICS,))
     return obj
 
 
 @router.delete("/{fabric_id}")
+@session_route
 def delete_fabric(fabric_id: int, db: Session = Depends(get_db)):
     obj = db.get(models.Fabric, fabric_id)
     if not obj:
         raise HTTPException(404, "Fabric not found")
+    urls = [i.url for i in obj.images] + [w.url for w in obj.works]
     db.delete(obj)
+    search.remove_fabric(db, fabric_id)
+    refresh_refs(db, urls)
     db.commit()
+    invalidation.publish("fabrics", fabric_id, "delete", (FABRICS,))
     return {"ok": True}
 
 
 # ---- image/work APIs ----
 # 追加（冪等）：存在就略過
 @router.post("/{fabric_id}/images")
+@session_route
 def add_fabric_images(
     fabric_id: int, urls: List[str] = Body(...), db: Session = Depends(get_db)
 ):
     obj = db.get(models.Fabric, fabric_id)
     if not obj:
         raise HTTPException(404, "Fabric not found")
-    exists = {
-        r[0]
-        for r in db.query(models.FabricImage.url)
-        .filter(models.FabricImage.fabric_id == fabric_id)
-        .all()
-    }
-    ins = 0
-    for u in urls or []:
-        if u in exists:
-            continue
-        db.add(models.FabricImage(fabric_id=fabric_id, url=u))
-        ins += 1
-    db.commit()
-    db.refresh(obj)
-    return {"ok": True, "inserted": ins, "skipped": len((urls or [])) - ins}
+    diff = gallery.append(db, models.FabricImage, "fabric_id", fabric_id, urls)
+    if diff.changed:
+        refresh_refs(db, diff.touched)
+        obj.updated_at = datetime.utcnow()
+        db.commit()
+        invalidation.publish("fabrics", fabric_id, "update", (FABRICS,))
+    return {"ok": True, "inserted": diff.inserted, "skipped": len((urls or [])) - diff.inserted}
 
 
 @router.post("/{fabric_id}/works")
+@session_route
 def add_fabric_works(
     fabric_id: int, urls: List[str] = Body(...), db: Session = Depends(get_db)
 ):
     obj = db.get(models.Fabric, fabric_id)
     if not obj:
         raise HTTPException(404, "Fabric not found")
-    exists = {
-        r[0]
-        for r in db.query(models.FabricWork.url)
-        .filter(models.FabricWork.fabric_id == fabric_id)
-        .all()
-    }
-    ins = 0
-    for u in urls or []:
-        if u in exists:
-            continue
-        db.add(models.FabricWork(fabric_id=fabric_id, url=u))
-        ins += 1
-    db.commit()
-    db.refresh(obj)
-    return {"ok": True, "inserted": ins, "skipped": len((urls or [])) - ins}
+    diff = gallery.append(db, models.FabricWork, "fabric_id", fabric_id, urls)
+    if diff.changed:
+        refresh_refs(db, diff.touched)
+        obj.updated_at = datetime.utcnow()
+        db.commit()
+        invalidation.publish("fabrics", fabric_id, "update", (FABRICS,))
+    return {"ok": True, "inserted": diff.inserted, "skipped": len((urls or [])) - diff.inserted}
 
 
-# 取代（全刪再建）
+# 取代：只套用差異（新增／刪除／調整順序），既有列的 id 不變
 @router.put("/{fabric_id}/images")
+@session_route
 def replace_fabric_images(
     fabric_id: int, urls: List[str] = Body(...), db: Session = Depends(get_db)
 ):
     obj = db.get(models.Fabric, fabric_id)
     if not obj:
         raise HTTPException(404, "Fabric not found")
-    db.query(models.FabricImage).filter(
-        models.FabricImage.fabric_id == fabric_id
-    ).delete(synchronize_session=False)
-    seen = set()
-    for u in urls or []:
-        if u in seen:
-            continue
-        seen.add(u)
-        db.add(models.FabricImage(fabric_id=fabric_id, url=u))
-    db.commit()
-    db.refresh(obj)
-    return {"ok": True, "count": len(seen)}
+    diff = gallery.sync(db, models.FabricImage, "fabric_id", fabric_id, urls)
+    if diff.changed:
+        refresh_refs(db, diff.touched)
+        obj.updated_at = datetime.utcnow()
+        db.commit()
+        invalidation.publish("fabrics", fabric_id, "update", (FABRICS,))
+    return {
+        "ok": True, "count": len(set(filter(None, urls or []))),
+        "inserted": diff.inserted, "deleted": diff.deleted, "moved": diff.moved,
+    }
 
 
 @router.put("/{fabric_id}/works")
+@session_route
 def replace_fabric_works(
     fabric_id: int, urls: List[str] = Body(...), db: Session = Depends(get_db)
 ):
     obj = db.get(models.Fabric, fabric_id)
     if not obj:
         raise HTTPException(404, "Fabric not found")
-    db.query(models.FabricWork).filter(models.FabricWork.fabric_id == fabric_id).delete(
-        synchronize_session=False
-    )
-    seen = set()
-    for u in urls or []:
-        if u in seen:
-            continue
-        seen.add(u)
-        db.add(models.FabricWork(fabric_id=fabric_id, url=u))
-    db.commit()
-    db.refresh(obj)
-    return {"ok": True, "count": len(seen)}
+    diff = gallery.sync(db, models.FabricWork, "fabric_id", fabric_id, urls)
+    if diff.changed:
+        refresh_refs(db, diff.touched)
+        obj.updated_at = datetime.utcnow()
+        db.commit()
+        invalidation.publish("fabrics", fabric_id, "update", (FABRICS,))
+    return {
+        "ok": True, "count": len(set(filter(None, urls or []))),
+        "inserted": diff.inserted, "deleted": diff.deleted, "moved": diff.moved,
+    }
 
 
 # 刪除（支援絕對或相對 URL）
 @router.delete("/{fabric_id}/images")
+@session_route
 def delete_fabric_images(
     fabric_id: int,
     url: Optional[str] = None,
@@ -245,11 +263,15 @@ def delete_fabric_images(
         )
         .delete(synchronize_session=False)
     )
+    refresh_refs(db, candidates)
+    obj.updated_at = datetime.utcnow()
     db.commit()
+    invalidation.publish("fabrics", fabric_id, "update", (FABRICS,))
     return {"ok": True, "deleted": deleted}
 
 
 @router.delete("/{fabric_id}/works")
+@session_route
 def delete_fabric_works(
     fabric_id: int,
     url: Optional[str] = None,
@@ -271,5 +293,8 @@ def delete_fabric_works(
         )
         .delete(synchronize_session=False)
     )
+    refresh_refs(db, candidates)
+    obj.updated_at = datetime.utcnow()
     db.commit()
+    invalidation.publish("fabrics", fabric_id, "update", (FABRICS,))
     return {"ok": True, "deleted": deleted}
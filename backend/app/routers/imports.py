@@ -0,0 +1,54 @@
+import io
+from typing import Optional
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from starlette.concurrency import run_in_threadpool
+from ..database import SessionLocal
+from .. import derivatives, invalidation
+from ..cache import FABRICS
+from ..catalog_import import PhotoSource, guess_format, read_manifest, run_import
+
+router = APIRouter()
+
+
+def _run(kind: str, manifest: UploadFile, fmt: str, photos: Optional[UploadFile]):
+    try:
+        src = PhotoSource(fileobj=photos.file) if photos is not None else None
+    except Exception:
+        raise HTTPException(400, "photos must be a zip file")
+    text = io.TextIOWrapper(manifest.file, encoding="utf-8-sig", newline="")
+    db = SessionLocal()
+    try:
+        return run_import(db, kind, read_manifest(text, fmt), src)
+    finally:
+        db.close()
+        if src:
+            src.close()
+
+
+async def _import(kind: str, manifest: UploadFile, fmt: Optional[str], photos: Optional[UploadFile]):
+    fmt = fmt or guess_format(manifest.filename)
+    report, new_photos = await run_in_threadpool(_run, kind, manifest, fmt, photos)
+    await derivatives.generate(new_photos)
+    if report.created:
+        # 新商品可能分散在任意分類
+        tags = (FABRICS,) if kind == "fabrics" else (invalidation.ALL,)
+        invalidation.publish(kind, (), "import", tags)
+    return report.as_dict()
+
+
+@router.post("/fabrics")
+async def import_fabrics(
+    manifest: UploadFile = File(...),
+    photos: Optional[UploadFile] = File(None),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+):
+    return await _import("fabrics", manifest, format, photos)
+
+
+@router.post("/products")
+async def import_products(
+    manifest: UploadFile = File(...),
+    photos: Optional[UploadFile] = File(None),
+    format: Optional[str] = Query(None, pattern="^(csv|jsonl)$"),
+):
+    return await _import("products", manifest, format, photos)
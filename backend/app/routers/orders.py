@@ -1,80 +1,372 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from sqlalchemy import delete, insert, select, update
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import SessionLocal
-from .. import models, schemas
+from typing import Dict, Iterable, Iterator, List, Optional
+from datetime import datetime
+from pydantic import ValidationError
+import csv
+import io
+import json
+from ..database import get_db, session_route, settings
+from .. import models, schemas, queries, versions, rollups, exports, fastjson, invalidation
+from ..utils.conditional import not_modified
+from ..utils.pagination import LIMIT_DESCRIPTION, MAX_LIMIT, paginate, set_next_cursor
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+IN_CHUNK = 500
+BULK_CHUNK = 1000
+
+
+def _chunks(seq: list, n: int) -> Iterator[list]:
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+
+def prices_of_products(db: Session, product_ids: Iterable[int]) -> Dict[int, float]:
+    """一次（依 IN_CHUNK 分批）查出所有商品的實際售價；缺少的 id 不會出現在結果中。"""
+    ids = sorted(set(product_ids))
+    out: Dict[int, float] = {}
+    for chunk in _chunks(ids, IN_CHUNK):
+        rows = db.execute(
+            select(models.Product.id, models.Product.effective_price)
+            .where(models.Product.id.in_(chunk))
+        )
+        for pid, price in rows:
+            out[pid] = price
+    return out
+
+
+def existing_fabric_ids(db: Session, fabric_ids: Iterable[int]) -> set:
+    ids = sorted({f for f in fabric_ids if f is not None})
+    found = set()
+    for chunk in _chunks(ids, IN_CHUNK):
+        found.update(db.execute(select(models.Fabric.id).where(models.Fabric.id.in_(chunk))).scalars())
+    return found
+
+
+def _line(it: schemas.OrderItemBase, base_price: float) -> dict:
+    return dict(
+        product_id=it.product_id,
+        fabric_id=it.fabric_id,
+        state=it.state,
+        original_price=base_price,
+        adjustment=it.adjustment or 0,
+        final_price=base_price + (it.adjustment or 0),
+        description=it.description,
+    )
 
-def price_of_product(db: Session, product_id: int) -> float:
-    product = db.get(models.Product, product_id)
-    if not product:
-        raise HTTPException(400, "product_id not found")
-    return product.promo_price if product.promo_price and product.promo_price > 0 else product.price
+
+def _totals(rows: List[dict]) -> dict:
+    return {"total": sum(r["final_price"] for r in rows), "item_count": len(rows)}
+
+
+def _item_rows(orders: List[schemas.OrderCreate], db: Session) -> List[List[dict]]:
+    """驗證並計價所有明細；回傳每張訂單的 OrderItem 欄位（尚無 order_id）。"""
+    prices = prices_of_products(db, (it.product_id for o in orders for it in o.items))
+    fabrics = existing_fabric_ids(db, (it.fabric_id for o in orders for it in o.items))
+    errors = []
+    result = []
+    for n, o in enumerate(orders):
+        rows = []
+        for it in o.items:
+            if it.product_id not in prices:
+                errors.append({"order": n, "error": f"product_id not found: {it.product_id}"})
+                continue
+            if it.fabric_id is not None and it.fabric_id not in fabrics:
+                errors.append({"order": n, "error": f"fabric_id not found: {it.fabric_id}"})
+                continue
+            rows.append(_line(it, prices[it.product_id]))
+        result.append(rows)
+    if errors:
+        if len(orders) == 1:
+            raise HTTPException(400, errors[0]["error"])
+        raise HTTPException(400, {"errors": errors[:100], "error_count": len(errors)})
+    return result
 
 @router.get("/", response_model=List[schemas.OrderOut])
-def list_orders(db: Session = Depends(get_db)):
-    return db.query(models.Order).all()
+@session_route
+def list_orders(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    order_status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+    db: Session = Depends(get_db),
+):
+    headers = versions.list_validators(db, request, "orders")
+    hit = not_modified(request, headers)
+    if hit is not None:
+        return hit
+    q = queries.orders_query(
+        db, order_status, payment_status, created_from, created_to, min_total, max_total,
+        columns=fastjson.ORDER_COLUMNS if settings.FAST_JSON else None,
+    )
+    rows, next_cursor = paginate(
+        q, models.Order.id, sort, queries.ORDER_SORTS, limit, cursor
+    )
+    response.headers.update(headers)
+    set_next_cursor(response, next_cursor)
+    if settings.FAST_JSON:
+        return fastjson.respond(fastjson.order_rows(db, rows), response)
+    return rows
+
+@router.get("/export")
+def export_orders(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    order_status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    min_total: Optional[float] = None,
+    max_total: Optional[float] = None,
+):
+    """串流匯出訂單；CSV 每列一筆明細，可直接回灌 /bulk/upload。"""
+    return exports.export_response(
+        "orders", format,
+        lambda db: queries.orders_query(
+            db, order_status, payment_status, created_from, created_to, min_total, max_total,
+        ),
+        models.Order.created_at, models.Order.id,
+        schemas.OrderOut, exports.ORDER_COLUMNS, exports.order_rows,
+    )
 
 @router.post("/", response_model=schemas.OrderOut)
+@session_route
 def create_order(data: schemas.OrderCreate, db: Session = Depends(get_db)):
+    (rows,) = _item_rows([data], db)
     order = models.Order(
         customer_name=data.customer_name,
         description=data.description,
         order_status=data.order_status,
         payment_status=data.payment_status,
+        **_totals(rows),
     )
     db.add(order)
     db.flush()
 
-    for it in data.items:
-        base_price = price_of_product(db, it.product_id)
-        final = base_price + (it.adjustment or 0)
-        item = models.OrderItem(
-            order_id=order.id,
-            product_id=it.product_id,
-            fabric_id=it.fabric_id,
-            state=it.state,
-            original_price=base_price,
-            adjustment=it.adjustment or 0,
-            final_price=final,
-            description=it.description,
-        )
-        db.add(item)
+    if rows:
+        db.execute(insert(models.OrderItem), [{**row, "order_id": order.id} for row in rows])
+    rollups.apply_orders(db, [order.id], +1)
     db.commit()
-    db.refresh(order)
-    return order
+    invalidation.publish("orders", order.id, "create")
+    return db.get(models.Order, order.id, options=queries.ORDER_LOAD, populate_existing=True)
+
+
+def _bulk_insert(db: Session, orders: List[schemas.OrderCreate]) -> List[int]:
+    """以 executemany 批次寫入訂單與明細；整批在同一個交易內，失敗全部回滾。"""
+    item_rows = _item_rows(orders, db)
+    # SQLite 在同一個多列 INSERT 內依 VALUES 順序遞增配發 rowid，排序後即可對應；
+    # 要求 sort_by_parameter_order 反而會讓 SQLite 退化成逐列 INSERT
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    stmt = insert(models.Order).returning(models.Order.id, sort_by_parameter_order=not sqlite)
+    ids: List[int] = []
+    try:
+        for start in range(0, len(orders), BULK_CHUNK):
+            chunk = orders[start:start + BULK_CHUNK]
+            order_ids = db.scalars(stmt, [
+                {**o.model_dump(exclude={"items"}), **_totals(rows)}
+                for o, rows in zip(chunk, item_rows[start:start + BULK_CHUNK])
+            ]).all()
+            if sqlite:
+                order_ids = sorted(order_ids)
+            items = [
+                {**row, "order_id": oid}
+                for oid, rows in zip(order_ids, item_rows[start:start + BULK_CHUNK])
+                for row in rows
+            ]
+            if items:
+                db.execute(insert(models.OrderItem), items)
+            rollups.apply_orders(db, order_ids, +1)
+            ids.extend(order_ids)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    invalidation.publish("orders", ids, "create")
+    return ids
+
+
+def _parse_ndjson(text: Iterable[str]) -> Iterator[dict]:
+    for line in text:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _parse_csv(text: Iterable[str]) -> Iterator[dict]:
+    """每列一筆明細；相同 order_ref 的連續列合併為一張訂單。"""
+    current_ref, current = None, None
+    for row in csv.DictReader(text):
+        ref = row.get("order_ref") or row.get("customer_name")
+        if current is None or ref != current_ref:
+            if current is not None:
+                yield current
+            current_ref = ref
+            current = {
+                k: row[k]
+                for k in ("customer_name", "description", "order_status", "payment_status")
+                if row.get(k)
+            }
+            current["items"] = []
+        if row.get("product_id"):
+            item = {"product_id": row["product_id"]}
+            if row.get("fabric_id"):
+                item["fabric_id"] = row["fabric_id"]
+            for k in ("state", "adjustment"):
+                if row.get(k):
+                    item[k] = row[k]
+            if row.get("item_description"):
+                item["description"] = row["item_description"]
+            current["items"].append(item)
+    if current is not None:
+        yield current
+
+
+@router.post("/bulk")
+@session_route
+def create_orders_bulk(data: List[schemas.OrderCreate], db: Session = Depends(get_db)):
+    ids = _bulk_insert(db, data)
+    return {"ok": True, "created": len(ids), "ids": ids}
+
+
+@router.post("/bulk/upload")
+@session_route
+def upload_orders_bulk(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    db: Session = Depends(get_db),
+):
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    text = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    parse = _parse_csv if fmt == "csv" else _parse_ndjson
+    orders, errors = [], []
+    try:
+        for n, raw in enumerate(parse(text)):
+            try:
+                orders.append(schemas.OrderCreate.model_validate(raw))
+            except ValidationError as e:
+                errors.append({"order": n, "error": e.errors(include_url=False)})
+    except (ValueError, csv.Error) as e:
+        raise HTTPException(400, f"Malformed {fmt}: {e}")
+    if errors:
+        raise HTTPException(400, {"errors": errors[:100], "error_count": len(errors)})
+    ids = _bulk_insert(db, orders)
+    return {"ok": True, "created": len(ids), "ids": ids}
 
 @router.get("/{order_id}", response_model=schemas.OrderOut)
-def get_order(order_id: int, db: Session = Depends(get_db)):
-    obj = db.get(models.Order, order_id)
+@session_route
+def get_order(
+    order_id: int, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    headers = versions.row_validators(db, models.Order, order_id)
+    if headers is None:
+        raise HTTPException(404, "Order not found")
+    hit = not_modified(request, headers)
+    if hit is not None:
+        return hit
+    obj = db.get(models.Order, order_id, options=queries.ORDER_LOAD)
     if not obj:
         raise HTTPException(404, "Order not found")
+    response.headers.update(headers)
     return obj
 
 @router.put("/{order_id}", response_model=schemas.OrderOut)
+@session_route
 def update_order(order_id: int, data: schemas.OrderUpdate, db: Session = Depends(get_db)):
     obj = db.get(models.Order, order_id)
     if not obj:
         raise HTTPException(404, "Order not found")
-    for k, v in data.model_dump().items():
+    payload = data.model_dump()
+    # 狀態變動會移動營收在 rollup 中的歸屬：先扣舊的、再加新的
+    restate = (payload["order_status"], payload["payment_status"]) != (obj.order_status, obj.payment_status)
+    if restate:
+        rollups.apply_orders(db, [order_id], -1)
+    for k, v in payload.items():
         setattr(obj, k, v)
+    if restate:
+        rollups.apply_orders(db, [order_id], +1)
     db.commit()
-    db.refresh(obj)
-    return obj
+    invalidation.publish("orders", order_id, "update")
+    return db.get(models.Order, order_id, options=queries.ORDER_LOAD, populate_existing=True)
+
+@router.patch("/{order_id}/items", response_model=schemas.OrderOut)
+@session_route
+def edit_order_items(order_id: int, data: schemas.OrderItemsBatch, db: Session = Depends(get_db)):
+    """一次新增／取代／刪除多筆明細。
+
+    需要計價的列（新增、換了商品、或 reprice）只查一次商品售價；其餘列保留
+    原本的 original_price。訂單 total / item_count 以差額更新，rollup 同步調整。
+    """
+    order = db.get(models.Order, order_id)
+    if not order:
+        raise HTTPException(404, "Order not found")
+    Item = models.OrderItem
+    touched = [it.id for it in data.update] + list(data.remove)
+    if len(set(touched)) != len(touched):
+        raise HTTPException(400, "Each item id may appear only once in update and remove")
+    old = {}
+    for chunk in _chunks(sorted(touched), IN_CHUNK):
+        rows = db.execute(
+            select(Item.id, Item.product_id, Item.original_price, Item.final_price)
+            .where(Item.order_id == order_id, Item.id.in_(chunk))
+        )
+        old.update((r.id, r) for r in rows)
+    missing = [i for i in touched if i not in old]
+    if missing:
+        raise HTTPException(404, f"Order item not found: {missing[0]}")
+
+    repriced = [it for it in data.update if data.reprice or it.product_id != old[it.id].product_id]
+    prices = prices_of_products(db, (it.product_id for it in [*data.add, *repriced]))
+    fabrics = existing_fabric_ids(db, (it.fabric_id for it in [*data.add, *data.update]))
+    for it in [*data.add, *repriced]:
+        if it.product_id not in prices:
+            raise HTTPException(400, f"product_id not found: {it.product_id}")
+    for it in [*data.add, *data.update]:
+        if it.fabric_id is not None and it.fabric_id not in fabrics:
+            raise HTTPException(400, f"fabric_id not found: {it.fabric_id}")
+
+    repriced_ids = {it.id for it in repriced}
+    added = [{**_line(it, prices[it.product_id]), "order_id": order_id} for it in data.add]
+    updated = [
+        {"id": it.id, **_line(it, prices[it.product_id] if it.id in repriced_ids else old[it.id].original_price)}
+        for it in data.update
+    ]
+    if not (added or updated or data.remove):
+        return db.get(models.Order, order_id, options=queries.ORDER_LOAD)
+
+    rollups.apply_orders(db, [order_id], -1)
+    for chunk in _chunks(list(data.remove), IN_CHUNK):
+        db.execute(delete(Item).where(Item.id.in_(chunk)))
+    if updated:
+        db.execute(update(Item), updated)
+    if added:
+        db.execute(insert(Item), added)
+    rollups.apply_totals(db, {order_id: (
+        sum(r["final_price"] for r in added + updated) - sum(old[i].final_price for i in touched),
+        len(added) - len(data.remove),
+    )})
+    # 明細變了訂單就算被修改（ETag / Last-Modified 跟著變）
+    order.updated_at = datetime.utcnow()
+    rollups.apply_orders(db, [order_id], +1)
+    db.commit()
+    invalidation.publish("orders", order_id, "update")
+    return db.get(models.Order, order_id, options=queries.ORDER_LOAD, populate_existing=True)
 
 @router.delete("/{order_id}")
+@session_route
 def delete_order(order_id: int, db: Session = Depends(get_db)):
     obj = db.get(models.Order, order_id)
     if not obj:
         raise HTTPException(404, "Order not found")
+    rollups.apply_orders(db, [order_id], -1)
     db.delete(obj)
     db.commit()
+    invalidation.publish("orders", order_id, "delete")
     return {"ok": True}
@@ -1,21 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 from urllib.parse import urlparse
-from ..database import SessionLocal
-from .. import models, schemas
+from ..database import get_db, session_route, settings
+from .. import models, schemas, queries, search, versions, exports, gallery, fastjson, invalidation
+from ..blobstore import refresh_refs
+from ..cache import category_tag
+from ..utils.conditional import not_modified
+from ..utils.pagination import LIMIT_DESCRIPTION, MAX_LIMIT, paginate, set_next_cursor
 
 router = APIRouter()
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 def _normalize_urls(urls: List[str]) -> List[str]:
     norm = []
     for u in urls or []:
@@ -34,30 +31,89 @@ def _normalize_urls(urls: List[str]) -> List[str]:
 
 
 @router.get("/", response_model=List[schemas.ProductOut])
-def list_products(db: Session = Depends(get_db)):
-    return db.query(models.Product).all()
+@session_route
+def list_products(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    headers = versions.list_validators(db, request, "products")
+    hit = not_modified(request, headers)
+    if hit is not None:
+        return hit
+    q = queries.products_query(
+        db, category_id, min_price, max_price, created_from, created_to,
+        columns=fastjson.PRODUCT_COLUMNS if settings.FAST_JSON else None,
+    )
+    rows, next_cursor = paginate(
+        q, models.Product.id, sort, queries.PRODUCT_SORTS, limit, cursor
+    )
+    response.headers.update(headers)
+    set_next_cursor(response, next_cursor)
+    if settings.FAST_JSON:
+        return fastjson.respond(fastjson.product_rows(db, rows), response)
+    return rows
+
+
+@router.get("/export")
+def export_products(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    category_id: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    return exports.export_response(
+        "products", format,
+        lambda db: queries.products_query(db, category_id, min_price, max_price, created_from, created_to),
+        models.Product.created_at, models.Product.id,
+        schemas.ProductOut, exports.PRODUCT_COLUMNS, exports.product_rows,
+    )
 
 
 @router.post("/", response_model=schemas.ProductOut)
+@session_route
 def create_product(data: schemas.ProductCreate, db: Session = Depends(get_db)):
     if not db.get(models.Category, data.category_id):
         raise HTTPException(400, "category_id not found")
     obj = models.Product(**data.model_dump())
     db.add(obj)
+    search.index_product(db, obj)
     db.commit()
-    db.refresh(obj)
+    obj = db.get(models.Product, obj.id, options=queries.PRODUCT_LOAD, populate_existing=True)
+    invalidation.publish("products", obj.id, "create", (category_tag(obj.category_id),))
     return obj
 
 
 @router.get("/{product_id}", response_model=schemas.ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    obj = db.get(models.Product, product_id)
+@session_route
+def get_product(
+    product_id: int, request: Request, response: Response, db: Session = Depends(get_db)
+):
+    headers = versions.row_validators(db, models.Product, product_id)
+    if headers is None:
+        raise HTTPException(404, "Product not found")
+    hit = not_modified(request, headers)
+    if hit is not None:
+        return hit
+    obj = db.get(models.Product, product_id, options=queries.PRODUCT_LOAD)
     if not obj:
         raise HTTPException(404, "Product not found")
+    response.headers.update(headers)
     return obj
 
 
 @router.put("/{product_id}", response_model=schemas.ProductOut)
+@session_route
 def update_product(
     product_id: int, data: schemas.ProductUpdate, db: Session = Depends(get_db)
 ):
@@ -65,98 +121,86 @@ def update_product(
     if not obj:
         raise HTTPException(404, "Product not found")
 
+    old_category_id = obj.category_id
     payload = data.model_dump()
     images_urls = payload.pop("images_urls", None)
 
     # 更新基本欄位
     for k, v in payload.items():
         setattr(obj, k, v)
-    db.commit()
+    search.index_product(db, obj)
 
-    # 有帶清單才處理
+    # 有帶清單才處理；與基本欄位同一個交易
     if images_urls is not None:
-        cur = [
-            r[0]
-            for r in db.query(models.ProductImage.url)
-            .filter(models.ProductImage.product_id == product_id)
-            .order_by(models.ProductImage.id.asc())
-            .all()
-        ]
-        if cur != images_urls:
-            db.query(models.ProductImage).filter(
-                models.ProductImage.product_id == product_id
-            ).delete(synchronize_session=False)
-            seen = set()
-            for u in images_urls or []:
-                if u in seen:
-                    continue
-                seen.add(u)
-                db.add(models.ProductImage(product_id=product_id, url=u))
-            db.commit()
-
-    db.refresh(obj)
+        diff = gallery.sync(db, models.ProductImage, "product_id", product_id, images_urls)
+        refresh_refs(db, diff.touched)
+        if diff.changed:
+            obj.updated_at = datetime.utcnow()
+    db.commit()
+
+    obj = db.get(models.Product, product_id, options=queries.PRODUCT_LOAD, populate_existing=True)
+    invalidation.publish("products", product_id, "update", (category_tag(old_category_id), category_tag(obj.category_id)))
     return obj
 
 
 @router.delete("/{product_id}")
+@session_route
 def delete_product(product_id: int, db: Session = Depends(get_db)):
     obj = db.get(models.Product, product_id)
     if not obj:
         raise HTTPException(404, "Product not found")
+    category_id = obj.category_id
+    urls = [i.url for i in obj.images]
     db.delete(obj)
+    search.remove_product(db, product_id)
+    refresh_refs(db, urls)
     db.commit()
+    invalidation.publish("products", product_id, "delete", (category_tag(category_id),))
     return {"ok": True}
 
 
 # 新增（冪等）
 @router.post("/{product_id}/images")
+@session_route
 def add_product_images(
     product_id: int, urls: List[str] = Body(...), db: Session = Depends(get_db)
 ):
     obj = db.get(models.Product, product_id)
     if not obj:
         raise HTTPException(404, "Product not found")
-    exists = {
-        r[0]
-        for r in db.query(models.ProductImage.url)
-        .filter(models.ProductImage.product_id == product_id)
-        .all()
-    }
-    ins = 0
-    for u in urls or []:
-        if u in exists:
-            continue
-        db.add(models.ProductImage(product_id=product_id, url=u))
-        ins += 1
-    db.commit()
-    db.refresh(obj)
-    return {"ok": True, "inserted": ins, "skipped": len((urls or [])) - ins}
+    diff = gallery.append(db, models.ProductImage, "product_id", product_id, urls)
+    if diff.changed:
+        refresh_refs(db, diff.touched)
+        obj.updated_at = datetime.utcnow()
+        db.commit()
+        invalidation.publish("products", product_id, "update", (category_tag(obj.category_id),))
+    return {"ok": True, "inserted": diff.inserted, "skipped": len((urls or [])) - diff.inserted}
 
 
-# 取代（全刪再建）
+# 取代：只套用差異（新增／刪除／調整順序），既有列的 id 不變
 @router.put("/{product_id}/images")
+@session_route
 def replace_product_images(
     product_id: int, urls: List[str] = Body(...), db: Session = Depends(get_db)
 ):
     obj = db.get(models.Product, product_id)
     if not obj:
         raise HTTPException(404, "Product not found")
-    db.query(models.ProductImage).filter(
-        models.ProductImage.product_id == product_id
-    ).delete(synchronize_session=False)
-    seen = set()
-    for u in urls or []:
-        if u in seen:
-            continue
-        seen.add(u)
-        db.add(models.ProductImage(product_id=product_id, url=u))
-    db.commit()
-    db.refresh(obj)
-    return {"ok": True, "count": len(seen)}
+    diff = gallery.sync(db, models.ProductImage, "product_id", product_id, urls)
+    if diff.changed:
+        refresh_refs(db, diff.touched)
+        obj.updated_at = datetime.utcnow()
+        db.commit()
+        invalidation.publish("products", product_id, "update", (category_tag(obj.category_id),))
+    return {
+        "ok": True, "count": len(set(filter(None, urls or []))),
+        "inserted": diff.inserted, "deleted": diff.deleted, "moved": diff.moved,
+    }
 
 
 # 刪除（支援絕對或相對 URL）
 @router.delete("/{product_id}/images")
+@session_route
 def delete_product_images(
     product_id: int,
     url: Optional[str] = None,
@@ -178,5 +222,8 @@ def delete_product_images(
         )
         .delete(synchronize_session=False)
     )
+    refresh_refs(db, candidates)
+    obj.updated_at = datetime.utcnow()
     db.commit()
+    invalidation.publish("products", product_id, "update", (category_tag(obj.category_id),))
     return {"ok": True, "deleted": deleted}
@@ -1,30 +1,137 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import SessionLocal
-from .. import models, schemas
+from typing import List, Optional
+from ..database import get_read_db, session_route, settings
+from .. import models, schemas, queries, search, versions, fastjson
+from ..cache import public_cache, FABRICS, CATEGORIES, category_tag
+from ..utils.cache import cached_json
+from ..utils.conditional import not_modified
+from ..utils.pagination import LIMIT_DESCRIPTION, MAX_LIMIT, NEXT_CURSOR_HEADER, paginate
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_fabrics = TypeAdapter(List[schemas.FabricOut])
+_categories = TypeAdapter(List[schemas.CategoryOut])
+_products = TypeAdapter(List[schemas.ProductOut])
+
+# FAST_JSON：布料／商品列表由欄位 tuple 組成 dict，以 fastjson.dumps 直接編碼
+_FAST = settings.FAST_JSON
+_DUMP = fastjson.dumps if _FAST else None
+
+def _cached(request, db, resource, tags, adapter, build, dump=None):
+    # 命中由 CachedResponseMiddleware 在進路由前回應；走到這裡表示沒有 entry。
+    # token 要在讀資料庫之前取得，之後才 commit 的寫入會讓這次結果不被存入
+    token = public_cache.token(tags)
+    headers = versions.list_validators(db, request, resource)
+    hit = not_modified(request, headers)
+    if hit is not None:
+        return hit
+    return cached_json(public_cache, request, tags, adapter, build, token, headers, dump)
+
+def _page(q, id_col, sort, sorts, limit, cursor, to_rows=None):
+    rows, next_cursor = paginate(q, id_col, sort, sorts, limit, cursor)
+    if to_rows is not None:
+        rows = to_rows(q.session, rows)
+    return rows, ({NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {})
+
+def _fabric_page(db, on_clearance, min_price, max_price, sort, limit, cursor):
+    q = queries.fabrics_query(
+        db, on_clearance, min_price, max_price,
+        columns=fastjson.FABRIC_COLUMNS if _FAST else None,
+    )
+    return _page(q, models.Fabric.id, sort, queries.FABRIC_SORTS, limit, cursor,
+                 fastjson.fabric_rows if _FAST else None)
 
 @router.get("/fabrics/clearance", response_model=List[schemas.FabricOut])
-def clearance_fabrics(db: Session = Depends(get_db)):
-    return db.query(models.Fabric).filter(models.Fabric.on_clearance == True).all()  # noqa: E712
+@session_route
+def clearance_fabrics(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: Session = Depends(get_read_db),
+):
+    def build():
+        return _fabric_page(db, True, min_price, max_price, sort, limit, cursor)
+    return _cached(request, db, "fabrics", (FABRICS,), _fabrics, build, _DUMP)
 
 @router.get("/fabrics", response_model=List[schemas.FabricOut])
-def list_fabrics(db: Session = Depends(get_db)):
-    return db.query(models.Fabric).all()
+@session_route
+def list_fabrics(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    on_clearance: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: Session = Depends(get_read_db),
+):
+    def build():
+        return _fabric_page(db, on_clearance, min_price, max_price, sort, limit, cursor)
+    return _cached(request, db, "fabrics", (FABRICS,), _fabrics, build, _DUMP)
 
 @router.get("/categories", response_model=List[schemas.CategoryOut])
-def list_categories(db: Session = Depends(get_db)):
-    return db.query(models.Category).all()
+@session_route
+def list_categories(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    db: Session = Depends(get_read_db),
+):
+    def build():
+        q = queries.categories_query(db)
+        return _page(q, models.Category.id, sort, queries.CATEGORY_SORTS, limit, cursor)
+    return _cached(request, db, "categories", (CATEGORIES,), _categories, build)
 
 @router.get("/products/by_category/{category_id}", response_model=List[schemas.ProductOut])
-def products_by_category(category_id: int, db: Session = Depends(get_db)):
-    return db.query(models.Product).filter(models.Product.category_id == category_id).all()
+@session_route
+def products_by_category(
+    category_id: int,
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_LIMIT, description=LIMIT_DESCRIPTION),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    db: Session = Depends(get_read_db),
+):
+    def build():
+        q = queries.products_query(
+            db, category_id, min_price, max_price,
+            columns=fastjson.PRODUCT_COLUMNS if _FAST else None,
+        )
+        return _page(q, models.Product.id, sort, queries.PRODUCT_SORTS, limit, cursor,
+                     fastjson.product_rows if _FAST else None)
+    return _cached(request, db, "products", (category_tag(category_id),), _products, build, _DUMP)
+
+def _by_rank(db, model, load, ids):
+    if not ids:
+        return []
+    rows = {r.id: r for r in db.query(model).options(*load).filter(model.id.in_(ids))}
+    return [rows[i] for i in ids if i in rows]
+
+@router.get("/search", response_model=schemas.SearchResults)
+@session_route
+def search_catalog(
+    q: str = Query(..., min_length=1, max_length=200),
+    kind: Optional[str] = Query(None, pattern="^(fabrics|products)$"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    """依相關度排序；kind 省略時兩種都查，各自套用 limit/offset。"""
+    if not search.available(db):
+        raise HTTPException(503, "Search is not available")
+    out = {"fabrics": [], "products": []}
+    if kind in (None, "fabrics"):
+        ids = search.search_fabric_ids(db, q, limit, offset)
+        out["fabrics"] = _by_rank(db, models.Fabric, queries.FABRIC_LOAD, ids)
+    if kind in (None, "products"):
+        ids = search.search_product_ids(db, q, limit, offset)
+        out["products"] = _by_rank(db, models.Product, queries.PRODUCT_LOAD, ids)
+    return out
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+from ..database import get_db
+from .. import models, rollups
+
+router = APIRouter()
+
+R = models.SalesRollup
+
+def _period(db: Session, fmt_sqlite: str, fmt_pg: str):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(R.day, fmt_pg)
+    return func.strftime(fmt_sqlite, R.day)
+
+def _iso_week(db: Session):
+    """ISO 8601 週（週一起算，跨年的週歸到週四所在的年份），兩種資料庫結果一致。"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(R.day, 'IYYY-"W"IW')
+    # SQLite 3.46 之前的 strftime 沒有 %G/%V：由同一週的週四取年份與週次
+    thursday = func.date(R.day, "-3 days", "weekday 4")
+    week = (cast(func.strftime("%j", thursday), Integer) + 6) // 7
+    return func.printf("%s-W%02d", func.strftime("%Y", thursday), week)
+
+def _dimensions(db: Session):
+    return {
+        "day": R.day,
+        "week": _iso_week(db),
+        "month": _period(db, "%Y-%m", "YYYY-MM"),
+        "product": R.product_id,
+        "category": models.Product.category_id,
+        "fabric": R.fabric_id,
+        "order_status": R.order_status,
+        "payment_status": R.payment_status,
+    }
+
+@router.get("/sales")
+def sales_report(
+    group_by: List[str] = Query(["day"]),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    order_status: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    product_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    fabric_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+):
+    """營收與件數彙總；group_by 可重複或以逗號分隔（例：group_by=month,category）。"""
+    dims = _dimensions(db)
+    keys = [k.strip() for g in group_by for k in g.split(",") if k.strip()]
+    unknown = [k for k in keys if k not in dims]
+    if unknown or not keys:
+        raise HTTPException(400, f"group_by must be from: {', '.join(dims)}")
+    keys = list(dict.fromkeys(keys))
+    cols = [dims[k].label(k) for k in keys]
+    q = select(*cols, func.sum(R.revenue).label("revenue"), func.sum(R.item_count).label("item_count"))
+    if "category" in keys or category_id is not None:
+        q = q.select_from(R).join(models.Product, models.Product.id == R.product_id)
+    if date_from is not None:
+        q = q.where(R.day >= date_from)
+    if date_to is not None:
+        q = q.where(R.day <= date_to)
+    if order_status is not None:
+        q = q.where(R.order_status == order_status)
+    if payment_status is not None:
+        q = q.where(R.payment_status == payment_status)
+    if product_id is not None:
+        q = q.where(R.product_id == product_id)
+    if category_id is not None:
+        q = q.where(models.Product.category_id == category_id)
+    if fabric_id is not None:
+        q = q.where(R.fabric_id == fabric_id)
+    q = q.group_by(*(dims[k] for k in keys)).order_by(*(dims[k] for k in keys))
+
+    out = []
+    for row in db.execute(q):
+        d = dict(row._mapping)
+        if "fabric" in d and d["fabric"] == 0:
+            d["fabric"] = None
+        d["revenue"] = float(d["revenue"] or 0)
+        d["item_count"] = int(d["item_count"] or 0)
+        out.append(d)
+    return out
+
+@router.post("/rebuild")
+def rebuild_rollups(db: Session = Depends(get_db)):
+    return {"ok": True, "rows": rollups.rebuild(db)}
@@ -1,35 +1,52 @@
 import os
 from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from ..utils.paths import ensure_dir, public_url_for
+from fastapi import APIRouter, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from ..database import SessionLocal, settings
+from .. import derivatives
+from ..blobstore import commit_file
+from ..utils.paths import blob_tmp_dir, path_for_url
+from ..utils.streaming import StoredFile, receive_files
 
 router = APIRouter()
 
-@router.post("/fabrics/{fabric_id}")
-async def upload_fabric_images(fabric_id: int, kind: str = "image", files: List[UploadFile] = File(...)):
+# body 由 receive_files 自行解析，這裡只補上 OpenAPI 描述
+_FILES_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["files"],
+            "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+        }}},
+    }
+}
+
+def _commit(stored: StoredFile, ext: str) -> str:
+    db = SessionLocal()
+    try:
+        return commit_file(db, stored.path, stored.sha256, stored.size, ext)
+    finally:
+        db.close()
+
+def _ext(filename: str) -> str:
+    return os.path.splitext(filename or "")[1].lower() or ".jpg"
+
+async def _save_all(request: Request) -> List[str]:
+    received = await receive_files(
+        request, blob_tmp_dir(), settings.UPLOAD_MAX_FILE_BYTES, settings.UPLOAD_MAX_REQUEST_BYTES,
+    )
+    # 內容定址：同一份內容（不論屬於哪個布料/商品）只存一份
+    urls = [await run_in_threadpool(_commit, s, _ext(name)) for name, s in received]
+    await derivatives.generate([path_for_url(u) for u in dict.fromkeys(urls)])
+    return urls
+
+@router.post("/fabrics/{fabric_id}", openapi_extra=_FILES_BODY)
+async def upload_fabric_images(fabric_id: int, request: Request, kind: str = "image"):
     if kind not in ("image", "work"):
         raise HTTPException(400, "kind must be 'image' or 'work'")
-    sub = "images" if kind == "image" else "works"
-    saved = []
-    base_dir = ensure_dir(f"fabrics/{fabric_id}/{sub}")
-    for idx, f in enumerate(files):
-        ext = os.path.splitext(f.filename)[1].lower() or ".jpg"
-        filename = f"{idx}_{abs(hash(f.filename))}{ext}"
-        path = os.path.join(base_dir, filename)
-        with open(path, "wb") as out:
-            out.write(await f.read())
-        saved.append(public_url_for(path))
-    return {"saved": saved}
+    return {"saved": await _save_all(request)}
 
-@router.post("/products/{product_id}")
-async def upload_product_images(product_id: int, files: List[UploadFile] = File(...)):
-    saved = []
-    base_dir = ensure_dir(f"products/{product_id}/images")
-    for idx, f in enumerate(files):
-        ext = os.path.splitext(f.filename)[1].lower() or ".jpg"
-        filename = f"{idx}_{abs(hash(f.filename))}{ext}"
-        path = os.path.join(base_dir, filename)
-        with open(path, "wb") as out:
-            out.write(await f.read())
-        saved.append(public_url_for(path))
-    return {"saved": saved}
+@router.post("/products/{product_id}", openapi_extra=_FILES_BODY)
+async def upload_product_images(product_id: int, request: Request):
+    return {"saved": await _save_all(request)}
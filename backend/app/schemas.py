@@ -1,20 +1,33 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from typing import List, Optional
 from datetime import datetime
+from .derivatives import variants_for_url
 
-# ------------ Fabric ------------
-class FabricImage(BaseModel):
-    id: int
+class ImageVariant(BaseModel):
+    width: int
+    format: str
     url: str
-    class Config:
-        from_attributes = True
 
-class FabricWork(BaseModel):
+class _ImageOut(BaseModel):
     id: int
     url: str
+
+    @computed_field
+    @property
+    def variants(self) -> List[ImageVariant]:
+        # 縮圖 URL 由原檔 URL 推得，不需查詢
+        return [ImageVariant(**v) for v in variants_for_url(self.url)]
+
     class Config:
         from_attributes = True
 
+# ------------ Fabric ------------
+class FabricImage(_ImageOut):
+    pass
+
+class FabricWork(_ImageOut):
+    pass
+
 class FabricBase(BaseModel):
     name: str
     origin: str = "台灣"
@@ -28,11 +41,14 @@ class FabricCreate(FabricBase):
     pass
 
 class FabricUpdate(FabricBase):
-    pass
+    # 有帶才同步圖庫（依清單順序）；None 表示不動
+    images_urls: Optional[List[str]] = None
+    works_urls: Optional[List[str]] = None
 
 class FabricOut(FabricBase):
     id: int
     created_at: datetime
+    effective_price: float = 0
     images: List[FabricImage] = []
     works: List[FabricWork] = []
     class Config:
@@ -55,11 +71,8 @@ class CategoryOut(CategoryBase):
         from_attributes = True
 
 # ------------ Product ------------
-class ProductImage(BaseModel):
-    id: int
-    url: str
-    class Config:
-        from_attributes = True
+class ProductImage(_ImageOut):
+    pass
 
 class ProductBase(BaseModel):
     name: str
@@ -73,15 +86,21 @@ class ProductCreate(ProductBase):
     pass
 
 class ProductUpdate(ProductBase):
-    pass
+    images_urls: Optional[List[str]] = None
 
 class ProductOut(ProductBase):
     id: int
     created_at: datetime
+    effective_price: float = 0
     images: List[ProductImage] = []
     class Config:
         from_attributes = True
 
+# ------------ Search ------------
+class SearchResults(BaseModel):
+    fabrics: List[FabricOut] = []
+    products: List[ProductOut] = []
+
 # ------------ Orders ------------
 class OrderItemBase(BaseModel):
     product_id: int
@@ -94,7 +113,7 @@ class OrderItemCreate(OrderItemBase):
     pass
 
 class OrderItemUpdate(OrderItemBase):
-    pass
+    id: int
 
 class OrderItemOut(OrderItemBase):
     id: int
@@ -115,6 +134,14 @@ class OrderCreate(OrderBase):
 class OrderUpdate(OrderBase):
     pass
 
+class OrderItemsBatch(BaseModel):
+    add: List[OrderItemCreate] = []
+    # 整列取代（id 必須屬於這張訂單）；換了商品的列以目前售價重新計價
+    update: List[OrderItemUpdate] = []
+    remove: List[int] = []
+    # True：update 中商品沒變的列也改用目前售價
+    reprice: bool = False
+
 class OrderOut(BaseModel):
     id: int
     customer_name: str
@@ -122,6 +149,8 @@ class OrderOut(BaseModel):
     order_status: str
     payment_status: str
     created_at: datetime
+    total: float = 0
+    item_count: int = 0
     items: List[OrderItemOut] = []
     class Config:
         from_attributes = True
@@ -0,0 +1,162 @@
+"""布料／商品全文檢索（SQLite FTS5）。
+
+FTS5 內建的 unicode61 會把連續的中文字當成一個 token，搜尋「棉布」找不到
+「純棉布料」。這裡在寫入索引前先把 CJK 字串展開成單字＋相鄰雙字（bigram），
+查詢時以 bigram（單字查詢則用單字）AND 起來，近似片語比對，並以 bm25 排序。
+
+fabrics_fts / products_fts 以 rowid 對應實體 id，由 fabrics.py、products.py 的
+新增／修改／刪除路徑在同一個交易內更新；表由 migrations 建立並回填。
+"""
+import re
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+
+_CJK = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]+")
+_WORD = re.compile(r"\w+")
+
+# bm25 權重，順序同欄位
+FABRIC_WEIGHTS = (10.0, 3.0, 1.0)
+PRODUCT_WEIGHTS = (10.0, 1.0)
+
+
+def index_text(value: str) -> str:
+    def expand(m):
+        run = m.group(0)
+        grams = list(run) + [run[i:i + 2] for i in range(len(run) - 1)]
+        return " " + " ".join(grams) + " "
+
+    return _CJK.sub(expand, value or "")
+
+
+def match_expression(q: str) -> str:
+    """把使用者輸入轉成 FTS5 MATCH 字串；沒有可用 token 時回傳空字串。"""
+    terms: List[str] = []
+    pos = 0
+    for m in _CJK.finditer(q):
+        terms += [w.lower() for w in _WORD.findall(q[pos:m.start()])]
+        run = m.group(0)
+        terms += [run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)]
+        pos = m.end()
+    tail = [w.lower() for w in _WORD.findall(q[pos:])]
+    terms += tail
+    if not terms:
+        return ""
+    parts = ['"' + t.replace('"', '""') + '"' for t in dict.fromkeys(terms)]
+    # 最後一個英數字詞做前綴比對（邊打邊搜）
+    if tail and not q[-1].isspace():
+        last = '"' + tail[-1].replace('"', '""') + '"'
+        parts = [p for p in parts if p != last] + [last + "*"]
+    return " AND ".join(parts)
+
+
+# ---- schema ----
+def create_tables(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS fabrics_fts USING fts5("
+        "name, origin, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5("
+        "name, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+
+def rebuild(conn: Connection) -> None:
+    conn.exec_driver_sql("DELETE FROM fabrics_fts")
+    conn.exec_driver_sql("DELETE FROM products_fts")
+    rows = conn.execute(
+        text("SELECT id, name, origin, description FROM fabrics")
+    ).all()
+    if rows:
+        conn.execute(
+            text("INSERT INTO fabrics_fts (rowid, name, origin, description) VALUES (:id, :n, :o, :d)"),
+            [{"id": r[0], "n": index_text(r[1]), "o": index_text(r[2]), "d": index_text(r[3])} for r in rows],
+        )
+    rows = conn.execute(text("SELECT id, name, description FROM products")).all()
+    if rows:
+        conn.execute(
+            text("INSERT INTO products_fts (rowid, name, description) VALUES (:id, :n, :d)"),
+            [{"id": r[0], "n": index_text(r[1]), "d": index_text(r[2])} for r in rows],
+        )
+
+
+def available(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite"
+
+
+# ---- write paths ----
+def index_fabric(db: Session, obj: models.Fabric) -> None:
+    if not available(db):
+        return
+    db.flush()
+    db.execute(text("DELETE FROM fabrics_fts WHERE rowid = :id"), {"id": obj.id})
+    db.execute(
+        text("INSERT INTO fabrics_fts (rowid, name, origin, description) VALUES (:id, :n, :o, :d)"),
+        {"id": obj.id, "n": index_text(obj.name), "o": index_text(obj.origin), "d": index_text(obj.description)},
+    )
+
+
+def index_product(db: Session, obj: models.Product) -> None:
+    if not available(db):
+        return
+    db.flush()
+    db.execute(text("DELETE FROM products_fts WHERE rowid = :id"), {"id": obj.id})
+    db.execute(
+        text("INSERT INTO products_fts (rowid, name, description) VALUES (:id, :n, :d)"),
+        {"id": obj.id, "n": index_text(obj.name), "d": index_text(obj.description)},
+    )
+
+
+def index_fabric_rows(db: Session, rows: List[dict]) -> None:
+    """批次匯入用：rows 為剛新增的布料欄位（含 id），不需先刪除。"""
+    if available(db) and rows:
+        db.execute(
+            text("INSERT INTO fabrics_fts (rowid, name, origin, description) VALUES (:id, :n, :o, :d)"),
+            [{"id": r["id"], "n": index_text(r["name"]), "o": index_text(r["origin"]), "d": index_text(r["description"])} for r in rows],
+        )
+
+
+def index_product_rows(db: Session, rows: List[dict]) -> None:
+    if available(db) and rows:
+        db.execute(
+            text("INSERT INTO products_fts (rowid, name, description) VALUES (:id, :n, :d)"),
+            [{"id": r["id"], "n": index_text(r["name"]), "d": index_text(r["description"])} for r in rows],
+        )
+
+
+def remove_fabric(db: Session, fabric_id: int) -> None:
+    if available(db):
+        db.execute(text("DELETE FROM fabrics_fts WHERE rowid = :id"), {"id": fabric_id})
+
+
+def remove_product(db: Session, product_id: int) -> None:
+    if available(db):
+        db.execute(text("DELETE FROM products_fts WHERE rowid = :id"), {"id": product_id})
+
+
+# ---- query ----
+def _ranked_ids(db: Session, table: str, weights: Tuple[float, ...], match: str, limit: int, offset: int) -> List[int]:
+    w = ", ".join(str(x) for x in weights)
+    rows = db.execute(
+        text(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH :m "
+            f"ORDER BY bm25({table}, {w}) LIMIT :limit OFFSET :offset"
+        ),
+        {"m": match, "limit": limit, "offset": offset},
+    )
+    return [r[0] for r in rows]
+
+
+def search_fabric_ids(db: Session, q: str, limit: int, offset: int) -> List[int]:
+    match = match_expression(q)
+    return _ranked_ids(db, "fabrics_fts", FABRIC_WEIGHTS, match, limit, offset) if match else []
+
+
+def search_product_ids(db: Session, q: str, limit: int, offset: int) -> List[int]:
+    match = match_expression(q)
+    return _ranked_ids(db, "products_fts", PRODUCT_WEIGHTS, match, limit, offset) if match else []
@@ -0,0 +1,289 @@
+"""/static 的上傳檔服務：長效快取、預壓縮檔、Range 與條件請求。
+
+內容定址的 blob（/static/uploads/blobs/ab/cd/<sha256>.<ext>）與其縮圖
+（<sha256>_w480.webp）的 URL 即內容指紋，一律回
+Cache-Control: public, max-age=31536000, immutable，ETag 直接用檔名；
+其他（舊版 {idx}_ 檔名）回 no-cache，靠 ETag / Last-Modified 重新驗證。
+
+- 可壓縮的型別（svg、json、文字）若旁邊有 .br / .gz 預壓縮檔，依
+  Accept-Encoding 直接送出，加上 Vary: Accept-Encoding。
+- Range：支援單一區段（bytes=a-b、a-、-n）與 If-Range；多區段回整個檔案。
+- 伺服器提供 http.response.zerocopysend 擴充時以 sendfile 送出（含區段），
+  提供 http.response.pathsend 時整檔交給伺服器；否則以 256KB 分塊讀檔。
+
+維護指令（於 backend/ 下）：
+    python -m app.static_files --precompress   # 產生 .gz（有 brotli 時另產生 .br）
+    python -m app.static_files --fingerprint   # 舊檔名上傳搬進 blob 並改寫圖片 URL
+"""
+import argparse
+import gzip
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from mimetypes import guess_type
+from typing import Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# 依偏好順序
+PRECOMPRESSED = ((".br", "br"), (".gz", "gzip"))
+COMPRESSIBLE = ("text/", "image/svg+xml", "application/json", "application/javascript", "application/xml")
+
+# 相對於 /static：uploads/blobs/ab/cd/<sha256>[_w<寬>].<ext>
+_FINGERPRINTED = re.compile(r"^uploads/blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64}(?:_w\d+)?)\.[a-z0-9]+$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """回傳 (起點, 長度)；無法滿足時回 (size, 0)；不支援的格式（多區段等）回 None。"""
+    m = _RANGE.match(header.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None
+    first, last = m.group(1), m.group(2)
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start >= size:
+            return size, 0
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        suffix = int(last)
+        if suffix == 0:
+            return size, 0
+        start, end = max(size - suffix, 0), size - 1
+    return start, end - start + 1
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match 採弱比較。"""
+    if header.strip() == "*":
+        return True
+    return _opaque(etag) in [_opaque(t) for t in header.split(",")]
+
+
+class RangedFileResponse(FileResponse):
+    chunk_size = 256 * 1024
+
+    def __init__(self, path, *, offset: int = 0, length: int, **kwargs):
+        super().__init__(path, **kwargs)
+        self.offset = offset
+        self.length = length
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        extensions = scope.get("extensions") or {}
+        if scope["method"] == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend", "file": f.fileno(),
+                    "offset": self.offset, "count": self.length, "more_body": False,
+                })
+        elif "http.response.pathsend" in extensions and self.offset == 0 and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as f:
+                if self.offset:
+                    await f.seek(self.offset)
+                remaining = self.length
+                while remaining > 0:
+                    chunk = await f.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class UploadFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request = Headers(scope=scope)
+        rel = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+        m = _FINGERPRINTED.match(rel)
+        media_type = guess_type(full_path)[0] or "text/plain"
+        size = stat_result.st_size
+        last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+        if m:
+            etag = f'"{m.group(1)}"'
+            headers = {"cache-control": IMMUTABLE}
+        else:
+            etag = f'"{int(stat_result.st_mtime_ns):x}-{size:x}"'
+            headers = {"cache-control": REVALIDATE}
+        headers.update({"etag": etag, "last-modified": last_modified, "accept-ranges": "bytes"})
+
+        path, encoding = full_path, None
+        if media_type.startswith(COMPRESSIBLE):
+            headers["vary"] = "Accept-Encoding"
+            accepted = request.get("accept-encoding", "")
+            for suffix, coding in PRECOMPRESSED:
+                if coding in accepted:
+                    try:
+                        st = os.stat(full_path + suffix)
+                    except OSError:
+                        continue
+                    if stat.S_ISREG(st.st_mode) and st.st_mtime >= stat_result.st_mtime:
+                        path, encoding, size = full_path + suffix, coding, st.st_size
+                        headers["content-encoding"] = coding
+                        headers["etag"] = etag = etag[:-1] + f'-{coding}"'
+                        headers.pop("accept-ranges")
+                        break
+
+        if self._not_modified(request, etag, stat_result.st_mtime):
+            return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "accept-ranges"})
+
+        offset, length = 0, size
+        range_header = request.get("range")
+        if range_header and encoding is None and status_code == 200 and self._if_range_ok(request, etag, last_modified):
+            r = parse_range(range_header, size)
+            if r is not None:
+                offset, length = r
+                if length == 0:
+                    return Response(status_code=416, headers={"content-range": f"bytes */{size}", **headers})
+                status_code = 206
+                headers["content-range"] = f"bytes {offset}-{offset + length - 1}/{size}"
+        headers["content-length"] = str(length)
+        return RangedFileResponse(
+            path, offset=offset, length=length, status_code=status_code,
+            headers=headers, media_type=media_type,
+        )
+
+    @staticmethod
+    def _not_modified(request: Headers, etag: str, mtime: float) -> bool:
+        if_none_match = request.get("if-none-match")
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, etag)
+        since = request.get("if-modified-since")
+        if since:
+            try:
+                return int(mtime) <= parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _if_range_ok(request: Headers, etag: str, last_modified: str) -> bool:
+        if_range = request.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith(('"', "W/")):
+            return if_range.strip() == etag
+        return if_range.strip() == last_modified
+
+
+# ---- maintenance ----
+def precompress(root: str, min_bytes: int = 256) -> int:
+    """為可壓縮的檔案產生 .gz（與 .br），只在比原檔小時保留；回傳產生的數量。"""
+    try:
+        import brotli
+    except ImportError:  # brotli 為選用相依
+        brotli = None
+    made = 0
+    for d, _, files in os.walk(root):
+        for name in files:
+            if name.endswith((".gz", ".br", ".part")):
+                continue
+            path = os.path.join(d, name)
+            media_type = guess_type(name)[0] or ""
+            if not media_type.startswith(COMPRESSIBLE) or os.path.getsize(path) < min_bytes:
+                continue
+            with open(path, "rb") as f:
+                data = f.read()
+            encoders = [(".gz", lambda b: gzip.compress(b, 9, mtime=0))]
+            if brotli is not None:
+                encoders.append((".br", lambda b: brotli.compress(b, quality=11)))
+            for suffix, encode in encoders:
+                target = path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+                    continue
+                body = encode(data)
+                if len(body) < len(data):
+                    with open(target + ".part", "wb") as f:
+                        f.write(body)
+                    os.replace(target + ".part", target)
+                    made += 1
+    return made
+
+
+def fingerprint_legacy(db) -> dict:
+    """把圖片表中仍指向舊檔名的 URL 搬進內容定址 blob 並改寫；原檔保留，舊連結仍可用。"""
+    from sqlalchemy import select, update
+
+    from .blobstore import REF_TABLES, commit_many, refresh_refs
+    from .database import settings
+    from .utils.paths import blob_tmp_dir, path_for_url
+    from .utils.streaming import copy_to_disk
+
+    prefix = "/static/uploads/blobs/"
+    legacy = set()
+    for model in REF_TABLES:
+        legacy.update(db.scalars(select(model.url).where(~model.url.startswith(prefix)).distinct()))
+    stored, missing = [], []
+    tmp_dir = blob_tmp_dir()
+    for url in sorted(legacy):
+        try:
+            path = path_for_url(url)
+            with open(path, "rb") as f:
+                tmp = os.path.join(tmp_dir, f"{os.getpid()}_{len(stored)}.part")
+                stored.append((url, copy_to_disk(f, tmp, settings.UPLOAD_MAX_FILE_BYTES), os.path.splitext(path)[1].lower()))
+        except (OSError, ValueError):
+            missing.append(url)
+    if not stored:
+        return {"rewritten": 0, "missing": missing, "new_paths": []}
+    new_urls = commit_many(db, [(s, ext or ".jpg") for _, s, ext in stored])
+    for (old, _, _), new in zip(stored, new_urls):
+        for model in REF_TABLES:
+            db.execute(update(model).where(model.url == old).values(url=new))
+    refresh_refs(db, new_urls)
+    db.commit()
+    return {
+        "rewritten": len(stored),
+        "missing": missing,
+        "new_paths": [path_for_url(u) for u in dict.fromkeys(new_urls)],
+    }
+
+
+def main(argv=None):
+    import json
+
+    from .utils.paths import static_root
+
+    parser = argparse.ArgumentParser(description="Static upload maintenance")
+    parser.add_argument("--precompress", action="store_true", help="write .gz/.br next to compressible files")
+    parser.add_argument("--fingerprint", action="store_true", help="move legacy uploads into content-addressed blobs")
+    args = parser.parse_args(argv)
+    if not (args.precompress or args.fingerprint):
+        parser.error("nothing to do")
+    out = {}
+    if args.fingerprint:
+        from . import derivatives
+        from .database import SessionLocal, init_db
+
+        init_db()
+        db = SessionLocal()
+        try:
+            result = fingerprint_legacy(db)
+        finally:
+            db.close()
+        derivatives.render_many(result.pop("new_paths"))
+        out["fingerprint"] = result
+    if args.precompress:
+        out["precompressed"] = precompress(os.path.realpath(static_root()))
+    print(json.dumps(out, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, Iterable, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from .conditional import not_modified
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: Dict[str, str]
+    tags: Tuple[str, ...]
+    route: Any  # 產生這個回應的路由（metrics 依它標記命中的請求）
+    stored_at: float
+
+
+class ResponseCache:
+    """以 bytes 大小為上限的 LRU 快取，存放已序列化完成的 JSON 回應。
+
+    每個 entry 掛上數個 tag（例如 "fabrics"、"category:3"），寫入路徑以
+    invalidate(tag) 精準清除受影響的 key。每個 tag 另有 generation 計數，
+    讀取端在查詢前取得 token、寫入快取時比對，避免查詢途中發生的寫入
+    被舊資料覆蓋回去。命中只看記憶體，不碰資料庫；max_age 限制沒有經過
+    invalidate 的異動（例如直接改資料庫）最多多久後可見。
+    """
+
+    def __init__(self, max_bytes: int, max_age: Optional[float] = None):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._gen: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return None
+            if self.max_age is not None and time.monotonic() - hit.stored_at > self.max_age:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return hit
+
+    def token(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._gen[t] for t in tags)
+
+    def set(
+        self, key: str, body: bytes, headers: Dict[str, str], tags: Tuple[str, ...],
+        token: Tuple[int, ...], route: Any = None,
+    ) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if tuple(self._gen[t] for t in tags) != token:
+                return
+            self._drop(key)
+            self._entries[key] = CachedResponse(body, headers, tags, route, time.monotonic())
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                old_key = next(iter(self._entries))
+                self._drop(old_key)
+
+    def invalidate(self, *tags: str) -> None:
+        wanted = set(tags)
+        with self._lock:
+            for t in wanted:
+                self._gen[t] += 1
+            for key in [k for k, e in self._entries.items() if wanted.intersection(e.tags)]:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for t in list(self._gen):
+                self._gen[t] += 1
+            self._entries.clear()
+            self._size = 0
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry.body)
+
+
+def request_key(request: Request) -> str:
+    return request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+
+
+def _respond(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    hit = not_modified(request, headers) if "ETag" in headers else None
+    return hit or Response(body, media_type="application/json", headers=headers)
+
+
+def cached_json(
+    cache: ResponseCache,
+    request: Request,
+    tags: Tuple[str, ...],
+    adapter: TypeAdapter,
+    build: Callable[[], Tuple[object, Dict[str, str]]],
+    token: Optional[Tuple[int, ...]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    dump: Optional[Callable[[object], bytes]] = None,
+) -> Response:
+    """命中時直接回傳快取的 bytes；否則呼叫 build() 取得 (資料, headers) 後序列化並存入。
+
+    token 為讀資料庫之前取得的 cache.token(tags)（省略時在這裡取）；headers
+    （ETag 等）與 build() 的 headers 一起存進 entry。build() 已產生純 dict 時
+    可傳入 dump（如 fastjson.dumps）直接編碼，略過 adapter 驗證。
+    """
+    key = request_key(request)
+    hit = cache.get(key)
+    if hit is not None:
+        return _respond(request, hit.body, hit.headers)
+    if token is None:
+        token = cache.token(tags)
+    data, extra = build()
+    if dump is not None:
+        body = dump(data)
+    else:
+        body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    headers = {**(headers or {}), **extra}
+    cache.set(key, body, headers, tags, token, request.scope.get("route"))
+    return Response(body, media_type="application/json", headers=headers)
+
+
+class CachedResponseMiddleware:
+    """prefix 下的 GET 在進路由之前先查快取：命中時只有一次 dict 查詢與寫出
+    socket，不開 session、不查 table_versions，也不佔 threadpool。"""
+
+    def __init__(self, app, cache: ResponseCache, prefix: str):
+        self.app = app
+        self.cache = cache
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET" and scope["path"].startswith(self.prefix):
+            request = Request(scope)
+            hit = self.cache.get(request_key(request))
+            if hit is not None:
+                if hit.route is not None:
+                    scope["route"] = hit.route
+                await _respond(request, hit.body, hit.headers)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
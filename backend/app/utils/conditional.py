@@ -0,0 +1,45 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: object) -> str:
+    raw = "|".join(str(p) for p in parts).encode()
+    return '"' + hashlib.sha1(raw).hexdigest() + '"'
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime]) -> Dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        # DB 內皆為 naive UTC
+        headers["Last-Modified"] = format_datetime(
+            last_modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True
+        )
+    return headers
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return etag in (t.strip() for t in header.split(","))
+
+
+def not_modified(request: Request, headers: Dict[str, str]) -> Optional[Response]:
+    """依 If-None-Match（優先）或 If-Modified-Since 判斷；符合時回傳 304。"""
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        if _etag_matches(inm, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return None
+    ims = request.headers.get("if-modified-since")
+    lm = headers.get("Last-Modified")
+    if ims and lm:
+        try:
+            if parsedate_to_datetime(lm) <= parsedate_to_datetime(ims):
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            return None
+    return None
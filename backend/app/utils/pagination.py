@@ -0,0 +1,97 @@
+"""列表端點的 keyset 分頁。
+
+- limit：每頁筆數，1～MAX_LIMIT；省略時為 DEFAULT_LIMIT（早期版本省略 limit
+  會回傳整張表，現在只回傳第一頁）。
+- 還有下一頁時，游標放在回應標頭 X-Next-Cursor（不在 body 裡，body 仍是
+  原本的 JSON 陣列）；下一頁帶 ?cursor=<值> 與相同的 sort、篩選條件。
+- 要一次取得全部資料請用各資源的 /export。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+MAX_LIMIT = 500
+DEFAULT_LIMIT = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+LIMIT_DESCRIPTION = (
+    f"每頁筆數，省略時為 {DEFAULT_LIMIT}；還有下一頁時回應標頭 {NEXT_CURSOR_HEADER} "
+    "帶有下一頁的 cursor"
+)
+
+
+def _to_json(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return v.isoformat()
+    return v
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    raw = json.dumps([sort, _to_json(value), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, col) -> Tuple[Any, int]:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        key, value, row_id = json.loads(base64.urlsafe_b64decode(cursor + pad))
+        if key != sort:
+            raise ValueError("cursor/sort mismatch")
+        if col.type.python_type is datetime and value is not None:
+            value = datetime.fromisoformat(value)
+        return value, int(row_id)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def resolve_sort(sort: str, columns: Dict[str, Any]) -> Tuple[str, Any, bool]:
+    """'price' → 升冪、'-price' → 降冪；回傳 (key, column, descending)。"""
+    desc = sort.startswith("-")
+    key = sort.lstrip("-")
+    if key not in columns:
+        raise HTTPException(400, f"sort must be one of: {', '.join(sorted(columns))}")
+    return key, columns[key], desc
+
+
+def paginate(
+    query: Query,
+    id_col,
+    sort: str,
+    columns: Dict[str, Any],
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> Tuple[List[Any], Optional[str]]:
+    """以 (sort 欄位, id) 做 keyset 分頁。
+
+    未帶 limit 時只回傳第一頁 DEFAULT_LIMIT 筆，不再一次回傳整張表；
+    還有資料時同樣回傳 next_cursor。
+    """
+    key, col, desc = resolve_sort(sort, columns)
+    if desc:
+        query = query.order_by(col.desc(), id_col.desc())
+    else:
+        query = query.order_by(col.asc(), id_col.asc())
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, key, col)
+        pos = tuple_(col, id_col)
+        query = query.filter(pos < (value, last_id) if desc else pos > (value, last_id))
+
+    if limit is None:
+        limit = DEFAULT_LIMIT
+
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(key, getattr(last, col.key), last.id)
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -14,3 +14,16 @@ def public_url_for(abs_path: str) -> str:
     if len(parts) >= 2:
         return "/static/" + parts[1]
     return "/static/uploads"
+
+def blob_relpath(sha256: str, ext: str) -> str:
+    # 內容定址：blobs/ab/cd/<sha256><ext>
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+def blob_tmp_dir() -> str:
+    return ensure_dir("blobs/.tmp")
+
+def path_for_url(url: str) -> str:
+    prefix = "/static/uploads/"
+    if not url.startswith(prefix):
+        raise ValueError(f"not an upload url: {url}")
+    return os.path.join(static_root(), url[len(prefix):])
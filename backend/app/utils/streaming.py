@@ -0,0 +1,169 @@
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class StoredFile:
+    path: str
+    size: int
+    sha256: str
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def copy_to_disk(src, tmp_path: str, max_bytes: int) -> StoredFile:
+    """同步版：從可讀的檔案物件複製到 tmp_path 並計算 SHA-256（批次匯入用）。"""
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ValueError(f"file too large ({size} > {max_bytes} bytes)")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    return StoredFile(tmp_path, size, digest.hexdigest())
+
+
+@dataclass
+class _FilePart:
+    filename: str
+    path: str
+    out: Any = None
+    size: int = 0
+    digest: Any = field(default_factory=hashlib.sha256)
+    done: bool = False
+
+
+def _write_pending(pending: List[Tuple[_FilePart, Optional[bytes]]]) -> None:
+    """依序寫入；data 為 None 表示該檔案已結束，關檔。"""
+    for part, data in pending:
+        if part.out is None:
+            part.out = open(part.path, "wb")
+        if data is None:
+            part.out.close()
+        else:
+            part.out.write(data)
+            part.digest.update(data)
+
+
+def _discard(parts: List[_FilePart]) -> None:
+    for part in parts:
+        if part.out is not None and not part.out.closed:
+            part.out.close()
+        _remove(part.path)
+
+
+async def receive_files(
+    request: Request, tmp_dir: str, max_file_bytes: int, max_request_bytes: int,
+    field_name: str = "files",
+) -> List[Tuple[str, StoredFile]]:
+    """直接從 request.stream() 解析 multipart，把 field_name 的檔案逐塊寫到 tmp_dir。
+
+    不經過 Starlette 的 form 解析（它會先把整個 body 暫存完才進 handler），
+    所以單檔與整個 request 的上限在接收途中就會生效：超過即 413，並刪除已寫出的暫存檔。
+    Content-Length 已超過上限時直接拒絕，不讀 body。
+    回傳 [(原始檔名, StoredFile)]，依 body 中的順序。
+    """
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > max_request_bytes:
+        raise HTTPException(413, "Upload exceeds request size limit")
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    if ctype != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(400, "Expected multipart/form-data")
+
+    parts: List[_FilePart] = []
+    pending: List[Tuple[_FilePart, Optional[bytes]]] = []
+    current: Optional[_FilePart] = None
+    header = {"name": b"", "value": b"", "disposition": b""}
+
+    def on_part_begin() -> None:
+        nonlocal current
+        current = None
+        header["disposition"] = b""
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header["name"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header["value"] += data[start:end]
+
+    def on_header_end() -> None:
+        if header["name"].lower() == b"content-disposition":
+            header["disposition"] = header["value"]
+        header["name"] = header["value"] = b""
+
+    def on_headers_finished() -> None:
+        nonlocal current
+        _, options = parse_options_header(header["disposition"])
+        if options.get(b"name") != field_name.encode() or b"filename" not in options:
+            return  # 其他欄位不需要，略過
+        filename = options[b"filename"].decode("utf-8", "replace")
+        current = _FilePart(filename, os.path.join(tmp_dir, f"{os.getpid()}_{id(request)}_{len(parts)}.part"))
+        parts.append(current)
+        pending.append((current, b""))  # 空檔案也要建立
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        if current is None:
+            return
+        current.size += end - start
+        if current.size > max_file_bytes:
+            raise HTTPException(413, f"File too large: {current.filename}")
+        pending.append((current, data[start:end]))
+
+    def on_part_end() -> None:
+        if current is not None:
+            current.done = True
+            pending.append((current, None))
+
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_request_bytes:
+                raise HTTPException(413, "Upload exceeds request size limit")
+            parser.write(chunk)
+            if pending:
+                batch = pending[:]
+                pending.clear()
+                await run_in_threadpool(_write_pending, batch)
+        parser.finalize()
+        if pending:
+            await run_in_threadpool(_write_pending, pending[:])
+        if not parts:
+            raise HTTPException(400, f"No files in field '{field_name}'")
+        if not all(p.done for p in parts):
+            raise HTTPException(400, "Truncated multipart body")
+    except BaseException:
+        await run_in_threadpool(_discard, parts)
+        raise
+    return [(p.filename, StoredFile(p.path, p.size, p.digest.hexdigest())) for p in parts]
@@ -0,0 +1,131 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .utils.cache import request_key
+from .utils.conditional import make_etag, validator_headers
+
+# table → 對外資源；子表（圖片、訂單明細）的異動視同父資源變更
+RESOURCE_OF = {
+    "fabrics": "fabrics",
+    "fabric_images": "fabrics",
+    "fabric_works": "fabrics",
+    "categories": "categories",
+    "products": "products",
+    "product_images": "products",
+    "orders": "orders",
+    "order_items": "orders",
+}
+RESOURCES = tuple(sorted(set(RESOURCE_OF.values())))
+
+
+def _bump(conn, names: Iterable[str]) -> None:
+    names = sorted(set(names))
+    if not names:
+        return
+    conn.execute(
+        update(models.TableVersion)
+        .where(models.TableVersion.name.in_(names))
+        .values(version=models.TableVersion.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+# 交易內異動過的資源先記在 session.info，commit 前一次 UPDATE；
+# 每次 flush／bulk 各發一次會在多步驟寫入（圖庫同步、訂單明細批次）變成 N+1
+_TOUCHED = "versions.touched"
+
+
+def _touch(session: Session, names: Iterable[str]) -> None:
+    session.info.setdefault(_TOUCHED, set()).update(names)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, flush_context) -> None:
+    names = set()
+    for obj in list(session.new) + list(session.deleted):
+        name = RESOURCE_OF.get(getattr(obj, "__tablename__", None))
+        if name:
+            names.add(name)
+    for obj in session.dirty:
+        name = RESOURCE_OF.get(getattr(obj, "__tablename__", None))
+        if name and session.is_modified(obj, include_collections=False):
+            names.add(name)
+    if names:
+        _touch(session, names)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _after_bulk(state) -> None:
+    # query(...).delete()/update() 與 insert(Model) 不經過 flush，另外在這裡記錄
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    name = RESOURCE_OF.get(mapper.local_table.name) if mapper is not None else None
+    if name:
+        _touch(state.session, [name])
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session: Session) -> None:
+    # commit 自己的 flush 在這個事件之後才跑；先 flush，讓最後一批異動也算進來
+    session.flush()
+    names = session.info.pop(_TOUCHED, None)
+    if names:
+        _bump(session.connection(), names)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_TOUCHED, None)
+
+
+def missing_rows(conn) -> list:
+    have = set(conn.execute(select(models.TableVersion.name)).scalars())
+    return [n for n in RESOURCES if n not in have]
+
+
+def ensure_rows(conn) -> None:
+    missing = missing_rows(conn)
+    if missing:
+        now = datetime.utcnow()
+        conn.execute(
+            models.TableVersion.__table__.insert(),
+            [{"name": n, "version": 0, "updated_at": now} for n in missing],
+        )
+
+
+def current(db: Session, *names: str) -> Tuple[str, Optional[datetime]]:
+    """回傳 (版本字串, 最後修改時間)；只讀 table_versions，不碰 ORM 物件。"""
+    rows: Dict[str, Tuple[int, datetime]] = {
+        n: (v, ts)
+        for n, v, ts in db.execute(
+            select(
+                models.TableVersion.name,
+                models.TableVersion.version,
+                models.TableVersion.updated_at,
+            ).where(models.TableVersion.name.in_(names))
+        )
+    }
+    tag = "-".join(f"{n}{rows.get(n, (0, None))[0]}" for n in names)
+    stamps = [ts for _, ts in rows.values() if ts is not None]
+    return tag, (max(stamps) if stamps else None)
+
+
+def row_updated_at(db: Session, model, row_id: int) -> Optional[datetime]:
+    return db.execute(select(model.updated_at).where(model.id == row_id)).scalar()
+
+
+def list_validators(db: Session, request: Request, *names: str) -> Dict[str, str]:
+    tag, last_modified = current(db, *names)
+    return validator_headers(make_etag(tag, request_key(request)), last_modified)
+
+
+def row_validators(db: Session, model, row_id: int) -> Optional[Dict[str, str]]:
+    ts = row_updated_at(db, model, row_id)
+    if ts is None:
+        return None
+    return validator_headers(make_etag(model.__tablename__, row_id, ts.isoformat()), ts)
@@ -0,0 +1 @@
+"""效能量測腳本；於 backend/ 下以 python -m benchmarks.<name> 執行。"""
@@ -0,0 +1,90 @@
+"""worker 冷啟動時間：LAZY_ROUTERS=0（import 時載入全部 router）對 LAZY_ROUTERS=1。
+
+每輪啟動一個新的 uvicorn 行程，量從 spawn 到第一個 /api/health 200（開始
+接受連線）與到第一個 /api/fabrics/ 200（實際能服務業務請求）的時間，取中位數。
+--workers N 時同一個資料庫由 N 個 worker 同時啟動，可順便確認遷移只跑一次。
+
+用法（於 backend/ 下）：
+    python -m benchmarks.cold_start [--runs 5] [--workers 1] [--fresh]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .seed import Scale, seed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait(base: str, path: str, proc, deadline: float) -> float:
+    import httpx
+
+    while True:
+        try:
+            if httpx.get(base + path, timeout=5).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        if time.time() > deadline or proc.poll() is not None:
+            raise RuntimeError(f"uvicorn did not serve {path}")
+        time.sleep(0.005)
+
+
+def measure(env: dict, workers: int) -> dict:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "--factory", "app.main:create_app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 60
+        health = _wait(base, "/api/health", proc, deadline)
+        first = _wait(base, "/api/fabrics/?limit=20", proc, deadline)
+        return {"health_ms": (health - t0) * 1000, "first_request_ms": (first - t0) * 1000}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--fresh", action="store_true", help="start every run on an empty database (includes migrations)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        if not args.fresh:
+            seed(f"sqlite:///{path}", Scale(fabrics=200, products=200, orders=200))
+        print(f"{'LAZY_ROUTERS':<14}{'health ms':>11}{'first req ms':>14}")
+        for lazy in ("0", "1"):
+            runs = []
+            for _ in range(args.runs):
+                if args.fresh:
+                    for suffix in ("", "-wal", "-shm"):
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+                env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", LAZY_ROUTERS=lazy, METRICS_ENABLED="0")
+                runs.append(measure(env, args.workers))
+            health = statistics.median(r["health_ms"] for r in runs)
+            first = statistics.median(r["first_request_ms"] for r in runs)
+            print(f"{lazy:<14}{health:>11.0f}{first:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
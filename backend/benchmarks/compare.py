@@ -0,0 +1,42 @@
+"""比較兩次 benchmarks.run 的輸出（正值表示 after 較慢／較少）。
+
+用法（於 backend/ 下）：
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import json
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "rps", "queries_per_request", "rss_peak_mb")
+
+
+def _delta(a, b):
+    if a in (None, 0) or b is None:
+        return ""
+    return f"{(b - a) / a * 100:+.0f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args(argv)
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+    print(f"before {before['meta'].get('commit')}  after {after['meta'].get('commit')}")
+    for mode, results in after["results"].items():
+        old = before["results"].get(mode, {})
+        print(f"== {mode}")
+        print(f"  {'endpoint':<22}" + "".join(f"{m:>26}" for m in METRICS))
+        for name, res in results.items():
+            prev = old.get(name, {})
+            cells = []
+            for m in METRICS:
+                a, b = prev.get(m), res.get(m)
+                cells.append(f"{'' if a is None else a:>9} → {'' if b is None else b:<9}{_delta(a, b):>6}")
+            print(f"  {name:<22}" + "".join(f"{c:>26}" for c in cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""API 壓測：在暫存資料庫上以固定併發驅動每個路由，輸出 JSON。
+
+兩種模式：
+    inproc   同一個行程內經由 httpx.ASGITransport 呼叫 app（含 SQL 查詢數）
+    uvicorn  啟動真正的 uvicorn 子行程，經由 TCP 呼叫（RSS 為伺服器行程）
+
+用法（於 backend/ 下）：
+    python -m benchmarks.run [--mode inproc|uvicorn|both] [--requests 200]
+        [--concurrency 16] [--only fabrics,public.search] [--include-uploads]
+        [--fabrics 2000 --orders 5000 ...] [--out result.json]
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .seed import add_scale_args, scale_from_args, seed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _rss_mb(pid: Optional[int] = None) -> Dict[str, float]:
+    """目前與峰值 RSS（Linux /proc；其他平台只回報本行程峰值）。"""
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        kb = lambda k: int(fields[k].split()[0])
+        return {"rss_mb": round(kb("VmRSS") / 1024, 1), "rss_peak_mb": round(kb("VmHWM") / 1024, 1)}
+    except (OSError, KeyError):
+        import resource
+
+        return {"rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def _pct(sorted_ms: List[float], p: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    k = max(0, min(len(sorted_ms) - 1, int(round(p / 100 * len(sorted_ms) + 0.5)) - 1))
+    return round(sorted_ms[k], 2)
+
+
+async def _drive(client, scenario, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    calls = [scenario.build(rng) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    size = 0
+    it = iter(calls)
+
+    async def worker():
+        nonlocal errors, size
+        for path, kwargs in it:
+            t = time.perf_counter()
+            try:
+                r = await client.request(scenario.method, path, **kwargs)
+                size += len(r.content)
+                if r.status_code >= 400:
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - t) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": _pct(latencies, 50),
+        "p95_ms": _pct(latencies, 95),
+        "p99_ms": _pct(latencies, 99),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "bytes_per_request": size // max(requests, 1),
+    }
+
+
+async def _run_all(client, picked, args, pid=None, count_queries=None) -> Dict[str, dict]:
+    out = {}
+    for n, sc in enumerate(picked):
+        # 暖機（連線池、快取、lazy import），不計入
+        await _drive(client, sc, min(5, args.requests), 1, seed=n)
+        before = count_queries() if count_queries else 0
+        res = await _drive(client, sc, args.requests, args.concurrency, seed=1000 + n)
+        if count_queries:
+            res["queries_per_request"] = round((count_queries() - before) / args.requests, 2)
+        res.update(_rss_mb(pid))
+        out[sc.name] = res
+        print(f"  {sc.name:<22} p50 {res['p50_ms']:>8} ms  p99 {res['p99_ms']:>8} ms  {res['rps']:>8} req/s", file=sys.stderr)
+    return out
+
+
+def run_inproc(picked, args) -> Dict[str, dict]:
+    import httpx
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    from app.main import app
+
+    queries = [0]
+
+    # 掛在 Engine 類別上：讀寫引擎（PUBLIC_READ_ONLY）與 async 引擎的同步端都算到
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _count(*_):
+        queries[0] += 1
+
+    async def go():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await _run_all(client, picked, args, count_queries=lambda: queries[0])
+
+    return asyncio.run(go())
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_uvicorn(picked, args) -> Dict[str, dict]:
+    import httpx
+
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env=dict(os.environ),
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                if httpx.get(base + "/api/health").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            if time.time() > deadline or proc.poll() is not None:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.1)
+
+        async def go():
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+                return await _run_all(client, picked, args, pid=proc.pid)
+
+        return asyncio.run(go())
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API load test")
+    parser.add_argument("--mode", choices=("inproc", "uvicorn", "both"), default="both")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", help="comma-separated scenario or router names")
+    parser.add_argument("--include-uploads", action="store_true", help="also run upload/import (writes app/static)")
+    parser.add_argument("--db", help="reuse an already seeded database URL")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    add_scale_args(parser)
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory()
+    url = args.db or f"sqlite:///{os.path.join(tmp.name, 'bench.db')}"
+    # app.database 在 import 時讀取設定，必須先設好環境變數
+    os.environ["DATABASE_URL"] = url
+    from .scenarios import scenarios, select
+
+    scale = scale_from_args(args)
+    if not args.db:
+        t = time.perf_counter()
+        seed(url, scale)
+        print(f"seeded {url} in {time.perf_counter() - t:.1f}s", file=sys.stderr)
+    picked = select(scenarios(scale), args.only, args.include_uploads)
+
+    result = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "scale": {k: getattr(scale, k) for k in vars(scale)},
+        },
+        "results": {},
+    }
+    try:
+        # uvicorn 先跑：inproc 會在本行程建立 app，之後的 RSS 不再是乾淨的基準
+        if args.mode in ("uvicorn", "both"):
+            print("== uvicorn", file=sys.stderr)
+            result["results"]["uvicorn"] = run_uvicorn(picked, args)
+        if args.mode in ("inproc", "both"):
+            print("== inproc", file=sys.stderr)
+            result["results"]["inproc"] = run_inproc(picked, args)
+    finally:
+        tmp.cleanup()
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
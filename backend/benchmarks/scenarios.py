@@ -0,0 +1,100 @@
+"""每個路由的代表性請求；依 Scale 產生合法的 id，固定亂數種子以便重現。"""
+import io
+import random
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from .seed import Scale
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # 依 rng 產生 (path, httpx 請求參數)
+    build: Callable[[random.Random], tuple]
+    writes_files: bool = False  # 會寫入 app/static（上傳、匯入），預設不跑
+
+
+def _tiny_jpeg() -> bytes:
+    try:
+        from PIL import Image
+    except ImportError:
+        return b"\xff\xd8\xff\xd9"
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 24), (200, 120, 80)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def scenarios(scale: Scale) -> List[Scenario]:
+    fid = lambda r: r.randint(1, scale.fabrics)
+    pid = lambda r: r.randint(1, scale.products)
+    cid = lambda r: r.randint(1, scale.categories)
+    oid = lambda r: r.randint(1, scale.orders)
+    jpeg = _tiny_jpeg()
+    get = lambda path, params=None: (lambda r: (path(r) if callable(path) else path, {"params": params} if params else {}))
+
+    return [
+        Scenario("health", "GET", get("/api/health")),
+        # fabrics
+        Scenario("fabrics.list", "GET", get("/api/fabrics/", {"limit": 50})),
+        Scenario("fabrics.list_max", "GET", get("/api/fabrics/", {"limit": 500})),
+        Scenario("fabrics.get", "GET", get(lambda r: f"/api/fabrics/{fid(r)}")),
+        Scenario("fabrics.export", "GET", get("/api/fabrics/export", {"format": "csv"})),
+        Scenario("fabrics.update", "PUT", lambda r: (f"/api/fabrics/{fid(r)}", {
+            "json": {"name": f"布料 {r.randint(1, 10**6)}", "price": r.randint(50, 900)},
+        })),
+        # categories
+        Scenario("categories.list", "GET", get("/api/categories/")),
+        # products
+        Scenario("products.list", "GET", get("/api/products/", {"limit": 50})),
+        Scenario("products.get", "GET", get(lambda r: f"/api/products/{pid(r)}")),
+        Scenario("products.export", "GET", get("/api/products/export")),
+        # orders
+        Scenario("orders.list", "GET", get("/api/orders/", {"limit": 50})),
+        Scenario("orders.by_total", "GET", get("/api/orders/", {"limit": 50, "sort": "-total", "min_total": 1000})),
+        Scenario("orders.get", "GET", get(lambda r: f"/api/orders/{oid(r)}")),
+        Scenario("orders.export", "GET", get("/api/orders/export")),
+        Scenario("orders.create", "POST", lambda r: ("/api/orders/", {"json": {
+            "customer_name": "壓測",
+            "items": [{"product_id": pid(r)} for _ in range(scale.items)],
+        }})),
+        Scenario("orders.edit_items", "PATCH", lambda r: (f"/api/orders/{oid(r)}/items", {"json": {
+            "add": [{"product_id": pid(r), "adjustment": 50} for _ in range(3)],
+        }})),
+        # public
+        Scenario("public.fabrics", "GET", get("/api/public/fabrics", {"limit": 50})),
+        Scenario("public.clearance", "GET", get("/api/public/fabrics/clearance", {"limit": 50})),
+        Scenario("public.fabrics_by_price", "GET", lambda r: (
+            "/api/public/fabrics", {"params": {"limit": 50, "sort": "effective_price", "max_price": r.randint(100, 900)}},
+        )),
+        Scenario("public.categories", "GET", get("/api/public/categories")),
+        Scenario("public.by_category", "GET", lambda r: (
+            f"/api/public/products/by_category/{cid(r)}", {"params": {"limit": 50}},
+        )),
+        Scenario("public.by_category_price", "GET", lambda r: (
+            f"/api/public/products/by_category/{cid(r)}",
+            {"params": {"limit": 50, "sort": "-effective_price", "max_price": r.randint(100, 900)}},
+        )),
+        Scenario("public.search", "GET", lambda r: (
+            "/api/public/search", {"params": {"q": r.choice(["純棉", "亞麻", "cotton", "印花格紋"])}},
+        )),
+        # reports
+        Scenario("reports.sales", "GET", get("/api/reports/sales", {"group_by": "month,order_status"})),
+        # uploads / import
+        Scenario("uploads.product", "POST", lambda r: (f"/api/upload/products/{pid(r)}", {
+            "files": [("files", ("bench.jpg", jpeg, "image/jpeg"))],
+        }), writes_files=True),
+        Scenario("import.fabrics", "POST", lambda r: ("/api/import/fabrics", {
+            "files": {"manifest": ("m.jsonl", '{"name": "匯入"}\n'.encode() * 20, "application/x-ndjson")},
+        }), writes_files=True),
+    ]
+
+
+def select(all_: List[Scenario], only: Optional[str], include_uploads: bool) -> List[Scenario]:
+    picked = [s for s in all_ if include_uploads or not s.writes_files]
+    if only:
+        names = {n.strip() for n in only.split(",")}
+        picked = [s for s in picked if s.name in names or s.name.split(".")[0] in names]
+    return picked
+
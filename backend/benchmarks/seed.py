@@ -0,0 +1,138 @@
+"""在暫存資料庫建立可重現的合成型錄（固定亂數種子）。
+
+用法（於 backend/ 下）：
+    python -m benchmarks.seed sqlite:////tmp/bench.db [--fabrics 2000] [--orders 5000] ...
+"""
+import argparse
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+_WORDS = ["純棉", "亞麻", "絲綢", "印花", "格紋", "條紋", "素色", "丹寧", "雪紡", "cotton", "linen", "twill"]
+_ORIGINS = ["台灣", "日本", "韓國", "義大利", "法國"]
+_BATCH = 1000
+
+
+@dataclass
+class Scale:
+    categories: int = 20
+    fabrics: int = 2000
+    products: int = 2000
+    images: int = 3  # 每個布料／商品的圖片數
+    orders: int = 5000
+    items: int = 3  # 每張訂單的明細數
+    seed: int = 42
+
+
+def _name(rng: random.Random, n: int) -> str:
+    return "".join(rng.sample(_WORDS, 2)) + f" {n}"
+
+
+def _chunks(rows, n=_BATCH):
+    for i in range(0, len(rows), n):
+        yield rows[i:i + n]
+
+
+def _insert(db, model, rows) -> None:
+    for chunk in _chunks(rows):
+        db.execute(insert(model), chunk)
+
+
+def seed(url: str, scale: Scale) -> dict:
+    # app 在 import 時依 DATABASE_URL 建立引擎；延後 import 讓呼叫端先設定環境變數
+    from sqlalchemy.orm import Session
+
+    from app import migrations, models, rollups, search, versions
+    from app.database import make_engine
+
+    engine = make_engine(url)
+    migrations.upgrade(engine, make_backup=False)
+    with engine.begin() as conn:
+        versions.ensure_rows(conn)
+
+    rng = random.Random(scale.seed)
+    start = datetime(2024, 1, 1)
+    with Session(engine) as db:
+        _insert(db, models.Category, [
+            {"id": i, "name": f"分類 {i}", "created_at": start + timedelta(hours=i)}
+            for i in range(1, scale.categories + 1)
+        ])
+        _insert(db, models.Fabric, [
+            {
+                "id": i, "name": _name(rng, i), "origin": rng.choice(_ORIGINS),
+                "price": rng.randint(50, 900), "description": " ".join(rng.sample(_WORDS, 4)),
+                "on_clearance": rng.random() < 0.15, "clearance_price": rng.randint(20, 400),
+                "created_at": start + timedelta(minutes=i),
+            }
+            for i in range(1, scale.fabrics + 1)
+        ])
+        _insert(db, models.Product, [
+            {
+                "id": i, "name": _name(rng, i), "category_id": rng.randint(1, scale.categories),
+                "price": rng.randint(100, 3000), "promo_price": rng.choice([0, 0, 0, rng.randint(80, 2000)]),
+                "description": " ".join(rng.sample(_WORDS, 4)),
+                "created_at": start + timedelta(minutes=i),
+            }
+            for i in range(1, scale.products + 1)
+        ])
+        for model, fk, count in (
+            (models.FabricImage, "fabric_id", scale.fabrics),
+            (models.FabricWork, "fabric_id", scale.fabrics),
+            (models.ProductImage, "product_id", scale.products),
+        ):
+            _insert(db, model, [
+                {fk: parent, "url": f"/static/uploads/bench/{model.__tablename__}/{parent}_{k}.jpg", "position": k}
+                for parent in range(1, count + 1)
+                for k in range(scale.images)
+            ])
+        _insert(db, models.Order, [
+            {
+                "id": i, "customer_name": f"客戶 {i}",
+                "order_status": rng.choice(["尚未處理", "處理中", "已完成"]),
+                "payment_status": rng.choice(["貨到付款", "已付款"]),
+                "created_at": start + timedelta(minutes=7 * i),
+            }
+            for i in range(1, scale.orders + 1)
+        ])
+        items = []
+        for o in range(1, scale.orders + 1):
+            for _ in range(scale.items):
+                price = rng.randint(100, 3000)
+                adj = rng.choice([0, 0, 50, -100])
+                items.append({
+                    "order_id": o, "product_id": rng.randint(1, scale.products),
+                    "fabric_id": rng.choice([None, rng.randint(1, scale.fabrics)]),
+                    "original_price": price, "adjustment": adj, "final_price": price + adj,
+                })
+        _insert(db, models.OrderItem, items)
+        db.commit()
+        rollups.rebuild(db)
+        rollups.rebuild_totals(db)
+        db.commit()
+    with engine.begin() as conn:
+        search.rebuild(conn)
+    engine.dispose()
+    return asdict(scale)
+
+
+def add_scale_args(parser: argparse.ArgumentParser) -> None:
+    for name, default in asdict(Scale()).items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+
+
+def scale_from_args(args) -> Scale:
+    return Scale(**{k: getattr(args, k) for k in asdict(Scale())})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a scratch database")
+    parser.add_argument("url")
+    add_scale_args(parser)
+    args = parser.parse_args(argv)
+    print(seed(args.url, scale_from_args(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""大型列表的序列化成本：FAST_JSON=0（ORM＋Pydantic）對 FAST_JSON=1（欄位 tuple＋orjson）。
+
+兩種模式各在獨立子行程內啟動 app（FAST_JSON 於 import 時讀取），對同一個
+資料庫以最大頁（limit=MAX_LIMIT）跟著 X-Next-Cursor 翻完整個列表，記錄每輪
+的 CPU 時間（process_time，含 threadpool）與牆鐘時間，並確認兩種模式回應逐
+位元組相同。
+
+用法（於 backend/ 下）：
+    python -m benchmarks.serialization [--rows 10000] [--repeat 5]
+"""
+import argparse
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from app.utils.pagination import MAX_LIMIT, NEXT_CURSOR_HEADER
+
+from .seed import Scale, seed
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PATHS = ("/api/fabrics/", "/api/products/", "/api/orders/", "/api/public/fabrics")
+
+
+def _walk(client, path: str) -> list:
+    """以最大頁翻完整個列表，回傳每頁的 body。"""
+    pages, params = [], {"limit": MAX_LIMIT}
+    while True:
+        r = client.get(path, params=params)
+        r.raise_for_status()
+        pages.append(r.content)
+        cursor = r.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return pages
+        params = {"limit": MAX_LIMIT, "cursor": cursor}
+
+
+def worker(repeat: int) -> dict:
+    from fastapi.testclient import TestClient
+
+    from app.cache import public_cache
+    from app.main import app
+
+    client = TestClient(app)
+    out = {}
+    for path in PATHS:
+        _walk(client, path)  # 暖機
+        cpu, wall = [], []
+        for _ in range(repeat):
+            public_cache.clear()  # 量序列化本身，不量快取命中
+            c0, w0 = time.process_time(), time.perf_counter()
+            pages = _walk(client, path)
+            cpu.append((time.process_time() - c0) * 1000)
+            wall.append((time.perf_counter() - w0) * 1000)
+        body = b"".join(pages)
+        out[path] = {
+            "cpu_ms": round(statistics.median(cpu), 1),
+            "wall_ms": round(statistics.median(wall), 1),
+            "bytes": len(body),
+            "md5": hashlib.md5(body).hexdigest(),
+        }
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000, help="fabrics, products and orders each")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.worker:
+        print(json.dumps(worker(args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(url, Scale(fabrics=args.rows, products=args.rows, orders=args.rows))
+        results = {}
+        for fast in ("0", "1"):
+            env = dict(os.environ, DATABASE_URL=url, FAST_JSON=fast, METRICS_ENABLED="0")
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.serialization", "--worker", "--repeat", str(args.repeat)],
+                cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+            )
+            results[fast] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(f"{'path':<22}{'orm cpu ms':>12}{'fast cpu ms':>13}{'speedup':>9}{'orm wall':>10}{'fast wall':>11}{'MB':>7}  same")
+    for path in PATHS:
+        a, b = results["0"][path], results["1"][path]
+        print(
+            f"{path:<22}{a['cpu_ms']:>12}{b['cpu_ms']:>13}{a['cpu_ms'] / max(b['cpu_ms'], 0.1):>8.1f}x"
+            f"{a['wall_ms']:>10}{b['wall_ms']:>11}{b['bytes'] / 1e6:>7.1f}  {a['md5'] == b['md5']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
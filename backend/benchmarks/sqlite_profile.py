@@ -0,0 +1,110 @@
+"""比較 SQLite 連線設定（default vs tuned）在讀寫併發下的吞吐量。
+
+每個 profile 使用一個全新的暫存資料庫：讀者執行店面布料列表查詢，
+寫者新增並修改布料；統計每秒操作數與 "database is locked" 錯誤數。
+
+用法（於 backend/ 下）：
+    python -m benchmarks.sqlite_profile [--seconds 5] [--readers 8] [--writers 2]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import models, queries
+from app.database import Base, make_engine
+
+SEED_FABRICS = 2000
+
+
+def _seed(Session) -> None:
+    with Session() as db:
+        db.add_all(
+            models.Fabric(name=f"布料 {i}", price=i % 500, on_clearance=i % 7 == 0)
+            for i in range(SEED_FABRICS)
+        )
+        db.commit()
+
+
+def _reader(Session, stop, stats):
+    while not stop.is_set():
+        try:
+            with Session() as db:
+                queries.fabrics_query(db, on_clearance=True).order_by(
+                    models.Fabric.created_at, models.Fabric.id
+                ).limit(50).all()
+            stats["reads"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+
+
+def _writer(Session, stop, stats):
+    n = 0
+    while not stop.is_set():
+        n += 1
+        try:
+            with Session() as db:
+                f = models.Fabric(name=f"新布料 {n}", price=n % 300)
+                db.add(f)
+                db.commit()
+                f.price += 1
+                db.commit()
+            stats["writes"] += 2
+        except OperationalError:
+            stats["errors"] += 1
+
+
+def run(profile: str, seconds: float, readers: int, writers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = make_engine(url, profile=profile)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        _seed(Session)
+
+        stop = threading.Event()
+        stats = [{"reads": 0, "writes": 0, "errors": 0} for _ in range(readers + writers)]
+        threads = [
+            threading.Thread(target=_reader, args=(Session, stop, stats[i]))
+            for i in range(readers)
+        ] + [
+            threading.Thread(target=_writer, args=(Session, stop, stats[readers + i]))
+            for i in range(writers)
+        ]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    total = {k: sum(s[k] for s in stats) for k in ("reads", "writes", "errors")}
+    return {
+        "profile": profile,
+        "seconds": round(elapsed, 2),
+        "reads_per_s": round(total["reads"] / elapsed, 1),
+        "writes_per_s": round(total["writes"] / elapsed, 1),
+        "lock_errors": total["errors"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    args = parser.parse_args(argv)
+    results = [run(p, args.seconds, args.readers, args.writers) for p in ("default", "tuned")]
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+-- 最初版本（baseline commit）的 create_all 產生的 SQLite schema，用來測試從頭升級
+CREATE TABLE fabrics (
+    id INTEGER NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    origin VARCHAR(50) NOT NULL,
+    price FLOAT NOT NULL,
+    size VARCHAR(100) NOT NULL,
+    description TEXT NOT NULL,
+    on_clearance BOOLEAN NOT NULL,
+    clearance_price FLOAT NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_fabrics_id ON fabrics (id);
+
+CREATE TABLE categories (
+    id INTEGER NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (name)
+);
+
+CREATE TABLE orders (
+    id INTEGER NOT NULL,
+    customer_name VARCHAR(200) NOT NULL,
+    description TEXT NOT NULL,
+    order_status VARCHAR(50) NOT NULL,
+    payment_status VARCHAR(50) NOT NULL,
+    created_at DATETIME NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE fabric_images (
+    id INTEGER NOT NULL,
+    fabric_id INTEGER NOT NULL,
+    url VARCHAR(500) NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(fabric_id) REFERENCES fabrics (id) ON DELETE CASCADE
+);
+
+CREATE TABLE fabric_works (
+    id INTEGER NOT NULL,
+    fabric_id INTEGER NOT NULL,
+    url VARCHAR(500) NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(fabric_id) REFERENCES fabrics (id) ON DELETE CASCADE
+);
+
+CREATE TABLE products (
+    id INTEGER NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    price FLOAT NOT NULL,
+    size VARCHAR(100) NOT NULL,
+    description TEXT NOT NULL,
+    promo_price FLOAT NOT NULL,
+    created_at DATETIME NOT NULL,
+    category_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(category_id) REFERENCES categories (id)
+);
+
+CREATE TABLE product_images (
+    id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    url VARCHAR(500) NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(product_id) REFERENCES products (id) ON DELETE CASCADE
+);
+
+CREATE TABLE order_items (
+    id INTEGER NOT NULL,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    fabric_id INTEGER,
+    state VARCHAR(50) NOT NULL,
+    original_price FLOAT NOT NULL,
+    adjustment FLOAT NOT NULL,
+    final_price FLOAT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(order_id) REFERENCES orders (id) ON DELETE CASCADE,
+    FOREIGN KEY(product_id) REFERENCES products (id),
+    FOREIGN KEY(fabric_id) REFERENCES fabrics (id)
+);
@@ -0,0 +1,152 @@
+"""測試共用設定。
+
+app 在 import 時讀取設定並建立引擎，所以先把 DATABASE_URL 指到暫存資料庫、
+關掉背景載入與跨行程通道，再 import app。整個測試階段共用同一個資料庫，
+各測試自行建立需要的資料，斷言不依賴其他測試留下的列。
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="wanshop-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP, 'test.db')}"
+os.environ["INVALIDATION_BUS"] = "local"
+os.environ["LAZY_ROUTERS"] = "0"
+os.environ["METRICS_ENABLED"] = "0"
+os.environ["SQL_PROFILE"] = "0"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def tmp_root() -> str:
+    return _TMP
+
+
+@pytest.fixture(scope="session")
+def client():
+    # lifespan 會套用遷移
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def async_client(client):
+    """同一個資料庫上以 ASYNC_DB=1 建出的第二個 app。
+
+    session_route 在 import 時決定同步或 AsyncSession＋run_sync，所以暫時打開
+    ASYNC_DB、重新載入 router 模組再建 app，建好後把設定與模組換回同步版。
+    """
+    import importlib
+    import inspect
+
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app import database, main
+
+    saved = {k: getattr(database, k) for k in ("async_engine", "async_read_engine", "AsyncSessionLocal", "AsyncReadSessionLocal")}
+    routers = [importlib.import_module(f"app.routers.{m}") for m, _, _ in main.ROUTERS]
+    eng = database.make_engine(database.settings.DATABASE_URL, use_async=True)
+    database.async_engine = database.async_read_engine = eng
+    database.AsyncSessionLocal = database.AsyncReadSessionLocal = async_sessionmaker(eng, autoflush=False, expire_on_commit=True)
+    database.settings.ASYNC_DB = True
+    try:
+        for m in routers:
+            importlib.reload(m)
+        async_app = main.create_app()
+        assert any(getattr(r, "path", "") == "/api/fabrics/" and inspect.iscoroutinefunction(r.endpoint) for r in async_app.routes)
+    finally:
+        database.settings.ASYNC_DB = False
+        for m in routers:
+            importlib.reload(m)
+    with TestClient(async_app) as c:
+        yield c
+        # aiosqlite 的連線要在事件迴圈上關閉
+        c.portal.call(eng.dispose)
+    for k, v in saved.items():
+        setattr(database, k, v)
+
+
+@pytest.fixture(params=["sync", "async"])
+def api(request):
+    """分別以同步 Session 與 ASYNC_DB 的 app 執行同一個測試。"""
+    return request.getfixturevalue("client" if request.param == "sync" else "async_client")
+
+
+@pytest.fixture
+def db(client):
+    s = SessionLocal()
+    try:
+        yield s
+    finally:
+        s.close()
+
+
+def add_fabrics(db, n: int, **fields) -> list:
+    rows = [models.Fabric(name=f"布料 {i}", price=100 + i, **fields) for i in range(n)]
+    db.add_all(rows)
+    db.commit()
+    return [r.id for r in rows]
+
+
+def add_catalog(db, n: int) -> dict:
+    """n 筆布料、商品與訂單，各自帶圖片／明細，讓關聯載入也被量到。"""
+    category = models.Category(name=f"分類 {db.query(models.Category).count() + 1}")
+    fabrics = [
+        models.Fabric(
+            name=f"布料 {i}", price=100 + i,
+            images=[models.FabricImage(url=f"/static/uploads/f{i}_{k}.jpg", position=k) for k in range(2)],
+            works=[models.FabricWork(url=f"/static/uploads/w{i}.jpg")],
+        )
+        for i in range(n)
+    ]
+    products = [
+        models.Product(
+            name=f"商品 {i}", price=500 + i, category=category,
+            images=[models.ProductImage(url=f"/static/uploads/p{i}_{k}.jpg", position=k) for k in range(2)],
+        )
+        for i in range(n)
+    ]
+    db.add_all(fabrics + products)
+    db.flush()
+    orders = [
+        models.Order(
+            customer_name=f"客戶 {i}",
+            items=[
+                models.OrderItem(product_id=products[i].id, fabric_id=fabrics[i].id, original_price=500, final_price=500),
+                models.OrderItem(product_id=products[-1].id, original_price=300, final_price=300),
+            ],
+        )
+        for i in range(n)
+    ]
+    db.add_all(orders)
+    db.commit()
+    return {
+        "fabrics": [f.id for f in fabrics],
+        "products": [p.id for p in products],
+        "orders": [o.id for o in orders],
+    }
+
+
+@pytest.fixture
+def uploads_root(tmp_path, monkeypatch):
+    """把上傳目錄換到暫存區（路徑保留 /static/ 段，public_url_for 才算得出 URL）。"""
+    from app import blobstore, derivatives
+    from app.utils import paths
+
+    root = tmp_path / "static" / "uploads"
+    root.mkdir(parents=True)
+    monkeypatch.setattr(paths, "static_root", lambda: str(root))
+    monkeypatch.setattr(blobstore, "static_root", lambda: str(root))
+    monkeypatch.setattr(derivatives, "ENABLED", False)
+    return root
@@ -0,0 +1,94 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app import blobstore, models
+from app.derivatives import derivative_paths
+from app.utils.paths import blob_tmp_dir, path_for_url
+
+
+def _tmp_file(data: bytes, name: str):
+    path = os.path.join(blob_tmp_dir(), name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path, hashlib.sha256(data).hexdigest()
+
+
+def _blob(db, data: bytes, age: timedelta) -> str:
+    path, sha = _tmp_file(data, "seed.part")
+    url = blobstore.commit_file(db, path, sha, len(data), ".jpg")
+    db.get(models.Blob, sha).last_seen_at = datetime.utcnow() - age
+    db.commit()
+    return url
+
+
+def test_commit_file_dedups_and_refreshes_last_seen(db, uploads_root):
+    data = os.urandom(64)
+    first_tmp, sha = _tmp_file(data, "a.part")
+    url = blobstore.commit_file(db, first_tmp, sha, len(data), ".jpg")
+    old = datetime.utcnow() - timedelta(days=3)
+    db.get(models.Blob, sha).last_seen_at = old
+    db.commit()
+
+    second_tmp, _ = _tmp_file(data, "b.part")
+    assert blobstore.commit_file(db, second_tmp, sha, len(data), ".png") == url
+    assert not os.path.exists(second_tmp)
+    assert os.path.exists(path_for_url(url))
+    db.expire_all()
+    assert db.get(models.Blob, sha).last_seen_at > old
+
+
+def test_commit_file_recreates_blob_removed_by_gc(db, uploads_root):
+    data = os.urandom(64)
+    url = _blob(db, data, timedelta(days=3))
+    assert blobstore.collect_garbage(db, grace_seconds=3600)["deleted"] >= 1
+    assert not os.path.exists(path_for_url(url))
+
+    tmp, sha = _tmp_file(data, "again.part")
+    assert blobstore.commit_file(db, tmp, sha, len(data), ".jpg") == url
+    assert os.path.exists(path_for_url(url))
+    assert db.get(models.Blob, sha) is not None
+
+
+def test_refresh_refs_counts_every_referencing_table(db, uploads_root):
+    url = _blob(db, os.urandom(64), timedelta(0))
+    fabric = models.Fabric(name="引用", price=1, images=[models.FabricImage(url=url)], works=[models.FabricWork(url=url)])
+    product = models.Product(name="引用", price=1, category=models.Category(name="引用"), images=[models.ProductImage(url=url)])
+    db.add_all([fabric, product])
+    blobstore.refresh_refs(db, [url, "/static/uploads/not-a-blob.jpg", None])
+    db.commit()
+    assert db.scalar(select(models.Blob.ref_count).where(models.Blob.url == url)) == 3
+
+
+def test_gc_respects_grace_period_and_references(db, uploads_root):
+    stale = _blob(db, os.urandom(64), timedelta(days=2))
+    fresh = _blob(db, os.urandom(64), timedelta(minutes=5))
+    used = _blob(db, os.urandom(64), timedelta(days=2))
+    db.add(models.Fabric(name="使用中", price=1, images=[models.FabricImage(url=used)]))
+    db.commit()
+
+    dry = blobstore.collect_garbage(db, grace_seconds=3600, dry_run=True)
+    assert dry["dry_run"] and os.path.exists(path_for_url(stale))
+
+    blobstore.collect_garbage(db, grace_seconds=3600)
+    remaining = set(db.scalars(select(models.Blob.url)))
+    assert stale not in remaining
+    assert {fresh, used} <= remaining
+    assert not os.path.exists(path_for_url(stale))
+    assert os.path.exists(path_for_url(fresh)) and os.path.exists(path_for_url(used))
+
+
+def test_gc_removes_derivatives_and_precompressed_copies(db, uploads_root):
+    url = _blob(db, os.urandom(64), timedelta(days=2))
+    path = path_for_url(url)
+    extras = derivative_paths(path) + [path + ".br", path + ".gz"]
+    for p in extras:
+        open(p, "wb").close()
+    old_tmp, _ = _tmp_file(b"interrupted", "old.part")
+    os.utime(old_tmp, (0, 0))
+
+    result = blobstore.collect_garbage(db, grace_seconds=3600)
+    assert result["tmp_removed"] == 1 and not os.path.exists(old_tmp)
+    assert [p for p in [path] + extras if os.path.exists(p)] == []
@@ -0,0 +1,105 @@
+import io
+import json
+import zipfile
+
+from sqlalchemy import select
+
+from app import catalog_import, models, search
+from app.utils.paths import public_url_for
+
+
+def _zip(files: dict) -> io.BytesIO:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        for name, data in files.items():
+            z.writestr(name, data)
+    buf.seek(0)
+    return buf
+
+
+def _jsonl(*rows) -> list:
+    return [r if isinstance(r, str) else json.dumps(r, ensure_ascii=False) for r in rows]
+
+
+def _run(db, kind, lines, photos=None):
+    src = catalog_import.PhotoSource(fileobj=photos) if photos is not None else None
+    return catalog_import.run_import(db, kind, catalog_import.read_manifest(lines, "jsonl"), src)
+
+
+def test_bad_rows_are_reported_and_skipped(db, uploads_root):
+    lines = _jsonl(
+        {"name": "匯入 ok", "price": 100, "images": ["a.jpg"]},
+        "{not json",
+        {"price": 1},
+        {"name": "缺照片", "images": ["missing.jpg"]},
+        ["not", "an", "object"],
+    )
+    report, new_photos = _run(db, "fabrics", lines, _zip({"a.jpg": b"aaa"}))
+    out = report.as_dict()
+    assert out["created"] == 1 and not out["ok"]
+    assert [e["row"] for e in out["errors"]] == [2, 3, 4, 5]
+    assert "photo not found: missing.jpg" in out["errors"][2]["error"]
+    assert len(new_photos) == 1
+    fabric = db.get(models.Fabric, out["ids"][0])
+    assert [i.url for i in fabric.images] == [public_url_for(new_photos[0])]
+
+
+def test_unknown_category_is_a_row_error(db, uploads_root):
+    category = models.Category(name="匯入分類")
+    db.add(category)
+    db.commit()
+    report, _ = _run(db, "products", _jsonl(
+        {"name": "有分類", "price": 1, "category_id": category.id},
+        {"name": "沒分類", "price": 1, "category_id": 987654},
+    ))
+    assert report.created == 1
+    assert report.errors == [{"row": 2, "error": "category_id not found: 987654"}]
+
+
+def test_zip_entries_match_by_basename_and_share_blobs(db, uploads_root):
+    photos = _zip({"shoot/day1/front.jpg": b"front", "shoot/back.jpg": b"front", "other/works.png": b"work"})
+    report, new_photos = _run(db, "fabrics", _jsonl(
+        {"name": "檔名比對", "images": ["front.jpg", "shoot/back.jpg", "/static/uploads/legacy.jpg"], "works": ["works.png"]},
+    ), photos)
+    assert report.error_count == 0
+    fabric = db.get(models.Fabric, report.ids[0])
+    # 同內容的兩張只存一份；既有 URL 原樣保留
+    assert len(fabric.images) == 2 and fabric.images[1].url == "/static/uploads/legacy.jpg"
+    assert fabric.works[0].url.endswith(".png")
+    assert report.photos == 3 and len(set(new_photos)) == 2
+
+
+def test_failed_chunk_is_rolled_back_and_others_commit(db, uploads_root, monkeypatch):
+    monkeypatch.setattr(catalog_import, "CHUNK", 2)
+    calls = []
+    real = search.index_fabric_rows
+
+    def flaky(db_, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("boom")
+        real(db_, rows)
+
+    monkeypatch.setattr(search, "index_fabric_rows", flaky)
+    photos = _zip({f"{i}.jpg": f"chunk-{i}".encode() for i in range(5)})
+    report, new_photos = _run(db, "fabrics", _jsonl(*({"name": f"分批 {i}", "images": [f"{i}.jpg"]} for i in range(5))), photos)
+
+    assert report.created == 3 and len(report.ids) == 3
+    assert [(e["row"], "boom" in e["error"]) for e in report.errors] == [(3, True), (4, True)]
+    names = db.scalars(select(models.Fabric.name).where(models.Fabric.name.like("分批 %")).order_by(models.Fabric.id)).all()
+    assert names == ["分批 0", "分批 1", "分批 4"]
+    # 失敗那批的圖片列也一起回滾
+    urls = [public_url_for(p) for p in new_photos]
+    linked = db.scalars(select(models.FabricImage.fabric_id).where(models.FabricImage.url.in_(urls))).all()
+    assert sorted(linked) == sorted(report.ids)
+
+
+def test_import_endpoint_accepts_csv_and_zip(client, uploads_root):
+    manifest = "name,price,images\nCSV 匯入,120,x.jpg|y.jpg\n,1,\n".encode("utf-8-sig")
+    r = client.post(
+        "/api/import/fabrics",
+        files={"manifest": ("m.csv", manifest), "photos": ("p.zip", _zip({"x.jpg": b"x", "dir/y.jpg": b"y"}).getvalue())},
+    )
+    assert r.status_code == 200
+    out = r.json()
+    assert out["created"] == 1 and out["photos"] == 2 and [e["row"] for e in out["errors"]] == [2]
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from app import derivatives
+from app.utils import paths
+
+SHA = "ab" * 32
+URL = f"/static/uploads/{paths.blob_relpath(SHA, '.jpg')}"
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(paths, "static_root", lambda: str(tmp_path))
+    monkeypatch.setattr(derivatives, "ENABLED", True)
+    monkeypatch.setattr(derivatives, "_complete", {})
+    src = paths.path_for_url(URL)
+    os.makedirs(os.path.dirname(src))
+    open(src, "wb").close()
+    return src
+
+
+def _touch(src, width, ext):
+    open(derivatives._derivative_name(os.path.splitext(src)[0], width, ext), "wb").close()
+
+
+def test_no_variants_until_rendered(uploads):
+    assert derivatives.variants_for_url(URL) == []
+
+
+def test_only_existing_variants_are_listed(uploads):
+    _touch(uploads, 160, "webp")
+    _touch(uploads, 480, "jpg")
+    assert [(v["width"], v["format"]) for v in derivatives.variants_for_url(URL)] == [(160, "webp"), (480, "jpg")]
+    # 部分產生的結果不快取，補齊後就看得到
+    for w in derivatives.WIDTHS:
+        for ext, _ in derivatives.FORMATS:
+            _touch(uploads, w, ext)
+    variants = derivatives.variants_for_url(URL)
+    assert len(variants) == len(derivatives.WIDTHS) * len(derivatives.FORMATS)
+    assert all(v["url"].startswith(URL[: -len(".jpg")] + "_w") for v in variants)
+    assert derivatives._complete[URL] is variants
@@ -0,0 +1,44 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from app import exports, models
+from .conftest import add_catalog
+
+
+def _export(client, resource, fmt, since):
+    r = client.get(f"/api/{resource}/export", params={"format": fmt, "created_from": since.isoformat()})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith(exports.MEDIA_TYPES[fmt].split(";")[0])
+    return r.content
+
+
+def test_csv_has_bom_and_quotes_awkward_values(client, db):
+    since = datetime.utcnow()
+    db.add(models.Fabric(name='雙層, "紗"\n布', price=120, description="含,逗號"))
+    db.commit()
+    body = _export(client, "fabrics", "csv", since)
+    assert body.startswith("﻿".encode())
+    rows = list(csv.reader(io.StringIO(body.decode("utf-8-sig"))))
+    assert rows[0] == exports.FABRIC_COLUMNS
+    assert [(r[1], r[5]) for r in rows[1:]] == [('雙層, "紗"\n布', "含,逗號")]
+
+
+def test_ndjson_spans_several_batches_in_order(client, db, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH", 2)
+    since = datetime.utcnow()
+    ids = add_catalog(db, 5)["fabrics"]
+    lines = _export(client, "fabrics", "ndjson", since).splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [r["id"] for r in rows] == ids
+    assert all(len(r["images"]) == 2 and len(r["works"]) == 1 for r in rows)
+
+
+def test_order_csv_has_one_row_per_item_across_batches(client, db, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_BATCH", 2)
+    since = datetime.utcnow()
+    ids = add_catalog(db, 3)["orders"]
+    rows = list(csv.DictReader(io.StringIO(_export(client, "orders", "csv", since).decode("utf-8-sig"))))
+    assert [int(r["order_ref"]) for r in rows] == [i for i in ids for _ in range(2)]
+    assert {r["final_price"] for r in rows} == {"500.0", "300.0"}
@@ -0,0 +1,73 @@
+"""FAST_JSON=1 與 0 的列表回應必須逐位元組相同。"""
+import os
+
+import pytest
+
+from app import derivatives, models
+from app.cache import public_cache
+from app.database import settings
+from app.routers import public
+from app.utils.paths import blob_relpath, path_for_url
+
+
+def _blob_url(sha: str) -> str:
+    return f"/static/uploads/{blob_relpath(sha, '.jpg')}"
+
+
+@pytest.fixture
+def catalog(db, uploads_root, monkeypatch):
+    monkeypatch.setattr(derivatives, "ENABLED", True)
+    monkeypatch.setattr(derivatives, "_complete", {})
+    rendered = _blob_url("cd" * 32)
+    src = path_for_url(rendered)
+    base = src.rsplit(".", 1)[0]
+    os.makedirs(os.path.dirname(src))
+    for w in derivatives.WIDTHS:
+        for ext, _ in derivatives.FORMATS:
+            open(derivatives._derivative_name(base, w, ext), "wb").close()
+
+    category = models.Category(name=f"FAST_JSON {db.query(models.Category).count()}")
+    fabric = models.Fabric(
+        name="快速 \"JSON\"\n布", price=199.5, on_clearance=True, clearance_price=149.25, description="é ✓",
+        # position 與插入順序相反，確認兩條路徑都依 position 排序
+        images=[models.FabricImage(url=rendered, position=1), models.FabricImage(url=_blob_url("ef" * 32), position=0)],
+        works=[models.FabricWork(url="/static/uploads/w2.jpg", position=1), models.FabricWork(url="/static/uploads/w1.jpg", position=0)],
+    )
+    bare = models.Fabric(name="沒有圖", price=0)
+    product = models.Product(
+        name="快速商品", price=1000, promo_price=888.8, category=category,
+        images=[models.ProductImage(url=rendered, position=0)],
+    )
+    db.add_all([fabric, bare, product])
+    db.flush()
+    order = models.Order(customer_name="快速客戶", items=[
+        models.OrderItem(product_id=product.id, fabric_id=fabric.id, original_price=1000, adjustment=-100.5, final_price=899.5),
+        models.OrderItem(product_id=product.id, original_price=1000, final_price=1000, description="第二件"),
+    ])
+    db.add(order)
+    db.commit()
+    return {"category": category.id}
+
+
+def _get(client, monkeypatch, fast: bool, path: str):
+    monkeypatch.setattr(settings, "FAST_JSON", fast)
+    monkeypatch.setattr(public, "_FAST", fast)
+    monkeypatch.setattr(public, "_DUMP", public.fastjson.dumps if fast else None)
+    public_cache.clear()
+    r = client.get(path, params={"limit": 500})
+    assert r.status_code == 200, r.text
+    return r.content, r.headers.get("X-Next-Cursor")
+
+
+@pytest.mark.parametrize("path", [
+    "/api/fabrics/", "/api/products/", "/api/orders/",
+    "/api/public/fabrics", "/api/public/fabrics/clearance", "/api/public/products/by_category/{category}",
+])
+def test_fast_and_orm_bodies_are_identical(client, monkeypatch, catalog, path):
+    path = path.format(**catalog)
+    fast = _get(client, monkeypatch, True, path)
+    slow = _get(client, monkeypatch, False, path)
+    assert fast == slow
+    assert "快速".encode() in fast[0]
+    if "orders" not in path:
+        assert b"_w160.webp" in fast[0]
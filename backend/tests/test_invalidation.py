@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app import invalidation
+from app.invalidation import ALL, Change, SqliteBus
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def events_path(tmp_path):
+    return str(tmp_path / "test.db.events")
+
+
+def _send_from_other_process(path, *changes):
+    script = (
+        "import sys\n"
+        "from app.invalidation import Change, SqliteBus\n"
+        "bus = SqliteBus(sys.argv[1], 1, 300)\n"
+        f"for c in {[tuple(c) for c in changes]!r}:\n"
+        "    bus.send(Change(*c))\n"
+    )
+    subprocess.run([sys.executable, "-c", script, path], cwd=BACKEND, check=True, env=os.environ.copy())
+
+
+def test_events_from_another_process_are_delivered(events_path):
+    bus = SqliteBus(events_path, 1, 300)
+    bus.start(lambda change: None)
+    bus.stop()  # 只用 start() 設定起點，下面直接 poll
+    bus.send(Change("fabrics", (1,), "update", ("fabrics",)))  # 自己送的會略過
+    _send_from_other_process(
+        events_path,
+        Change("fabrics", (42,), "update", ("fabrics",)),
+        Change("products", (7, 8), "delete", ("products", "category:3")),
+    )
+    assert bus.poll() == [
+        Change("fabrics", (42,), "update", ("fabrics",)),
+        Change("products", (7, 8), "delete", ("products", "category:3")),
+    ]
+    assert bus.poll() == []
+
+
+def test_missed_events_reset_everything(events_path):
+    reader = SqliteBus(events_path, 1, 300)
+    reader.start(lambda change: None)
+    reader.stop()
+    writer = SqliteBus(events_path, 1, 0)
+    writer.send(Change("fabrics", (1,), "update", ("fabrics",)))
+    writer.send(Change("fabrics", (2,), "update", ("fabrics",)))
+    writer.prune()  # retain_s=0：reader 還沒讀到就被清掉
+    assert reader.poll() == [Change(ALL, (), "reset", (ALL,))]
+    # 之後的事件照常逐筆送達
+    writer.send(Change("orders", (5,), "create", ()))
+    assert reader.poll() == [Change("orders", (5,), "create", ())]
+
+
+def test_background_thread_delivers_to_handlers(events_path):
+    got = []
+    arrived = threading.Event()
+
+    def deliver(change):
+        got.append(change)
+        arrived.set()
+
+    bus = SqliteBus(events_path, 0.01, 300)
+    bus.start(deliver)
+    try:
+        _send_from_other_process(events_path, Change("categories", (3,), "update", ("categories",)))
+        assert arrived.wait(5)
+    finally:
+        bus.stop()
+    assert got == [Change("categories", (3,), "update", ("categories",))]
+
+
+def test_publish_delivers_locally_even_if_the_bus_fails(monkeypatch):
+    class Broken(invalidation.Bus):
+        def send(self, change):
+            raise OSError("disk full")
+
+    got = []
+    monkeypatch.setattr(invalidation, "_bus", Broken())
+    monkeypatch.setattr(invalidation, "_handlers", [got.append])
+    invalidation.publish("fabrics", 9, "delete", ("fabrics",))
+    assert got == [Change("fabrics", (9,), "delete", ("fabrics",))]
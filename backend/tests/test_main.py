@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.database import settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _lazy_app(monkeypatch):
+    monkeypatch.setattr(settings, "LAZY_ROUTERS", True)
+    return main.create_app()
+
+
+def test_router_loads_on_first_request(client, monkeypatch):
+    app = _lazy_app(monkeypatch)
+    # 不進 lifespan：沒有背景預載，只由請求觸發
+    c = TestClient(app)
+    assert not any(r.path.startswith("/api/fabrics") for r in app.routes)
+    assert c.get("/api/fabrics/", params={"limit": 1}).status_code == 200
+    assert any(r.path == "/api/fabrics/" for r in app.routes)
+    assert not any(r.path.startswith("/api/orders") for r in app.routes)
+
+
+def test_concurrent_first_requests_include_each_router_once(client, monkeypatch):
+    app = _lazy_app(monkeypatch)
+    paths = ["/api/fabrics/", "/api/products/", "/api/orders/", "/api/categories/"] * 8
+    with TestClient(app) as c, ThreadPoolExecutor(8) as pool:
+        codes = list(pool.map(lambda p: c.get(p, params={"limit": 1}).status_code, paths))
+    assert set(codes) == {200}
+    counts = Counter((r.path, tuple(sorted(getattr(r, "methods", ())))) for r in app.routes)
+    assert all(counts[(p, ("GET",))] == 1 for p in set(paths))
+    assert max(counts.values()) == 1
+
+
+def test_module_app_is_created_on_first_access(tmp_root):
+    code = (
+        "import app.main as m\n"
+        "assert 'app' not in vars(m)\n"
+        "from app.main import app\n"
+        "assert vars(m)['app'] is app and m.app is app\n"
+    )
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{os.path.join(tmp_root, 'import.db')}")
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=env, check=True)
@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import main, metrics, models
+from app.database import settings
+
+from .conftest import add_catalog
+from .test_query_counts import EXPECTED
+
+
+def _installed() -> bool:
+    return event.contains(Engine, "before_cursor_execute", metrics._before_cursor_execute)
+
+
+@pytest.fixture
+def metrics_client(client, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(metrics, "registry", metrics.Registry())
+    try:
+        with TestClient(main.create_app()) as c:
+            yield c
+    finally:
+        if _installed():
+            event.remove(Engine, "before_cursor_execute", metrics._before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", metrics._after_cursor_execute)
+
+
+def _samples(c) -> dict:
+    r = c.get("/api/metrics")
+    assert r.status_code == 200
+    out = {}
+    for line in r.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            out[name] = float(value)
+    return out
+
+
+def test_disabled_metrics_mount_nothing(client):
+    assert client.get("/api/metrics").status_code == 404
+    assert not _installed()
+
+
+def test_routes_are_labelled_by_template(metrics_client, db):
+    ids = add_catalog(db, 2)["fabrics"]
+    for i in ids:
+        assert metrics_client.get(f"/api/fabrics/{i}").status_code == 200
+    metrics_client.get("/no/such/path")
+    metrics_client.get("/static/uploads/missing.jpg")
+    s = _samples(metrics_client)
+    assert s['http_requests_total{method="GET",route="/api/fabrics/{fabric_id}",status="200"}'] == 2
+    assert s['http_requests_total{method="GET",route="<unmatched>",status="404"}'] == 1
+    assert s['http_requests_total{method="GET",route="/static/*",status="404"}'] == 1
+    assert not any(f"/api/fabrics/{ids[0]}" in k for k in s)
+
+
+def test_sql_is_attributed_to_the_request_route(metrics_client, db):
+    # 多建一次 app：install() 不會讓事件重複計數
+    main.create_app()
+    fabric_id = add_catalog(db, 1)["fabrics"][0]
+    metrics_client.get(f"/api/fabrics/{fabric_id}")
+    metrics_client.get("/api/health")
+    s = _samples(metrics_client)
+    assert s['db_statements_per_request_sum{method="GET",route="/api/fabrics/{fabric_id}"}'] == EXPECTED["fabrics"]
+    assert s['db_statements_per_request_sum{method="GET",route="/api/health"}'] == 0
+    # 測試本身在請求外建立的資料算在請求之外
+    assert s["db_statements_outside_requests_total"] > 0
+
+
+def test_public_cache_hits_keep_the_route_label(metrics_client, db):
+    category_id = db.get(models.Product, add_catalog(db, 1)["products"][0]).category_id
+    path = f"/api/public/products/by_category/{category_id}"
+    assert metrics_client.get(path).status_code == 200
+    assert metrics_client.get(path).status_code == 200
+    s = _samples(metrics_client)
+    labels = 'method="GET",route="/api/public/products/by_category/{category_id}"'
+    assert s[f'http_requests_total{{{labels},status="200"}}'] == 2
+    # 第二次由快取回應，沒有 SQL
+    assert s[f'db_statements_per_request_bucket{{{labels},le="0"}}'] == 1
@@ -0,0 +1,53 @@
+"""從最初版本的資料庫升級到目前的 schema。"""
+import os
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect
+
+from app import migrations
+from app.database import Base, make_engine
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline_schema.sql")
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(path)
+    with open(BASELINE, encoding="utf-8") as f:
+        conn.executescript(f.read())
+    conn.executescript("""
+        INSERT INTO fabrics VALUES (1, '亞麻', '台灣', 300, '', '', 1, 120, '2024-01-02 00:00:00');
+        INSERT INTO fabric_images VALUES (1, 1, '/static/uploads/a.jpg'), (2, 1, '/static/uploads/b.jpg');
+        INSERT INTO categories VALUES (1, '包包', '2024-01-01 00:00:00');
+        INSERT INTO products VALUES (1, '托特包', 900, '', '', 750, '2024-01-03 00:00:00', 1);
+        INSERT INTO orders VALUES (1, '王小姐', '', '尚未處理', '貨到付款', '2024-01-04 00:00:00');
+        INSERT INTO order_items VALUES (1, 1, 1, 1, '空白', 750, 50, 800, ''), (2, 1, 1, NULL, '空白', 750, 0, 750, '');
+    """)
+    conn.commit()
+    conn.close()
+    engine = make_engine(f"sqlite:///{path}")
+    yield engine
+    engine.dispose()
+
+
+def test_upgrade_from_baseline(baseline_db):
+    applied = migrations.upgrade(baseline_db, make_backup=False)
+    assert applied == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.pending(baseline_db) == []
+
+    insp = inspect(baseline_db)
+    for table in Base.metadata.sorted_tables:
+        have = {ix["name"] for ix in insp.get_indexes(table.name)}
+        assert {ix.name for ix in table.indexes} <= have, table.name
+
+    with baseline_db.connect() as conn:
+        assert conn.exec_driver_sql("SELECT position FROM fabric_images ORDER BY id").scalars().all() == [0, 1]
+        assert conn.exec_driver_sql("SELECT effective_price FROM fabrics").scalar() == 120
+        assert conn.exec_driver_sql("SELECT effective_price FROM products").scalar() == 750
+        assert conn.exec_driver_sql("SELECT total, item_count FROM orders").one() == (1550, 2)
+        assert conn.exec_driver_sql("SELECT SUM(revenue) FROM sales_rollups").scalar() == 1550
+
+    # 再跑一次什麼都不做
+    assert migrations.upgrade(baseline_db, make_backup=False) == []
@@ -0,0 +1,143 @@
+"""訂單明細批次編輯：計價、訂單 total / item_count 與 rollup 的增量維護。"""
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+
+from app import models, rollups
+
+
+@pytest.fixture
+def catalog(db):
+    category = models.Category(name=f"訂單測試 {uuid.uuid4().hex[:8]}")
+    products = [models.Product(name=f"商品 {i}", price=price, category=category) for i, price in enumerate((500, 800, 1200))]
+    fabric = models.Fabric(name="亞麻", price=300)
+    db.add_all(products + [fabric])
+    db.commit()
+    return {"products": [p.id for p in products], "fabric": fabric.id}
+
+
+def _create(client, catalog):
+    p = catalog["products"]
+    r = client.post("/api/orders/", json={
+        "customer_name": "王小姐",
+        "items": [
+            {"product_id": p[0], "adjustment": 50},
+            {"product_id": p[1], "fabric_id": catalog["fabric"]},
+            {"product_id": p[2], "adjustment": -100},
+        ],
+    })
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def _recomputed(db, order_id):
+    Item = models.OrderItem
+    total, count = db.execute(
+        select(func.coalesce(func.sum(Item.final_price), 0), func.count()).where(Item.order_id == order_id)
+    ).one()
+    return float(total), count
+
+
+def _stored(db, order_id):
+    db.expire_all()
+    order = db.get(models.Order, order_id)
+    return order.total, order.item_count
+
+
+def _rollup_rows(db, product_ids):
+    R = models.SalesRollup
+    return sorted(
+        db.execute(
+            select(R.day, R.product_id, R.fabric_id, R.order_status, R.payment_status, R.revenue, R.item_count)
+            .where(R.product_id.in_(product_ids))
+        ).all()
+    )
+
+
+def test_edit_items_updates_stored_totals(client, db, catalog):
+    order = _create(client, catalog)
+    assert (order["total"], order["item_count"]) == (500 + 50 + 800 + 1200 - 100, 3)
+    p = catalog["products"]
+    first, second, third = order["items"]
+
+    r = client.patch(f"/api/orders/{order['id']}/items", json={
+        "add": [{"product_id": p[1], "adjustment": 20}],
+        "update": [
+            dict(first, adjustment=-50),  # 同商品：保留原價
+            dict(second, product_id=p[2]),  # 換商品：重新計價
+        ],
+        "remove": [third["id"]],
+    })
+    assert r.status_code == 200, r.text
+    body = r.json()
+    by_id = {it["id"]: it for it in body["items"]}
+    assert by_id[first["id"]]["final_price"] == 450
+    assert by_id[second["id"]]["original_price"] == 1200
+    # SQLite 會重用刪掉的 rowid，以內容確認被移除的列
+    assert sorted(it["adjustment"] for it in body["items"]) == [-50, 0, 20]
+
+    total, count = _recomputed(db, order["id"])
+    assert (body["total"], body["item_count"]) == (total, count) == (450 + 1200 + 820, 3)
+    assert _stored(db, order["id"]) == (total, count)
+
+
+def test_reprice_uses_current_price(client, db, catalog):
+    order = _create(client, catalog)
+    product = db.get(models.Product, catalog["products"][0])
+    product.promo_price = 400
+    db.commit()
+
+    item = order["items"][0]
+    r = client.patch(f"/api/orders/{order['id']}/items", json={"update": [item], "reprice": True})
+    assert r.status_code == 200, r.text
+    edited = r.json()["items"][0]
+    assert (edited["original_price"], edited["final_price"]) == (400, 450)
+    assert _stored(db, order["id"]) == _recomputed(db, order["id"])
+
+
+def test_rebuilds_match_incremental_updates(client, db, catalog):
+    p = catalog["products"]
+    orders = [_create(client, catalog) for _ in range(3)]
+    responses = [
+        client.patch(f"/api/orders/{orders[0]['id']}/items", json={"remove": [orders[0]["items"][0]["id"]]}),
+        client.patch(f"/api/orders/{orders[1]['id']}/items", json={
+            "add": [{"product_id": p[0]}, {"product_id": p[2], "adjustment": 30}],
+            "update": [dict(orders[1]["items"][1], product_id=p[0])],
+        }),
+        client.put(f"/api/orders/{orders[2]['id']}", json={"customer_name": "王小姐", "order_status": "已完成"}),
+    ]
+    assert [r.status_code for r in responses] == [200, 200, 200]
+    ids = [o["id"] for o in orders]
+
+    stored = {i: _stored(db, i) for i in ids}
+    updated_at = {i: db.get(models.Order, i).updated_at for i in ids}
+    rollup = _rollup_rows(db, p)
+    assert rollup
+
+    rollups.rebuild_totals(db)
+    rollups.rebuild(db)
+    db.flush()
+    db.expire_all()
+    try:
+        assert {i: _stored(db, i) for i in ids} == stored
+        assert {i: _recomputed(db, i) for i in ids} == stored
+        # 重算不算修改訂單
+        assert {i: db.get(models.Order, i).updated_at for i in ids} == updated_at
+        assert _rollup_rows(db, p) == rollup
+    finally:
+        db.rollback()
+
+
+@pytest.mark.parametrize("batch, status", [
+    (lambda o, p: {"update": [o["items"][0]], "remove": [o["items"][0]["id"]]}, 400),
+    (lambda o, p: {"remove": [10**9]}, 404),
+    (lambda o, p: {"add": [{"product_id": 10**9}]}, 400),
+    (lambda o, p: {"add": [{"product_id": p[0], "fabric_id": 10**9}]}, 400),
+])
+def test_invalid_batches_leave_order_unchanged(client, db, catalog, batch, status):
+    order = _create(client, catalog)
+    r = client.patch(f"/api/orders/{order['id']}/items", json=batch(order, catalog["products"]))
+    assert r.status_code == status
+    assert _stored(db, order["id"]) == (order["total"], order["item_count"])
+    assert client.get(f"/api/orders/{order['id']}").json()["items"] == order["items"]
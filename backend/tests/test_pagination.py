@@ -0,0 +1,37 @@
+from app import models
+from app.utils.pagination import DEFAULT_LIMIT, NEXT_CURSOR_HEADER
+
+from .conftest import add_fabrics
+
+
+def _walk(client, path, params):
+    ids, params = [], dict(params)
+    while True:
+        r = client.get(path, params=params)
+        assert r.status_code == 200
+        ids += [row["id"] for row in r.json()]
+        cursor = r.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return ids
+        params["cursor"] = cursor
+
+
+def test_unpaginated_list_returns_first_page_with_cursor(client, db):
+    add_fabrics(db, DEFAULT_LIMIT + 5)
+    total = db.query(models.Fabric).count()
+
+    r = client.get("/api/fabrics/")
+    assert r.status_code == 200
+    assert len(r.json()) == DEFAULT_LIMIT
+    assert r.headers.get(NEXT_CURSOR_HEADER)
+
+    ids = _walk(client, "/api/fabrics/", {})
+    assert len(ids) == len(set(ids)) == total
+
+
+def test_keyset_pages_match_sorted_order(client, db):
+    add_fabrics(db, 12)
+    expected = [
+        f.id for f in db.query(models.Fabric).order_by(models.Fabric.price.desc(), models.Fabric.id.desc())
+    ]
+    assert _walk(client, "/api/fabrics/", {"sort": "-price", "limit": 5}) == expected
@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app import main, models, profiler
+from app.database import SessionLocal, settings
+
+from .conftest import add_catalog
+from .test_query_counts import EXPECTED
+
+
+@pytest.fixture
+def profiled_client(client, monkeypatch):
+    monkeypatch.setattr(settings, "SQL_PROFILE", True)
+    monkeypatch.setattr(profiler, "reports", type(profiler.reports)(maxlen=20))
+    try:
+        with TestClient(main.create_app()) as c:
+            yield c
+    finally:
+        if event.contains(Engine, "before_cursor_execute", profiler._before_cursor_execute):
+            event.remove(Engine, "before_cursor_execute", profiler._before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", profiler._after_cursor_execute)
+            event.remove(Session, "do_orm_execute", profiler._orm_execute)
+
+
+def test_shape_folds_in_lists_and_multi_row_values():
+    assert profiler.shape("SELECT x FROM t WHERE id IN (?, ?, ?)") == "SELECT x FROM t WHERE id IN (?, …)"
+    assert profiler.shape("INSERT INTO t (a, b) VALUES (?, ?), (?, ?),\n (?, ?)") == "INSERT INTO t (a, b) VALUES (?, …), …"
+
+
+def test_lazy_loads_are_grouped_as_n_plus_one(profiled_client, db):
+    ids = add_catalog(db, settings.SQL_PROFILE_N_PLUS_ONE + 1)["fabrics"]
+    prof = profiler.RequestProfile()
+    token = profiler._current.set(prof)
+    s = SessionLocal()
+    try:
+        for f in s.query(models.Fabric).filter(models.Fabric.id.in_(ids)):
+            f.images  # 沒有 selectinload：每筆一次 lazy load
+    finally:
+        s.close()
+        profiler._current.reset(token)
+    report = prof.report(1, "GET", "/x", "/x")
+    [group] = report["n_plus_one"]
+    assert group["count"] == len(ids)
+    assert group["relationships"] == ["Fabric.images"]
+    assert report["statements"] == len(ids) + 1
+
+
+def test_header_summarises_each_request(profiled_client, db):
+    # 多建一次 app：install() 不會讓同一句 SQL 被記兩次
+    main.create_app()
+    fabric_id = add_catalog(db, 1)["fabrics"][0]
+    r = profiled_client.get(f"/api/fabrics/{fabric_id}")
+    header = r.headers[main.PROFILE_HEADER]
+    assert f"statements={EXPECTED['fabrics']}" in header and "n+1" not in header
+
+    listed = profiled_client.get("/api/debug/sql-profiles").json()
+    assert listed[0]["route"] == "/api/fabrics/{fabric_id}"
+    assert listed[0]["statements"] == EXPECTED["fabrics"]
+    full = profiled_client.get(f"/api/debug/sql-profiles/{listed[0]['id']}").json()
+    assert sum(g["count"] for g in full["shapes"]) == EXPECTED["fabrics"]
+    assert profiled_client.get("/api/debug/sql-profiles/0").status_code == 404
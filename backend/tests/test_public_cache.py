@@ -0,0 +1,108 @@
+"""public 目錄快取：命中不查資料庫，寫入只清掉受影響的 tag。"""
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app import models
+from app.cache import public_cache
+from app.utils import cache as cache_module
+from app.utils.cache import ResponseCache
+
+from .test_query_counts import count_statements
+
+
+@pytest.fixture
+def categories(client, db):
+    public_cache.clear()
+    out = []
+    for _ in range(2):
+        category = models.Category(name=f"快取 {uuid.uuid4().hex[:8]}")
+        category.products = [models.Product(name="托特包", price=900)]
+        db.add(category)
+        out.append(category)
+    db.add(models.Fabric(name="亞麻", price=300))
+    db.commit()
+    return [(c.id, c.products[0].id) for c in out]
+
+
+def _sql(client, path):
+    with count_statements() as statements:
+        r = client.get(path)
+    assert r.status_code == 200, r.text
+    return len(statements)
+
+
+def _paths(categories):
+    return {
+        "fabrics": "/api/public/fabrics?limit=5",
+        "categories": "/api/public/categories",
+        "a": f"/api/public/products/by_category/{categories[0][0]}",
+        "b": f"/api/public/products/by_category/{categories[1][0]}",
+    }
+
+
+def _warm(client, paths):
+    for path in paths.values():
+        client.get(path)
+    return {name: _sql(client, path) for name, path in paths.items()}
+
+
+def test_hit_runs_no_sql(client, categories):
+    path = "/api/public/fabrics?limit=5"
+    assert _sql(client, path) > 0
+    first = client.get(path)
+    with count_statements() as statements:
+        again = client.get(path)
+        not_modified = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+    assert statements == []
+    assert again.content == first.content
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert not_modified.status_code == 304
+
+
+def test_product_write_evicts_only_its_category(client, categories):
+    paths = _paths(categories)
+    assert set(_warm(client, paths).values()) == {0}
+    (category_a, product_a), _ = categories
+    r = client.put(f"/api/products/{product_a}", json={"name": "改名", "category_id": category_a, "price": 950})
+    assert r.status_code == 200
+    assert {name: _sql(client, path) > 0 for name, path in paths.items()} == {
+        "fabrics": False, "categories": False, "a": True, "b": False,
+    }
+    assert client.get(paths["a"]).json()[0]["name"] == "改名"
+
+
+def test_fabric_and_category_writes_evict_their_tags(client, categories):
+    paths = _paths(categories)
+    _warm(client, paths)
+    fabric_id = client.get(paths["fabrics"]).json()[0]["id"]
+    assert client.put(f"/api/fabrics/{fabric_id}", json={"name": "新布料", "price": 10}).status_code == 200
+    assert {name: _sql(client, path) > 0 for name, path in paths.items()} == {
+        "fabrics": True, "categories": False, "a": False, "b": False,
+    }
+    assert client.post("/api/categories/", json={"name": f"新分類 {uuid.uuid4().hex[:8]}"}).status_code == 200
+    assert {name: _sql(client, path) > 0 for name, path in paths.items()} == {
+        "fabrics": False, "categories": True, "a": False, "b": False,
+    }
+
+
+def test_write_during_build_is_not_stored():
+    c = ResponseCache(1024)
+    token = c.token(("fabrics",))
+    c.invalidate("fabrics")
+    c.set("k", b"[]", {}, ("fabrics",), token)
+    assert c.get("k") is None
+    c.set("k", b"[]", {}, ("fabrics",), c.token(("fabrics",)))
+    assert c.get("k").body == b"[]"
+
+
+def test_entries_expire_after_max_age(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    c = ResponseCache(1024, max_age=60)
+    c.set("k", b"[]", {}, ("fabrics",), c.token(("fabrics",)))
+    now[0] += 59
+    assert c.get("k") is not None
+    now[0] += 2
+    assert c.get("k") is None
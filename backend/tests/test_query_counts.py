@@ -0,0 +1,50 @@
+"""列表與單筆讀取的 SQL 數量是固定的，不隨資料列數成長（沒有 N+1）。"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .conftest import add_catalog
+
+
+@contextmanager
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # 掛在 Engine 類別上：ASYNC_DB 的 AsyncEngine 底下是另一個 Engine
+    event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, "before_cursor_execute", before_cursor_execute)
+
+
+def _count(client, path, params=None) -> int:
+    with count_statements() as statements:
+        r = client.get(path, params=params)
+    assert r.status_code == 200, r.text
+    return len(statements)
+
+
+# 列表：table_versions（ETag）＋主查詢＋每個集合關聯一次 IN 查詢
+# 單筆：updated_at（ETag）＋主查詢＋每個集合關聯一次 selectinload
+EXPECTED = {"fabrics": 4, "products": 3, "orders": 3}
+
+
+@pytest.mark.parametrize("resource", sorted(EXPECTED))
+def test_list_query_count_is_constant(api, db, resource):
+    add_catalog(db, 3)
+    small = _count(api, f"/api/{resource}/", {"limit": 50})
+    add_catalog(db, 60)
+    large = _count(api, f"/api/{resource}/", {"limit": 50})
+    assert small == large == EXPECTED[resource]
+
+
+@pytest.mark.parametrize("resource", sorted(EXPECTED))
+def test_detail_query_count_is_constant(api, db, resource):
+    ids = add_catalog(db, 2)[resource] + add_catalog(db, 30)[resource][-2:]
+    assert {_count(api, f"/api/{resource}/{i}") for i in ids} == {EXPECTED[resource]}
@@ -0,0 +1,25 @@
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app import models
+from app.routers import reports
+
+
+def test_week_bucket_is_iso_8601(db):
+    # 跨年前後與 53 週的年份
+    days = [date(y, 12, 24) + timedelta(days=d) for y in (2015, 2020, 2021, 2024, 2026) for d in range(14)]
+    db.add_all(
+        models.SalesRollup(day=d, product_id=900000 + i, order_status="x", payment_status="x")
+        for i, d in enumerate(days)
+    )
+    db.flush()
+    week = reports._dimensions(db)["week"]
+    rows = db.execute(
+        select(models.SalesRollup.day, week).where(models.SalesRollup.product_id >= 900000)
+    ).all()
+    db.rollback()
+    assert len(rows) == len(days)
+    for day, bucket in rows:
+        year, number, _ = day.isocalendar()
+        assert bucket == f"{year}-W{number:02d}", day
@@ -0,0 +1,43 @@
+from app import search
+
+
+def _search(client, q, kind="fabrics"):
+    r = client.get("/api/public/search", params={"q": q, "kind": kind})
+    assert r.status_code == 200
+    return [row["name"] for row in r.json()[kind]]
+
+
+def _fabric(client, **fields):
+    r = client.post("/api/fabrics/", json={"price": 100, **fields})
+    assert r.status_code == 200
+    return r.json()["id"]
+
+
+def test_index_text_expands_cjk_runs_into_unigrams_and_bigrams():
+    assert search.index_text("純棉布 cotton") == " 純 棉 布 純棉 棉布  cotton"
+
+
+def test_match_expression_ands_bigrams_and_prefixes_the_last_word():
+    assert search.match_expression("棉布") == '"棉布"'
+    assert search.match_expression("純棉布") == '"純棉" AND "棉布"'
+    assert search.match_expression("棉") == '"棉"'
+    assert search.match_expression("Linen 亞麻 bl") == '"linen" AND "亞麻" AND "bl"*'
+    assert search.match_expression("bl ") == '"bl"'
+    assert search.match_expression("  ？！ ") == ""
+
+
+def test_cjk_substring_matches_inside_longer_words(client):
+    _fabric(client, name="純蠶絲緞面布料")
+    _fabric(client, name="蠶豆色棉麻")
+    assert _search(client, "絲緞") == ["純蠶絲緞面布料"]
+    assert sorted(_search(client, "蠶")) == ["純蠶絲緞面布料", "蠶豆色棉麻"]
+    assert _search(client, "緞絲") == []
+
+
+def test_results_follow_bm25_with_name_weighted_over_description(client):
+    _fabric(client, name="素面平織", description="適合做襯衫的zephyrine薄布")
+    _fabric(client, name="zephyrine 斜紋", description="")
+    _fabric(client, name="其他", origin="zephyrine 產地")
+    assert _search(client, "zephyrine") == ["zephyrine 斜紋", "其他", "素面平織"]
+    # 邊打邊搜：最後一個詞做前綴比對
+    assert len(_search(client, "zephyr")) == 3
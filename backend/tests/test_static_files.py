@@ -0,0 +1,123 @@
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from app.static_files import IMMUTABLE, REVALIDATE, UploadFiles, parse_range
+
+SHA = "0a" * 32
+BLOB = f"uploads/blobs/0a/0a/{SHA}.jpg"
+DATA = bytes(range(256)) * 4
+
+
+def _write(root, rel, data, mtime=None):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def static(tmp_path):
+    root = str(tmp_path)
+    _write(root, BLOB, DATA)
+    _write(root, "uploads/3_legacy.jpg", DATA)
+    return root, TestClient(Starlette(routes=[Mount("/static", UploadFiles(directory=root))]))
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 10)),
+    ("bytes=10-", (10, 90)),
+    ("bytes=-20", (80, 20)),
+    ("bytes=90-500", (90, 10)),
+    ("bytes=100-", (100, 0)),
+    ("bytes=-0", (100, 0)),
+    ("bytes=9-3", None),
+    ("bytes=0-1,5-6", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 100) == expected
+
+
+def test_fingerprinted_blobs_are_immutable(static):
+    _, c = static
+    r = c.get(f"/static/{BLOB}")
+    assert r.status_code == 200 and r.content == DATA
+    assert r.headers["cache-control"] == IMMUTABLE
+    assert r.headers["etag"] == f'"{SHA}"'
+    legacy = c.get("/static/uploads/3_legacy.jpg")
+    assert legacy.headers["cache-control"] == REVALIDATE
+    assert c.get("/static/uploads/3_legacy.jpg", headers={"if-none-match": legacy.headers["etag"]}).status_code == 304
+    assert c.get(f"/static/{BLOB}", headers={"if-none-match": f'W/"{SHA}"'}).status_code == 304
+
+
+def test_range_requests(static):
+    _, c = static
+    url = f"/static/{BLOB}"
+    r = c.get(url, headers={"range": "bytes=100-199"})
+    assert r.status_code == 206 and r.content == DATA[100:200]
+    assert r.headers["content-range"] == f"bytes 100-199/{len(DATA)}"
+    assert r.headers["content-length"] == "100"
+
+    r = c.get(url, headers={"range": "bytes=-10"})
+    assert r.status_code == 206 and r.content == DATA[-10:]
+
+    r = c.get(url, headers={"range": f"bytes={len(DATA)}-"})
+    assert r.status_code == 416 and r.headers["content-range"] == f"bytes */{len(DATA)}"
+
+    # 多區段不支援：回整個檔案
+    r = c.get(url, headers={"range": "bytes=0-1,5-6"})
+    assert r.status_code == 200 and r.content == DATA
+
+
+def test_if_range(static):
+    _, c = static
+    url = f"/static/{BLOB}"
+    last_modified = c.get(url).headers["last-modified"]
+    assert c.get(url, headers={"range": "bytes=0-9", "if-range": f'"{SHA}"'}).status_code == 206
+    assert c.get(url, headers={"range": "bytes=0-9", "if-range": last_modified}).status_code == 206
+    stale = c.get(url, headers={"range": "bytes=0-9", "if-range": '"something-else"'})
+    assert stale.status_code == 200 and stale.content == DATA
+
+
+def _raw(c, url, **headers):
+    """不讓 httpx 解壓縮，看實際送出的位元組。"""
+    with c.stream("GET", url, headers=headers) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def test_precompressed_variants_follow_accept_encoding(static):
+    root, c = static
+    svg = _write(root, "uploads/logo.svg", b"<svg/>" * 50, mtime=1_000_000)
+    _write(root, "uploads/logo.svg.br", b"BR", mtime=1_000_100)
+    _write(root, "uploads/logo.svg.gz", b"GZ", mtime=1_000_100)
+    url = "/static/uploads/logo.svg"
+
+    r, body = _raw(c, url, **{"accept-encoding": "gzip, br"})
+    assert body == b"BR" and r.headers["content-encoding"] == "br" and r.headers["vary"] == "Accept-Encoding"
+    assert "accept-ranges" not in r.headers and r.headers["etag"].endswith('-br"')
+
+    # 壓縮後的內容不做 Range
+    r, body = _raw(c, url, **{"accept-encoding": "gzip", "range": "bytes=0-0"})
+    assert r.status_code == 200 and body == b"GZ" and r.headers["content-encoding"] == "gzip"
+
+    r, body = _raw(c, url, **{"accept-encoding": "identity"})
+    assert "content-encoding" not in r.headers and body == b"<svg/>" * 50
+
+    # 比原檔舊的預壓縮檔不採用
+    os.utime(svg, (1_000_200, 1_000_200))
+    r, body = _raw(c, url, **{"accept-encoding": "br, gzip"})
+    assert "content-encoding" not in r.headers and body == b"<svg/>" * 50
+
+
+def test_non_compressible_types_ignore_precompressed_files(static):
+    root, c = static
+    _write(root, BLOB + ".gz", b"GZ")
+    r, body = _raw(c, f"/static/{BLOB}", **{"accept-encoding": "gzip"})
+    assert "content-encoding" not in r.headers and body == DATA
@@ -0,0 +1,70 @@
+import hashlib
+
+from app import models
+from app.database import settings
+
+BOUNDARY = "test-boundary"
+
+
+def _multipart(*files) -> bytes:
+    out = b""
+    for name, data in files:
+        out += (
+            f"--{BOUNDARY}\r\n"
+            f'Content-Disposition: form-data; name="files"; filename="{name}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + data + b"\r\n"
+    return out + f"--{BOUNDARY}--\r\n".encode()
+
+
+HEADERS = {"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"}
+
+
+def _leftovers(root):
+    return [p for p in root.rglob("*") if p.is_file()]
+
+
+def test_upload_dedups_identical_content(client, db, uploads_root):
+    data = b"same bytes " * 1000
+    r = client.post("/api/upload/products/1", files=[("files", ("a.PNG", data)), ("files", ("b.jpg", data))])
+    assert r.status_code == 200
+    first, second = r.json()["saved"]
+    assert first == second and first.endswith(".png")
+    sha = hashlib.sha256(data).hexdigest()
+    assert db.get(models.Blob, sha).size == len(data)
+    assert [p.name for p in _leftovers(uploads_root)] == [f"{sha}.png"]
+
+
+def test_file_over_limit_is_rejected_and_cleaned_up(client, db, uploads_root, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_FILE_BYTES", 1000)
+    body = _multipart(("ok.jpg", b"x" * 10), ("big.jpg", b"y" * 5000))
+    r = client.post("/api/upload/products/1", content=body, headers=HEADERS)
+    assert r.status_code == 413
+    assert _leftovers(uploads_root) == []
+    assert db.get(models.Blob, hashlib.sha256(b"x" * 10).hexdigest()) is None
+
+
+def test_content_length_over_request_limit_is_rejected_before_reading(client, uploads_root, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_REQUEST_BYTES", 100)
+    r = client.post("/api/upload/products/1", content=_multipart(("a.jpg", b"z" * 500)), headers=HEADERS)
+    assert r.status_code == 413
+    assert _leftovers(uploads_root) == []
+
+
+def test_chunked_body_over_request_limit_is_cut_off(client, uploads_root, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_MAX_REQUEST_BYTES", 4096)
+    body = _multipart(("a.jpg", b"a" * 3000), ("b.jpg", b"b" * 3000))
+
+    def chunks():  # 沒有 Content-Length，只能邊收邊數
+        for i in range(0, len(body), 512):
+            yield body[i:i + 512]
+
+    r = client.post("/api/upload/products/1", content=chunks(), headers=HEADERS)
+    assert r.status_code == 413
+    assert _leftovers(uploads_root) == []
+
+
+def test_missing_files_is_bad_request(client, uploads_root):
+    r = client.post("/api/upload/products/1", data={"other": "1"}, files=[("not_files", ("a.jpg", b"1"))])
+    assert r.status_code == 400
+    assert _leftovers(uploads_root) == []
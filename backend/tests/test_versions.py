@@ -0,0 +1,51 @@
+from sqlalchemy import select
+
+from app import models
+
+from .conftest import add_catalog
+from .test_query_counts import count_statements
+
+
+def _version(db, name):
+    db.expire_all()
+    return db.execute(select(models.TableVersion.version).where(models.TableVersion.name == name)).scalar_one()
+
+
+def _bumps(statements):
+    return [s for s in statements if s.lstrip().upper().startswith("UPDATE TABLE_VERSIONS")]
+
+
+def test_gallery_replace_bumps_version_once(api, db):
+    fabric_id = add_catalog(db, 1)["fabrics"][0]
+    before = _version(db, "fabrics")
+    urls = [f"/static/uploads/new_{k}.jpg" for k in range(4)] + ["/static/uploads/f0_1.jpg"]
+    with count_statements() as statements:
+        r = api.put(f"/api/fabrics/{fabric_id}/images", json=urls)
+    assert r.status_code == 200, r.text
+    assert len(_bumps(statements)) == 1
+    assert _version(db, "fabrics") == before + 1
+
+
+def test_order_items_batch_bumps_version_once(api, db):
+    ids = add_catalog(db, 2)
+    order = api.get(f"/api/orders/{ids['orders'][0]}").json()
+    before = _version(db, "orders")
+    with count_statements() as statements:
+        r = api.patch(f"/api/orders/{order['id']}/items", json={
+            "add": [{"product_id": ids["products"][1]}],
+            "update": [dict(order["items"][0], adjustment=50)],
+            "remove": [order["items"][1]["id"]],
+        })
+    assert r.status_code == 200, r.text
+    assert len(_bumps(statements)) == 1
+    assert _version(db, "orders") == before + 1
+
+
+def test_rollback_does_not_bump(db):
+    before = _version(db, "fabrics")
+    db.add(models.Fabric(name="rollback"))
+    db.flush()
+    db.rollback()
+    db.add(models.Category(name="versions-rollback"))
+    db.commit()
+    assert _version(db, "fabrics") == before
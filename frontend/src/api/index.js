@@ -7,6 +7,18 @@ export const api = axios.create({
   timeout: 15000,
 })
 
+// 列表預設只回傳第一頁；跟著 X-Next-Cursor 取完全部，回傳形狀同 api.get
+export async function getAll(url, params = {}) {
+  const data = []
+  let cursor = null
+  do {
+    const res = await api.get(url, { params: { ...params, limit: 500, ...(cursor ? { cursor } : {}) } })
+    data.push(...res.data)
+    cursor = res.headers['x-next-cursor']
+  } while (cursor)
+  return { data }
+}
+
 // Auto-prefix /api and handle FormData upload
 export function fileUpload(url, files) {
   const fixed = url.startsWith('/api/') ? url : '/api' + (url.startsWith('/') ? url : '/' + url)